@@ -0,0 +1,105 @@
+"""
+Cold-start benchmark: time until N seeded torrents are back to seeding after a
+restart, with fast-resume data and with a full recheck.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_cold_start --counts 10 100 500 --size-kb 1024
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from network.torrent_engine import TorrentEngine, RESUME_DIR
+
+
+def make_files(directory, count, size):
+    """
+    Write count files of random data into directory.
+    :return: List of file paths
+    """
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"note_{i:05d}.bin")
+        with open(path, "wb") as f:
+            f.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def wait_for_seeding(engine, count, timeout):
+    """
+    Block until count torrents report seeding.
+    :return: Seconds waited, or None on timeout
+    """
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        seeding = sum(1 for t in engine.get_torrent_status() if t['is_seeding'])
+        if seeding >= count:
+            return time.perf_counter() - start
+        time.sleep(0.05)
+    return None
+
+
+def run(count, size, timeout):
+    with tempfile.TemporaryDirectory() as work:
+        paths = make_files(work, count, size)
+
+        # First run: share everything, then shut down and save resume data
+        engine = TorrentEngine(work)
+        torrent_paths = [engine.create_torrent(path) for path in paths]
+        for torrent_path in torrent_paths:
+            engine.add_torrent_file(torrent_path)
+        wait_for_seeding(engine, count, timeout)
+        engine.stop_all()
+
+        # Restart from resume data
+        start = time.perf_counter()
+        engine = TorrentEngine(work)
+        init = time.perf_counter() - start
+        resumed = wait_for_seeding(engine, count, timeout)
+        if resumed is not None:
+            resumed = time.perf_counter() - start
+        engine.stop_all()
+
+        # Restart without resume data: every torrent is rechecked
+        shutil.rmtree(os.path.join(work, RESUME_DIR))
+        start = time.perf_counter()
+        engine = TorrentEngine(work)
+        for torrent_path in torrent_paths:
+            engine.add_torrent_file(torrent_path)
+        rechecked = wait_for_seeding(engine, count, timeout)
+        if rechecked is not None:
+            rechecked = time.perf_counter() - start
+        engine.stop_all()
+
+    return {
+        'torrents': count,
+        'file_size': size,
+        'engine_init_s': init,
+        'resume_to_seeding_s': resumed,
+        'recheck_to_seeding_s': rechecked,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--size-kb', type=int, default=1024)
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--output', help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    results = [run(count, args.size_kb * 1024, args.timeout) for count in args.counts]
+    report = json.dumps({'benchmark': 'cold_start', 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
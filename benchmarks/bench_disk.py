@@ -0,0 +1,87 @@
+"""
+Disk benchmark: run the loopback swarm on large files once per storage and
+disk I/O configuration and compare throughput, CPU time and disk counters.
+
+Configurations are the cross product of the storage modes, disk backends and
+disk I/O thread counts given. Every configuration runs in its own process,
+because the disk backend is fixed when a session is created. Point --dir at
+the disk under test; the system temporary directory is often a RAM disk.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_disk --dir /mnt/hdd --size-mb 2048 \\
+        --storage sparse allocate --backends default posix --aio-threads 1 4 16
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+
+from benchmarks.swarm import BASE_PORT
+
+
+def run_config(config, nodes, size, port, timeout, work_root, results):
+    from benchmarks.swarm import run_swarm
+    engine_kwargs = {
+        'storage': config['storage'],
+        'disk_backend': config['disk_backend'],
+        'disk_options': {key: config[key] for key in ('aio_threads', 'prefetch_kb')
+                         if config[key] is not None},
+    }
+    try:
+        result = run_swarm(nodes, 1, size, config['profile'], timeout, base_port=port,
+                           engine_kwargs=engine_kwargs, work_root=work_root)
+        result.update(config)
+        results.put(result)
+    except Exception as e:
+        # Never leave the parent waiting on the queue
+        results.put(dict(config, error=f"{type(e).__name__}: {e}"))
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--storage', nargs='+', default=['sparse', 'allocate'])
+    parser.add_argument('--backends', nargs='+', default=['default'],
+                        help="Disk I/O backends: default, mmap, posix (libtorrent 2.x)")
+    parser.add_argument('--aio-threads', type=int, nargs='+', default=[None],
+                        help="Disk I/O thread counts, default: the profile's")
+    parser.add_argument('--prefetch-kb', type=int, nargs='+', default=[None],
+                        help="Read-ahead budgets, default: the profile's")
+    parser.add_argument('--profile', default='desktop')
+    parser.add_argument('--nodes', type=int, default=2)
+    parser.add_argument('--size-mb', type=int, default=1024)
+    parser.add_argument('--dir', help="Directory on the disk under test")
+    parser.add_argument('--timeout', type=float, default=1800)
+    parser.add_argument('--output', help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    combos = itertools.product(args.storage, args.backends, args.aio_threads, args.prefetch_kb)
+    for i, (storage, backend, aio_threads, prefetch_kb) in enumerate(combos):
+        config = {
+            'profile': args.profile,
+            'storage': storage,
+            'disk_backend': backend,
+            'aio_threads': aio_threads,
+            'prefetch_kb': prefetch_kb,
+        }
+        queue = ctx.Queue()
+        port = BASE_PORT + 100 * (i + 1)
+        proc = ctx.Process(target=run_config,
+                           args=(config, args.nodes, args.size_mb * 1024 * 1024, port,
+                                 args.timeout, args.dir, queue))
+        proc.start()
+        results.append(queue.get())
+        proc.join()
+
+    report = json.dumps({'benchmark': 'disk', 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Memory benchmark: RSS per torrent as the torrent count grows.
+
+Adds synthetic single-file torrents (metadata only, no data and no peers) to
+one engine in steps, and after each step records process RSS, Python object
+count, and the time to take a full status snapshot and an empty delta.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_memory --counts 1000 2500 5000 10000
+"""
+import argparse
+import gc
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import libtorrent as lt
+
+from benchmarks.swarm import loopback_profile, peak_rss_kb
+from network.bencode import encode
+
+PIECE_LENGTH = 16 * 1024
+
+
+def rss_kb():
+    """Current resident set size, falling back to the peak where /proc is missing"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        return peak_rss_kb()
+
+
+def synthetic_params(index, save_path):
+    """
+    add_torrent_params for a torrent whose data does not exist.
+    :param index: Makes the info-hash unique
+    """
+    pieces = 4
+    info = {
+        'name': f"note_{index:06d}.pdf",
+        'length': pieces * PIECE_LENGTH,
+        'piece length': PIECE_LENGTH,
+        'pieces': b''.join(hashlib.sha1(f"{index}:{i}".encode()).digest() for i in range(pieces)),
+    }
+    params = lt.add_torrent_params()
+    params.ti = lt.torrent_info(lt.bdecode(encode({'info': info})))
+    params.save_path = save_path
+    params.flags = lt.torrent_flags.auto_managed | lt.torrent_flags.paused
+    return params
+
+
+def add_torrents(engine, start, stop, save_path):
+    done = threading.Semaphore(0)
+    for i in range(start, stop):
+        engine.add_torrent_async(synthetic_params(i, save_path), lambda handle, error: done.release())
+    for _ in range(start, stop):
+        done.acquire()
+
+
+def measure(engine, count, baseline):
+    # Let a state_update_alert fill the status cache
+    time.sleep(2)
+    gc.collect()
+    start = time.perf_counter()
+    version, statuses = engine.status_cache.snapshot()
+    snapshot_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    engine.get_status_changes(version)
+    delta_ms = (time.perf_counter() - start) * 1000
+    rss = rss_kb()
+    return {
+        'torrents': count,
+        'rss_kb': rss,
+        'rss_per_torrent_kb': (rss - baseline) / count if count else None,
+        'python_objects': len(gc.get_objects()),
+        'status_records': len(statuses),
+        'snapshot_ms': snapshot_ms,
+        'empty_delta_ms': delta_ms,
+        'memory': engine.get_memory_stats(),
+    }
+
+
+def run(counts):
+    from network.torrent_engine import TorrentEngine
+    with tempfile.TemporaryDirectory() as work:
+        engine = TorrentEngine(work, profile=loopback_profile('low-memory', 0))
+        try:
+            gc.collect()
+            baseline = rss_kb()
+            results = []
+            added = 0
+            for count in sorted(counts):
+                add_torrents(engine, added, count, work)
+                added = count
+                results.append(measure(engine, count, baseline))
+        finally:
+            engine.stop_all()
+    return {'baseline_rss_kb': baseline, 'steps': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000, 2500, 5000, 10000])
+    parser.add_argument('--output', help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    report = json.dumps({'benchmark': 'memory', 'results': [run(args.counts)]}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
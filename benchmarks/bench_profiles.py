@@ -0,0 +1,57 @@
+"""
+Profile benchmark: run the loopback swarm once per performance profile and
+compare throughput and peak RSS.
+
+Every profile runs in its own process so peak RSS is not shared between runs.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_profiles --profiles desktop seedbox low-memory --size-mb 256
+"""
+import argparse
+import json
+import multiprocessing
+
+from benchmarks.swarm import BASE_PORT
+
+
+def run_profile(name, nodes, size, port, timeout, results):
+    from benchmarks.swarm import run_swarm
+    try:
+        results.put(run_swarm(nodes, 1, size, name, timeout, base_port=port))
+    except Exception as e:
+        # Never leave the parent waiting on the queue
+        results.put({'profile': name, 'error': f"{type(e).__name__}: {e}"})
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', default=['desktop', 'seedbox', 'low-memory'])
+    parser.add_argument('--nodes', type=int, default=2)
+    parser.add_argument('--size-mb', type=int, default=256)
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--output', help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for i, name in enumerate(args.profiles):
+        queue = ctx.Queue()
+        port = BASE_PORT + 100 * (i + 1)
+        proc = ctx.Process(target=run_profile,
+                           args=(name, args.nodes, args.size_mb * 1024 * 1024, port,
+                                 args.timeout, queue))
+        proc.start()
+        results.append(queue.get())
+        proc.join()
+
+    report = json.dumps({'benchmark': 'profiles', 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
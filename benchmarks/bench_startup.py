@@ -0,0 +1,104 @@
+"""
+Startup benchmark: cold-start cost of the GUI and the engine.
+
+Every run is a fresh interpreter, so nothing is cached in sys.modules. By
+default the runs are headless and time:
+  - importing the window modules (must not pull in libtorrent)
+  - importing libtorrent and the engine
+  - building a TorrentEngine, and when discovery starts after that
+With --gui the real app is launched instead; it starts the engine after the
+first frame, writes its startup profile and exits. This needs a display.
+
+Exits with status 1 when the median first frame (--gui) or the median window
+import plus engine construction (headless) is over --target-ms.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --gui --runs 5 --target-ms 1000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from gui.startup import FIRST_FRAME_TARGET_MS
+
+# Runs in a child interpreter; prints one JSON line
+HEADLESS_SCRIPT = r"""
+import json, sys, tempfile, time
+start = time.perf_counter()
+import gui.main_window
+import_gui = (time.perf_counter() - start) * 1000
+lazy = 'libtorrent' not in sys.modules
+start = time.perf_counter()
+from gui.startup import import_engine
+import_engine()
+import_engine_ms = (time.perf_counter() - start) * 1000
+from benchmarks.swarm import loopback_profile
+from network.torrent_engine import TorrentEngine, DISCOVERY_DELAY
+with tempfile.TemporaryDirectory() as work:
+    engine = TorrentEngine(work, profile=loopback_profile('desktop', 0))
+    time.sleep(DISCOVERY_DELAY + 1)
+    stats = engine.get_startup_stats()
+    engine.stop_all()
+print(json.dumps({'import_gui_ms': import_gui, 'libtorrent_lazy': lazy,
+                  'import_engine_ms': import_engine_ms, 'engine_ms': stats}))
+"""
+
+
+def run_headless():
+    output = subprocess.run([sys.executable, '-c', HEADLESS_SCRIPT], check=True,
+                            capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['cold_start_ms'] = result['import_gui_ms'] + result['engine_ms']['init_ms']
+    return result
+
+
+def run_gui(timeout):
+    fd, report_path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    try:
+        subprocess.run([sys.executable, '-m', 'gui.run_app', '--start-engine', '--exit-after-start',
+                        '--startup-report', report_path], check=True, capture_output=True,
+                       timeout=timeout)
+        with open(report_path) as f:
+            report = json.load(f)
+    finally:
+        os.remove(report_path)
+    report['cold_start_ms'] = report['marks_ms'].get('first_frame')
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--gui', action='store_true', help="Launch the real app (needs a display)")
+    parser.add_argument('--target-ms', type=float, default=FIRST_FRAME_TARGET_MS)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--output', help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    results = [run_gui(args.timeout) if args.gui else run_headless() for _ in range(args.runs)]
+    median = statistics.median(r['cold_start_ms'] for r in results)
+    report = json.dumps({
+        'benchmark': 'startup',
+        'mode': 'gui' if args.gui else 'headless',
+        'median_cold_start_ms': median,
+        'target_ms': args.target_ms,
+        'within_target': median <= args.target_ms,
+        'results': results,
+    }, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+    if median > args.target_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Local loopback swarm benchmark.
+
+Starts N TorrentEngine instances on 127.0.0.1 with DHT, LSD, UPnP and NAT-PMP
+off and an in-process local tracker. Node 0 creates torrents for generated
+files and seeds them; every other node downloads all of them. Needs no
+internet access.
+
+Measures torrent creation time, time to first byte, full-swarm completion
+time, throughput, process CPU time, peak RSS and disk counters, and writes them
+as JSON.
+
+Usage (from the repository root):
+    python -m benchmarks.swarm --nodes 4 --files 8 --size-mb 16 --output swarm.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from network.local_tracker import LocalTracker
+
+BASE_PORT = 28000
+
+
+def loopback_profile(name, port):
+    """
+    A performance profile restricted to loopback with all discovery off.
+    :param name: Profile name from network/profiles.py
+    :param port: Port to listen on
+    """
+    from network.profiles import resolve_profile
+    settings = resolve_profile(name)
+    settings.update({
+        'listen_interfaces': f'127.0.0.1:{port}',
+        'enable_dht': False,
+        'enable_lsd': False,
+        'enable_upnp': False,
+        'enable_natpmp': False,
+        # Every node shares 127.0.0.1
+        'allow_multiple_connections_per_ip': True,
+    })
+    return settings
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak
+
+
+def make_files(directory, count, size):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"note_{i:04d}.bin")
+        with open(path, 'wb') as f:
+            for offset in range(0, size, 1024 * 1024):
+                f.write(os.urandom(min(1024 * 1024, size - offset)))
+        paths.append(path)
+    return paths
+
+
+def disk_counters(engine):
+    """
+    Disk job counts and time spent in disk I/O from an engine's newest
+    session stats sample.
+    :return: Dictionary of disk.* counter -> value
+    """
+    values = engine.metrics.latest()['values']
+    return {name: value for name, value in values.items() if name.startswith('disk.')}
+
+
+class Swarm:
+    def __init__(self, nodes, work_dir, profile='desktop', base_port=BASE_PORT, engine_kwargs=None):
+        """
+        :param nodes: Number of engines, node 0 is the seeder
+        :param work_dir: Directory for every node's download directory
+        :param profile: Performance profile used by all nodes
+        :param base_port: Node i listens on base_port + i
+        :param engine_kwargs: Extra TorrentEngine arguments for all nodes,
+                              e.g. storage and disk options
+        """
+        self.work_dir = work_dir
+        self.profile = profile
+        self.engine_kwargs = engine_kwargs or {}
+        self.ports = [base_port + i for i in range(nodes)]
+        self.dirs = [os.path.join(work_dir, f"node{i}") for i in range(nodes)]
+        self.tracker = None
+        self.engines = []
+
+    def start(self):
+        from network.torrent_engine import TorrentEngine
+        self.tracker = LocalTracker().start()
+        for port, directory in zip(self.ports, self.dirs):
+            self.engines.append(TorrentEngine(directory, profile=loopback_profile(self.profile, port),
+                                              **self.engine_kwargs))
+        return self
+
+    def stop(self):
+        for engine in self.engines:
+            engine.stop_all()
+        if self.tracker:
+            self.tracker.stop()
+
+    def run(self, file_count, file_size, timeout=600):
+        """
+        Seed file_count files of file_size bytes from node 0 to all other nodes.
+        :return: Dictionary of measurements
+        """
+        from network.torrent_creator import TorrentCreationJob
+
+        seeder, leechers = self.engines[0], self.engines[1:]
+        paths = make_files(self.dirs[0], file_count, file_size)
+
+        # Torrent creation through the same pipeline the app uses
+        create_times = []
+        torrent_paths = []
+        for path in paths:
+            start = time.perf_counter()
+            torrent_path = TorrentCreationJob(path, path + '.torrent', [self.tracker.url]).result()
+            create_times.append(time.perf_counter() - start)
+            torrent_paths.append(torrent_path)
+        for torrent_path in torrent_paths:
+            seeder.add_torrent_file(torrent_path, save_path=self.dirs[0])
+
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        handles = []
+        for engine in leechers:
+            for torrent_path in torrent_paths:
+                handles.append(engine.add_torrent_file(torrent_path))
+
+        # Poll the leechers' handles directly for sub-second resolution
+        first_byte = {}
+        completed = {}
+        while len(completed) < len(handles) and time.perf_counter() - start < timeout:
+            now = time.perf_counter() - start
+            for i, handle in enumerate(handles):
+                if i in completed:
+                    continue
+                status = handle.status()
+                if i not in first_byte and status.total_wanted_done > 0:
+                    first_byte[i] = now
+                if status.is_seeding:
+                    completed[i] = now
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+        # Let one more session_stats_alert land before reading disk counters
+        time.sleep(1.5)
+
+        received = file_size * len(completed)
+        swarm_done = len(completed) == len(handles)
+        return {
+            'nodes': len(self.engines),
+            'profile': self.profile,
+            'files': file_count,
+            'file_size': file_size,
+            'create_torrent_s': {
+                'mean': sum(create_times) / len(create_times),
+                'max': max(create_times),
+            },
+            'time_to_first_byte_s': {
+                'mean': sum(first_byte.values()) / len(first_byte) if first_byte else None,
+                'max': max(first_byte.values()) if first_byte else None,
+            },
+            'swarm_completion_s': elapsed if swarm_done else None,
+            'completed_downloads': len(completed),
+            'expected_downloads': len(handles),
+            'throughput_mb_s': received / elapsed / (1024 * 1024) if elapsed else None,
+            'cpu_s': cpu,
+            'peak_rss_kb': peak_rss_kb(),
+            'seeder_disk': disk_counters(seeder),
+            'leecher_disk': disk_counters(leechers[0]) if leechers else None,
+        }
+
+
+def run_swarm(nodes, file_count, file_size, profile='desktop', timeout=600, base_port=BASE_PORT,
+              engine_kwargs=None, work_root=None):
+    """
+    Build a swarm in a temporary directory, run it and tear it down.
+    :param engine_kwargs: Extra TorrentEngine arguments for all nodes
+    :param work_root: Directory to create the swarm in, e.g. on the disk under
+                      test; defaults to the system temporary directory
+    :return: Dictionary of measurements
+    """
+    work_dir = tempfile.mkdtemp(prefix='p2pnotes-swarm-', dir=work_root)
+    swarm = Swarm(nodes, work_dir, profile, base_port, engine_kwargs)
+    try:
+        swarm.start()
+        return swarm.run(file_count, file_size, timeout)
+    finally:
+        swarm.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, default=4)
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--size-mb', type=float, default=16)
+    parser.add_argument('--profile', default='desktop')
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--output', help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    result = run_swarm(args.nodes, args.files, int(args.size_mb * 1024 * 1024),
+                       args.profile, args.timeout)
+    report = json.dumps({'benchmark': 'swarm', 'results': [result]}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
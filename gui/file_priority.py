@@ -0,0 +1,92 @@
+import customtkinter as ctk
+from network.priorities import PRIORITY_NAMES, PRIORITY_VALUES, SKIP, NORMAL, plan_file_priorities
+
+BUTTON_COLOR = "#f8148c"
+PRIORITY_CHOICES = ['skip', 'low', 'normal', 'high']
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def priority_name(priority):
+    """Map a libtorrent priority (0-7) to the nearest choice in the dialog"""
+    if priority in PRIORITY_NAMES:
+        return PRIORITY_NAMES[priority]
+    return 'low' if priority < NORMAL else 'high'
+
+
+class FilePriorityDialog(ctk.CTkToplevel):
+    def __init__(self, master, name, files):
+        """
+        Choose which files of a torrent to download first, or at all.
+        :param master: Parent window
+        :param name: Torrent name for the title
+        :param files: File dictionaries from TorrentEngine.get_torrent_files;
+                      their 'index' is the file index, pad files are not listed
+        """
+        super().__init__(master)
+        self.title(f"Files - {name}")
+        self.geometry("560x480")
+        self.files = files
+        self.apply_callback = None  # To be set by MainWindow, gets {file index: priority}
+
+        self.file_frame = ctk.CTkScrollableFrame(self, fg_color="#181a20")
+        self.file_frame.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        self.choices = []
+        for f in files:
+            row = ctk.CTkFrame(self.file_frame, fg_color="transparent")
+            row.pack(fill="x", pady=1)
+            done = f['downloaded'] / f['size'] * 100 if f['size'] else 100
+            ctk.CTkLabel(row, text=f"{f['path']}  ({format_size(f['size'])}, {done:.0f}%)",
+                         font=("Arial", 11), anchor="w").pack(side="left", fill="x", expand=True)
+            choice = ctk.StringVar(value=priority_name(f['priority']))
+            ctk.CTkOptionMenu(row, values=PRIORITY_CHOICES, variable=choice, width=90).pack(side="right")
+            self.choices.append(choice)
+
+        # Rules
+        rules_frame = ctk.CTkFrame(self, fg_color="transparent")
+        rules_frame.pack(fill="x", padx=10, pady=5)
+        self.extensions_entry = ctk.CTkEntry(rules_frame, placeholder_text="Only these types, e.g. pdf, md",
+                                             width=220)
+        self.extensions_entry.pack(side="left")
+        ctk.CTkButton(rules_frame, text="Filter", width=70, fg_color="#4a9eff", hover_color="#3578cc",
+                      command=self.filter_extensions).pack(side="left", padx=5)
+        ctk.CTkButton(rules_frame, text="Small files first", width=120, fg_color="#4a9eff",
+                      hover_color="#3578cc", command=self.small_files_first).pack(side="left")
+
+        buttons = ctk.CTkFrame(self, fg_color="transparent")
+        buttons.pack(fill="x", padx=10, pady=(5, 10))
+        self.status_label = ctk.CTkLabel(buttons, text="", font=("Arial", 11))
+        self.status_label.pack(side="left")
+        ctk.CTkButton(buttons, text="Apply", fg_color=BUTTON_COLOR, hover_color="#c0126b",
+                      width=100, command=self.apply).pack(side="right")
+
+    def priorities(self):
+        """Chosen priority per listed file, by file index"""
+        return {f['index']: PRIORITY_VALUES[choice.get()] for f, choice in zip(self.files, self.choices)}
+
+    def apply_rules(self, rules):
+        """Run rules over the current choices and show the result"""
+        chosen = self.priorities()
+        # Rules work on a list by file index; indices not listed are pad files
+        current = [chosen.get(i, SKIP) for i in range(max(chosen, default=-1) + 1)]
+        planned = plan_file_priorities(self.files, rules, current)
+        for f, choice in zip(self.files, self.choices):
+            choice.set(priority_name(planned[f['index']]))
+
+    def filter_extensions(self):
+        extensions = [ext.strip() for ext in self.extensions_entry.get().split(',') if ext.strip()]
+        if extensions:
+            self.apply_rules([{'rule': 'include_extensions', 'extensions': extensions}])
+
+    def small_files_first(self):
+        self.apply_rules(['small_files_first'])
+
+    def apply(self):
+        if self.apply_callback:
+            self.status_label.configure(text="Applying...")
+            self.apply_callback(self.priorities())
@@ -9,6 +9,8 @@ class FileTransfer(ctk.CTkFrame):
         self.selected_file = None
         self.share_callback = None  # To be set by MainWindow
         self.add_torrent_callback = None  # To be set by MainWindow
+        self.cancel_share_callback = None  # To be set by MainWindow
+        self.creating = False
 
         self.label = ctk.CTkLabel(self, text="File Transfer", font=("Arial", 16, "bold"))
         self.label.pack(pady=(20, 15))
@@ -20,6 +22,12 @@ class FileTransfer(ctk.CTkFrame):
         )
         self.select_button.pack(pady=(0, 10))
 
+        self.select_folder_button = ctk.CTkButton(
+            self, text="Select Folder to Share", fg_color=BUTTON_COLOR, hover_color="#c0126b",
+            font=("Arial", 14, "bold"), command=self.select_folder, width=200, height=40, corner_radius=10
+        )
+        self.select_folder_button.pack(pady=(0, 10))
+
         # Share file section
         self.share_button = ctk.CTkButton(
             self, text="Create & Share Torrent", fg_color=BUTTON_COLOR, hover_color="#c0126b",
@@ -60,8 +68,23 @@ class FileTransfer(ctk.CTkFrame):
             self.status_label.configure(text=f"Selected: {file_path.split('/')[-1]}")
             self.progress.set(0)
 
+    def select_folder(self):
+        folder_path = filedialog.askdirectory()
+        if folder_path:
+            self.selected_file = folder_path
+            self.status_label.configure(text=f"Selected folder: {folder_path.split('/')[-1]}")
+            self.progress.set(0)
+
+    def set_creating(self, creating):
+        """Switch the share button between sharing and cancelling"""
+        self.creating = creating
+        self.share_button.configure(text="Cancel Torrent Creation" if creating else "Create & Share Torrent")
+
     def share_file(self):
-        if self.selected_file and self.share_callback:
+        if self.creating:
+            if self.cancel_share_callback:
+                self.cancel_share_callback()
+        elif self.selected_file and self.share_callback:
             self.status_label.configure(text="Creating torrent and starting share...")
             self.progress.set(0.1)
             self.share_callback(self.selected_file)
@@ -0,0 +1,97 @@
+import time
+
+# Upper bounds (ms) of the stall histogram buckets; the last bucket is open
+BUCKETS_MS = [2, 5, 10, 20, 50, 100, 250, 500, 1000]
+
+
+class FrameMonitor:
+    def __init__(self, widget, interval_ms=16):
+        """
+        Measures how late the Tk main loop runs a timer that should fire every
+        interval_ms. Any lateness is time the loop was blocked.
+        :param widget: Tk widget used to schedule the timer
+        :param interval_ms: Timer interval in milliseconds
+        """
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.samples = 0
+        self.max_stall_ms = 0.0
+        self.total_stall_ms = 0.0
+        self._expected = None
+        self._job = None
+
+    def start(self):
+        self._expected = time.perf_counter() + self.interval_ms / 1000
+        self._job = self.widget.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+
+    def _tick(self):
+        now = time.perf_counter()
+        stall_ms = max(0.0, (now - self._expected) * 1000)
+        self.record(stall_ms)
+        self._expected = now + self.interval_ms / 1000
+        self._job = self.widget.after(self.interval_ms, self._tick)
+
+    def record(self, stall_ms):
+        """
+        Add one stall measurement to the histogram.
+        :param stall_ms: How long the main loop was blocked, in milliseconds
+        """
+        index = len(BUCKETS_MS)
+        for i, bound in enumerate(BUCKETS_MS):
+            if stall_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.samples += 1
+        self.total_stall_ms += stall_ms
+        self.max_stall_ms = max(self.max_stall_ms, stall_ms)
+
+    def percentile(self, fraction):
+        """
+        Approximate stall percentile from the histogram.
+        :param fraction: e.g. 0.99 for p99
+        :return: Upper bound (ms) of the bucket holding that percentile
+        """
+        if not self.samples:
+            return 0.0
+        target = fraction * self.samples
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max_stall_ms
+        return self.max_stall_ms
+
+    def get_stats(self):
+        """
+        :return: Dictionary with sample count, mean/max/p50/p99 stall in ms and
+                 the histogram as {bucket label: count}
+        """
+        labels = [f"<={bound}ms" for bound in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        return {
+            'samples': self.samples,
+            'mean_stall_ms': self.total_stall_ms / self.samples if self.samples else 0.0,
+            'max_stall_ms': self.max_stall_ms,
+            'p50_stall_ms': self.percentile(0.5),
+            'p99_stall_ms': self.percentile(0.99),
+            'histogram': dict(zip(labels, self.counts)),
+        }
+
+    def report(self):
+        """
+        :return: Human readable summary of the UI stalls
+        """
+        stats = self.get_stats()
+        lines = [f"UI stalls over {stats['samples']} frames: "
+                 f"mean {stats['mean_stall_ms']:.1f}ms, p99 <= {stats['p99_stall_ms']:.0f}ms, "
+                 f"max {stats['max_stall_ms']:.1f}ms"]
+        for label, count in stats['histogram'].items():
+            if count:
+                lines.append(f"  {label:>8}: {count}")
+        return "\n".join(lines)
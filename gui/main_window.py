@@ -1,26 +1,27 @@
 import os
+import queue
 import customtkinter as ctk
-from gui.peer_list import PeerList
+from gui.peer_list import PeerList, format_rate
 from gui.file_transfer import FileTransfer
-from network.torrent_engine import TorrentEngine
+from gui.frame_monitor import FrameMonitor
+from gui.file_priority import FilePriorityDialog
+from gui.startup import StartupProfile, run_in_thread, import_engine, detect_local_ip
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("dark-blue")
 
-def get_local_ip():
-    import socket
-    try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
-        s.close()
-        return ip
-    except Exception:
-        return "127.0.0.1"
+# How often (ms) engine results are picked up on the Tk thread
+UI_QUEUE_INTERVAL = 20
 
 class MainWindow(ctk.CTk):
-    def __init__(self):
+    def __init__(self, startup=None):
+        """
+        The window is built first; libtorrent is imported and the local IP looked
+        up in the background once the first frame is drawn.
+        :param startup: StartupProfile to record startup stages in
+        """
         super().__init__()
+        self.startup = startup or StartupProfile()
         self.title("P2P Notes Sharing App")
         self.geometry("800x600")
         self.resizable(False, False)
@@ -34,10 +35,9 @@ class MainWindow(ctk.CTk):
         self.name_entry = ctk.CTkEntry(self.user_frame, textvariable=self.name_var, width=120)
         self.name_entry.pack(side="left", padx=(0, 20))
 
-        ip = get_local_ip()
         self.addr_label = ctk.CTkLabel(
             self.user_frame, 
-            text=f"IP: {ip}",
+            text="IP: ...",
             font=("Arial", 13, "bold"), 
             text_color="#f8148c"
         )
@@ -49,6 +49,16 @@ class MainWindow(ctk.CTk):
         )
         self.start_button.pack(side="right", padx=15)
 
+        # LAN mode: local tracker, no internet discovery
+        self.lan_mode_var = ctk.BooleanVar(value=False)
+        self.lan_switch = ctk.CTkSwitch(self.user_frame, text="LAN mode", variable=self.lan_mode_var,
+                                        progress_color="#f8148c", font=("Arial", 12))
+        self.lan_switch.pack(side="right", padx=5)
+
+        # Current rates against the rate limits in effect
+        self.bandwidth_label = ctk.CTkLabel(self.user_frame, text="", font=("Arial", 12))
+        self.bandwidth_label.pack(side="right", padx=10)
+
         # --- Main layout frames ---
         self.left_frame = PeerList(self)
         self.left_frame.grid(row=1, column=0, padx=(20, 10), pady=20, sticky="ns")
@@ -59,63 +69,278 @@ class MainWindow(ctk.CTk):
         self.grid_columnconfigure(1, weight=1)
         self.grid_rowconfigure(1, weight=1)
 
-        # Torrent engine setup
-        self.torrent_engine = None
+        # Torrent engine setup. The engine lives on its own thread; results come
+        # back through ui_queue, which the main loop drains.
+        self.engine = None
+        self.engine_module = None  # Future of import_engine
+        self.engine_started_callback = None
         self.save_dir = os.path.join(os.getcwd(), "files")
         os.makedirs(self.save_dir, exist_ok=True)
         self.engine_started = False
+        self.creation_job = None
+        self.status_version = 0
+        self.ui_queue = queue.Queue()
+        self.after(UI_QUEUE_INTERVAL, self.drain_ui_queue)
+
+        # Watch for main loop stalls
+        self.frame_monitor = FrameMonitor(self)
+        self.frame_monitor.start()
 
         # Connect callbacks
         self.right_frame.share_callback = self.create_and_share_torrent
+        self.right_frame.cancel_share_callback = self.cancel_torrent_creation
         self.right_frame.add_torrent_callback = self.add_torrent_file
+        self.left_frame.open_callback = self.open_file_priorities
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+        # Everything slow waits until the window is on screen
+        self.bind("<Map>", self.on_map, add="+")
+        self.startup.mark('window_built')
+
+    def run_in_engine(self, future, callback):
+        """Call callback(future) on the Tk thread once the engine future is done"""
+        future.add_done_callback(lambda f: self.ui_queue.put((callback, f)))
+
+    def drain_ui_queue(self):
+        while True:
+            try:
+                callback, future = self.ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            callback(future)
+        self.after(UI_QUEUE_INTERVAL, self.drain_ui_queue)
+
+    def on_map(self, event):
+        # Children are mapped too; the window itself is what counts
+        if event.widget is not self or 'first_frame' in self.startup.marks:
+            return
+        # Redrawing is an idle task queued before this one
+        self.after_idle(self.on_first_frame)
+
+    def on_first_frame(self):
+        self.startup.mark('first_frame')
+        if not self.startup.within_target():
+            print(f"Slow startup: first frame after {self.startup.marks['first_frame']:.0f} ms "
+                  f"(target {self.startup.target_ms} ms)")
+        self.preload_engine()
+        self.run_in_engine(run_in_thread(detect_local_ip, "local-ip"), self.on_local_ip)
+
+    def on_local_ip(self, future):
+        try:
+            ip = future.result()
+        except Exception:
+            ip = "127.0.0.1"
+        self.addr_label.configure(text=f"IP: {ip}")
+
+    def preload_engine(self):
+        """
+        Import libtorrent and the engine on a background thread, once.
+        :return: Future resolving to the EngineWorker class
+        """
+        if self.engine_module is None:
+            def load():
+                with self.startup.timed('import_engine'):
+                    worker_class = import_engine()
+                self.startup.mark('engine_imported')
+                return worker_class
+            self.engine_module = run_in_thread(load, "engine-import")
+        return self.engine_module
 
     def start_torrent_engine(self):
-        if self.engine_started:
+        if self.engine is not None:
+            return
+        
+        self.start_button.configure(state="disabled", text="Starting...")
+        self.lan_switch.configure(state="disabled")
+        self.run_in_engine(self.preload_engine(), self.on_engine_imported)
+
+    def on_engine_imported(self, future):
+        try:
+            worker_class = future.result()
+        except Exception as e:
+            # Import errors stay in the future; let the next click try again
+            self.engine_module = None
+            self.on_engine_failed(e)
+            return
+        self.engine = worker_class(self.save_dir, lan_mode=self.lan_mode_var.get())
+        self.run_in_engine(self.engine.start(), self.on_engine_started)
+
+    def on_engine_failed(self, error):
+        self.engine = None
+        self.start_button.configure(state="normal", text="Start P2P Engine")
+        self.lan_switch.configure(state="normal")
+        self.right_frame.status_label.configure(text=f"Error: {error}")
+
+    def on_engine_started(self, future):
+        try:
+            future.result()
+        except Exception as e:
+            self.on_engine_failed(e)
             return
         
-        self.torrent_engine = TorrentEngine(self.save_dir)
         self.engine_started = True
-        self.start_button.configure(state="disabled", text="P2P Engine Running")
+        self.startup.mark('engine_started')
+        self.start_button.configure(text="P2P Engine Running")
         self.right_frame.status_label.configure(text="P2P Engine started successfully!")
+        self.run_in_engine(self.engine.submit('get_startup_stats'), self.on_startup_stats)
         
         # Start updating torrent list
         self.after(2000, self.update_torrent_list)
 
+    def on_startup_stats(self, future):
+        try:
+            self.startup.engine = future.result()
+        except Exception as e:
+            print(f"Could not read engine startup times: {e}")
+        print(f"Startup profile: {self.startup.to_json()}")
+        if self.engine_started_callback:
+            self.engine_started_callback()
+
     def create_and_share_torrent(self, file_path):
-        if not self.torrent_engine:
+        if not self.engine_started:
             self.right_frame.status_label.configure(text="Start P2P Engine first!")
             return
         
+        # Hashing runs in the background; poll it so the window stays responsive
+        self.right_frame.set_creating(True)
+        self.run_in_engine(self.engine.submit('create_torrent_async', file_path),
+                           lambda future: self.on_creation_started(future, file_path))
+
+    def on_creation_started(self, future, file_path):
         try:
-            torrent_path = self.torrent_engine.create_torrent(file_path)
-            self.torrent_engine.add_torrent_file(torrent_path)
+            self.creation_job = future.result()
+        except Exception as e:
+            self.right_frame.set_creating(False)
+            self.right_frame.status_label.configure(text=f"Error: {e}")
+            return
+        self.after(100, self.poll_torrent_creation, file_path)
+
+    def poll_torrent_creation(self, file_path):
+        job = self.creation_job
+        if not job.done():
+            self.right_frame.progress.set(0.1 + 0.9 * job.progress)
+            self.after(100, self.poll_torrent_creation, file_path)
+            return
+        
+        self.creation_job = None
+        self.right_frame.set_creating(False)
+        # Loaded with the engine by now
+        from network.torrent_creator import CreationCancelled
+        try:
+            torrent_path = job.result()
+        except CreationCancelled:
+            self.right_frame.progress.set(0)
+            self.right_frame.status_label.configure(text="Torrent creation cancelled")
+            return
+        except Exception as e:
+            self.right_frame.status_label.configure(text=f"Error: {e}")
+            return
+        
+        # Seed from where the data already is
+        save_path = os.path.dirname(os.path.normpath(os.path.abspath(file_path)))
+        self.run_in_engine(self.engine.submit('add_torrent_file', torrent_path, save_path=save_path),
+                           lambda future: self.on_shared(future, file_path))
+
+    def on_shared(self, future, file_path):
+        try:
+            future.result()
+            self.right_frame.progress.set(1)
             self.right_frame.status_label.configure(text=f"Sharing: {os.path.basename(file_path)}")
         except Exception as e:
             self.right_frame.status_label.configure(text=f"Error: {e}")
 
+    def cancel_torrent_creation(self):
+        if self.creation_job:
+            self.creation_job.cancel()
+
     def add_torrent_file(self, torrent_path):
-        if not self.torrent_engine:
+        if not self.engine_started:
             self.right_frame.status_label.configure(text="Start P2P Engine first!")
             return
         
+        # The magnet entry uses the same callback
+        method = 'add_magnet_link' if torrent_path.startswith('magnet:') else 'add_torrent_file'
+        self.run_in_engine(self.engine.submit(method, torrent_path), self.on_torrent_added)
+
+    def on_torrent_added(self, future):
         try:
-            self.torrent_engine.add_torrent_file(torrent_path)
+            future.result()
             self.right_frame.status_label.configure(text="Download started!")
         except Exception as e:
             self.right_frame.status_label.configure(text=f"Error: {e}")
 
+    def open_file_priorities(self, torrent):
+        if not self.engine_started:
+            return
+        info_hash = torrent['info_hash']
+        self.run_in_engine(self.engine.submit('get_torrent_files', info_hash),
+                           lambda future: self.on_torrent_files(future, torrent))
+
+    def on_torrent_files(self, future, torrent):
+        try:
+            files = future.result()
+        except Exception as e:
+            self.right_frame.status_label.configure(text=f"Error: {e}")
+            return
+        if not files:
+            self.right_frame.status_label.configure(text="Waiting for torrent metadata...")
+            return
+        dialog = FilePriorityDialog(self, torrent.get('name', 'Unknown'), files)
+        dialog.apply_callback = lambda priorities: self.run_in_engine(
+            self.engine.submit('prioritize_files', torrent['info_hash'], priorities),
+            lambda f: self.on_priorities_applied(f, dialog))
+
+    def on_priorities_applied(self, future, dialog):
+        try:
+            future.result()
+            text = "File priorities updated"
+        except Exception as e:
+            text = f"Error: {e}"
+        if dialog.winfo_exists():
+            dialog.status_label.configure(text=text)
+
     def update_torrent_list(self):
-        if self.torrent_engine:
-            torrents = self.torrent_engine.get_torrent_status()
-            self.left_frame.update_torrents(torrents)
+        if self.engine_started:
+            # Only fetch the torrents that changed since the last refresh
+            self.run_in_engine(self.engine.submit('get_status_changes', self.status_version),
+                               self.on_torrent_status)
+            self.run_in_engine(self.engine.submit('get_bandwidth'), self.on_bandwidth)
+
+    def on_torrent_status(self, future):
+        try:
+            delta = future.result()
+            self.status_version = delta['version']
+            self.left_frame.apply_changes(delta['changed'], delta['removed'], delta['reset'])
+        except Exception as e:
+            print(f"Could not update torrent list: {e}")
+        # Schedule the next refresh only after this one arrived
         self.after(2000, self.update_torrent_list)
 
+    def on_bandwidth(self, future):
+        try:
+            bandwidth = future.result()
+        except Exception as e:
+            print(f"Could not update bandwidth: {e}")
+            return
+        self.bandwidth_label.configure(text="  ".join([
+            "↓ " + format_rate(bandwidth['download_rate'], bandwidth['download_limit']),
+            "↑ " + format_rate(bandwidth['upload_rate'], bandwidth['upload_limit']),
+        ]))
+        self.left_frame.set_limits(bandwidth.get('torrents', {}))
+
     def on_closing(self):
-        if self.torrent_engine:
-            self.torrent_engine.stop_all()
-        self.destroy()
+        self.cancel_torrent_creation()
+        self.frame_monitor.stop()
+        print(self.frame_monitor.report())
+        if self.engine is None:
+            self.destroy()
+            return
+        
+        # Saving resume data can take a while; hide the window meanwhile
+        self.withdraw()
+        self.engine_started = False
+        self.run_in_engine(self.engine.stop(), lambda future: self.destroy())
 
 if __name__ == "__main__":
     app = MainWindow()
-    app.protocol("WM_DELETE_WINDOW", app.on_closing)
     app.mainloop()
\ No newline at end of file
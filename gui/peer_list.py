@@ -1,38 +1,201 @@
 import customtkinter as ctk
 
+# Height in pixels of one torrent row; the list shows as many as fit
+ROW_HEIGHT = 80
+LIST_HEIGHT = 400
+
+
+def format_rate(rate, limit):
+    """Rate in KB/s, with the limit and utilisation when there is one"""
+    if not limit:
+        return f"{rate / 1024:.0f} KB/s"
+    return f"{rate / 1024:.0f}/{limit / 1024:.0f} KB/s ({rate / limit * 100:.0f}%)"
+
+
+class TorrentRow(ctk.CTkFrame):
+    def __init__(self, master):
+        super().__init__(master, height=ROW_HEIGHT, fg_color="#181a20", corner_radius=8)
+        self.pack_propagate(False)
+        self.info_hash = None
+        self.visible = False
+        self.shown = {}  # label name -> text currently displayed
+
+        self.labels = {}
+        for name, font in (('name', ("Arial", 11, "bold")), ('progress', ("Arial", 11)),
+                           ('state', ("Arial", 11)), ('peers', ("Arial", 11))):
+            label = ctk.CTkLabel(self, text="", font=font, text_color="#f1f1f1",
+                                 anchor="w", height=16)
+            label.pack(fill="x", padx=8, pady=(2 if name != 'name' else 6, 0))
+            self.labels[name] = label
+
+    def show(self, torrent, limits=None):
+        """
+        Display a torrent, touching only the labels whose text changed.
+        :param torrent: Status dictionary (rates in KB/s)
+        :param limits: The torrent's own rate limits and utilisation from
+                       TorrentEngine.get_bandwidth, None when it has none
+        """
+        self.info_hash = torrent.get('info_hash')
+        limits = limits or {}
+        download = format_rate(torrent.get('download_rate', 0) * 1024, limits.get('download_limit'))
+        upload = format_rate(torrent.get('upload_rate', 0) * 1024, limits.get('upload_limit'))
+        texts = {
+            'name': f"📁 {torrent.get('name', 'Unknown')}",
+            'progress': f"   Progress: {torrent.get('progress', 0) * 100:.1f}%",
+            'state': f"   Status: {torrent.get('state', 'Unknown')}",
+            'peers': (f"   Seeds: {torrent.get('num_seeds', 0)} | Peers: {torrent.get('num_peers', 0)}"
+                      f" | ↓ {download} ↑ {upload}"),
+        }
+        for name, text in texts.items():
+            if self.shown.get(name) != text:
+                self.labels[name].configure(text=text)
+                self.shown[name] = text
+
+
 class PeerList(ctk.CTkFrame):
     def __init__(self, master):
         super().__init__(master, width=250, fg_color="#23272e", corner_radius=15)
         self.label = ctk.CTkLabel(self, text="Active Torrents", font=("Arial", 16, "bold"))
-        self.label.pack(pady=(15, 10))
-        
-        # Use a text widget for better formatting
-        self.torrent_display = ctk.CTkTextbox(self, width=230, height=400, fg_color="#181a20", text_color="#f1f1f1", font=("Arial", 11))
-        self.torrent_display.pack(padx=10, pady=(0, 15))
+        self.label.pack(pady=(15, 0))
+        ctk.CTkLabel(self, text="Double-click a torrent to pick its files",
+                     font=("Arial", 10), text_color="#a0a0a0").pack(pady=(0, 10))
+
+        # Virtualized list: a fixed pool of row widgets is re-bound to whichever
+        # torrents are scrolled into view, so redraw cost does not grow with the
+        # number of torrents
+        self.list_frame = ctk.CTkFrame(self, width=230, height=LIST_HEIGHT, fg_color="#181a20")
+        self.list_frame.pack(padx=10, pady=(0, 15))
+        self.list_frame.pack_propagate(False)
+
+        self.scrollbar = ctk.CTkScrollbar(self.list_frame, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.rows_frame = ctk.CTkFrame(self.list_frame, fg_color="transparent")
+        self.rows_frame.pack(side="left", fill="both", expand=True)
+
+        self.empty_label = ctk.CTkLabel(self.rows_frame, text="No active torrents",
+                                        font=("Arial", 11), text_color="#f1f1f1")
+        self.rows = []
+        for _ in range(LIST_HEIGHT // ROW_HEIGHT):
+            row = TorrentRow(self.rows_frame)
+            self.rows.append(row)
+            for widget in [row] + list(row.labels.values()):
+                widget.bind("<MouseWheel>", self._on_mousewheel)
+                widget.bind("<Button-4>", lambda e: self.scroll(-1))
+                widget.bind("<Button-5>", lambda e: self.scroll(1))
+                widget.bind("<Double-Button-1>", lambda e, row=row: self._on_row_open(row))
+
+        self.torrents = {}  # info_hash -> status dictionary
+        self.limits = {}    # info_hash -> per-torrent limits, for limited torrents only
+        self.order = []     # info_hashes in display order
+        self.offset = 0     # index of the first visible torrent
+        self.open_callback = None  # To be set by MainWindow, gets the status dictionary
+        self._render()
 
     def update_torrents(self, torrents):
-        """Update the display with current torrent status"""
-        self.torrent_display.delete("1.0", "end")
-        if not torrents:
-            self.torrent_display.insert("end", "No active torrents\n")
+        """Update the display with the full list of torrent statuses"""
+        keys = {torrent['info_hash'] for torrent in torrents}
+        removed = [key for key in self.torrents if key not in keys]
+        changed = [torrent for torrent in torrents
+                   if self.torrents.get(torrent['info_hash']) != torrent]
+        self.apply_changes(changed, removed)
+
+    def apply_changes(self, changed, removed, reset=False):
+        """
+        Update the display from a status delta.
+        :param changed: Status dictionaries of new or changed torrents
+        :param removed: Info hashes of removed torrents
+        :param reset: 'changed' is a full snapshot; drop everything else
+        """
+        if reset:
+            keys = {torrent['info_hash'] for torrent in changed}
+            removed = [key for key in self.torrents if key not in keys]
+
+        order_changed = False
+        if removed:
+            removed = set(removed)
+            for key in removed:
+                self.torrents.pop(key, None)
+            self.order = [key for key in self.order if key not in removed]
+            order_changed = True
+        for torrent in changed:
+            key = torrent['info_hash']
+            if key not in self.torrents:
+                self.order.append(key)
+                order_changed = True
+            self.torrents[key] = torrent
+
+        if order_changed:
+            self._render()
+            return
+        # Only redraw when a visible torrent changed
+        visible = set(self.order[self.offset:self.offset + len(self.rows)])
+        if any(torrent['info_hash'] in visible for torrent in changed):
+            self._render()
+
+    def set_limits(self, limits):
+        """
+        Show utilisation against per-torrent rate limits.
+        :param limits: info_hash -> limits dictionary, as in
+                       TorrentEngine.get_bandwidth()['torrents']
+        """
+        if limits == self.limits:
             return
-        
-        for torrent in torrents:
-            name = torrent.get('name', 'Unknown')
-            progress = torrent.get('progress', 0) * 100
-            state = torrent.get('state', 'Unknown')
-            num_seeds = torrent.get('num_seeds', 0)
-            num_peers = torrent.get('num_peers', 0)
-            
-            self.torrent_display.insert("end", f"📁 {name}\n")
-            self.torrent_display.insert("end", f"   Progress: {progress:.1f}%\n")
-            self.torrent_display.insert("end", f"   Status: {state}\n")
-            self.torrent_display.insert("end", f"   Seeds: {num_seeds} | Peers: {num_peers}\n")
-            self.torrent_display.insert("end", "─" * 30 + "\n")
+        self.limits = limits
+        self._render()
+
+    def scroll(self, rows):
+        """Scroll the list by a number of rows"""
+        self._set_offset(self.offset + rows)
+
+    def _set_offset(self, offset):
+        max_offset = max(0, len(self.order) - len(self.rows))
+        offset = min(max(0, offset), max_offset)
+        if offset != self.offset:
+            self.offset = offset
+            self._render()
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self._set_offset(round(float(value) * len(self.order)))
+        elif action == "scroll":
+            step = len(self.rows) if unit == "pages" else 1
+            self.scroll(int(value) * step)
+
+    def _on_row_open(self, row):
+        if row.info_hash in self.torrents and self.open_callback:
+            self.open_callback(self.torrents[row.info_hash])
+
+    def _on_mousewheel(self, event):
+        self.scroll(-1 if event.delta > 0 else 1)
+
+    def _render(self):
+        # Keep the offset valid after removals
+        self.offset = min(self.offset, max(0, len(self.order) - len(self.rows)))
+        visible = self.order[self.offset:self.offset + len(self.rows)]
+
+        if visible:
+            self.empty_label.pack_forget()
+        else:
+            self.empty_label.pack(pady=10)
+
+        for i, row in enumerate(self.rows):
+            if i < len(visible):
+                row.show(self.torrents[visible[i]], self.limits.get(visible[i]))
+                if not row.visible:
+                    row.pack(fill="x", pady=(0, 2))
+                    row.visible = True
+            elif row.visible:
+                row.pack_forget()
+                row.visible = False
+                row.info_hash = None
+
+        total = len(self.order)
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + len(visible)) / total)
+        else:
+            self.scrollbar.set(0, 1)
 
     # Keep the old method for backward compatibility (if needed)
     def update_peers(self, peers):
         """Legacy method - now shows message about torrent mode"""
-        self.torrent_display.delete("1.0", "end")
-        self.torrent_display.insert("end", "Now using torrent-based P2P\n")
-        self.torrent_display.insert("end", "Add torrents to see activity here\n")
\ No newline at end of file
+        self.empty_label.configure(text="Now using torrent-based P2P\nAdd torrents to see activity here")
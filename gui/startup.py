@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# Cold-start budget from process start to the first drawn frame, in ms
+FIRST_FRAME_TARGET_MS = 1000
+
+
+def run_in_thread(fn, name):
+    """
+    Run a function on a new daemon thread.
+    :param fn: Function taking no arguments
+    :param name: Thread name
+    :return: Future with the function's return value
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
+
+
+def import_engine():
+    """
+    Import the engine modules, and with them libtorrent.
+    Done on a background thread once the window is up.
+    :return: EngineWorker class
+    """
+    from network.engine_worker import EngineWorker
+    return EngineWorker
+
+
+def detect_local_ip():
+    """
+    Address of the interface that routes outside; run off the Tk thread.
+    :return: IP address string
+    """
+    from network.local_tracker import local_ip
+    return local_ip()
+
+
+class StartupProfile:
+    def __init__(self, started=None, target_ms=FIRST_FRAME_TARGET_MS):
+        """
+        Records when each startup stage was reached, relative to process start,
+        and how long single steps such as imports took.
+        :param started: time.perf_counter() taken first thing in the process,
+                        defaults to now
+        :param target_ms: Budget for the first frame
+        """
+        self.started = time.perf_counter() if started is None else started
+        self.target_ms = target_ms
+        self.marks = {}      # stage -> ms since process start
+        self.durations = {}  # step -> ms taken
+        self.engine = {}     # TorrentEngine.get_startup_stats()
+        # Stages are also reached on background threads
+        self._lock = threading.Lock()
+
+    def mark(self, stage):
+        """
+        Record that a stage was reached; only the first time counts.
+        :param stage: Stage name, e.g. 'first_frame'
+        """
+        elapsed = (time.perf_counter() - self.started) * 1000
+        with self._lock:
+            self.marks.setdefault(stage, elapsed)
+
+    @contextmanager
+    def timed(self, step):
+        """
+        Time a block of code, e.g. an import.
+        :param step: Step name
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.durations[step] = (time.perf_counter() - start) * 1000
+
+    def within_target(self):
+        """
+        :return: Whether the first frame came within the budget, None before it
+        """
+        first_frame = self.marks.get('first_frame')
+        if first_frame is None:
+            return None
+        return first_frame <= self.target_ms
+
+    def report(self):
+        """
+        :return: Dictionary with stage times, step durations, the engine's own
+                 startup times and whether the target was met
+        """
+        with self._lock:
+            return {
+                'marks_ms': dict(self.marks),
+                'durations_ms': dict(self.durations),
+                'engine_ms': dict(self.engine),
+                'first_frame_target_ms': self.target_ms,
+                'within_target': self.within_target(),
+            }
+
+    def to_json(self):
+        return json.dumps(self.report(), indent=2)
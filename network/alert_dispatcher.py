@@ -0,0 +1,192 @@
+import threading
+import time
+import libtorrent as lt
+
+# Longest time the loop blocks in wait_for_alert before checking timers and
+# the running flag
+MAX_WAIT_MS = 500
+
+
+class AlertDispatcher:
+    def __init__(self, session):
+        """
+        Blocks on session.wait_for_alert and routes alerts to callbacks,
+        either by exact alert type or by alert category.
+        :param session: libtorrent session to read alerts from
+        """
+        self.session = session
+        self._lock = threading.Lock()
+        self._handlers = {}      # alert class -> list of callbacks
+        self._subscribers = {}   # token -> (category mask, callback)
+        self._next_token = 0
+        self._timers = []        # [next due, interval or None for once, callback]
+
+        # Dispatch statistics
+        self._stats = {
+            'batches': 0,
+            'alerts': 0,
+            'dropped_alerts': 0,
+            'last_batch_size': 0,
+            'last_dispatch_ms': 0.0,
+            'max_dispatch_ms': 0.0,
+            'total_dispatch_ms': 0.0,
+            'handler_errors': 0,
+        }
+        self._per_type = {}      # alert name -> [count, total ms]
+
+        dropped_alert = getattr(lt, 'alerts_dropped_alert', None)
+        if dropped_alert is not None:
+            self.on(dropped_alert, self._on_alerts_dropped)
+
+    def on(self, alert_type, callback):
+        """
+        Call a function for every alert of one type.
+        :param alert_type: libtorrent alert class, e.g. lt.torrent_finished_alert
+        :param callback: Function taking the alert
+        """
+        with self._lock:
+            self._handlers.setdefault(alert_type, []).append(callback)
+
+    def subscribe(self, category, callback):
+        """
+        Call a function for every alert in one or more categories.
+        :param category: Mask of lt.alert.category_t values
+        :param callback: Function taking the alert
+        :return: Token to pass to unsubscribe
+        """
+        with self._lock:
+            self._next_token += 1
+            self._subscribers[self._next_token] = (int(category), callback)
+            return self._next_token
+
+    def unsubscribe(self, token):
+        """
+        Stop a subscription made with subscribe.
+        :param token: Token returned by subscribe
+        """
+        with self._lock:
+            self._subscribers.pop(token, None)
+
+    def subscribed_mask(self):
+        """
+        :return: Union of the category masks of all subscriptions
+        """
+        mask = 0
+        with self._lock:
+            for category, _ in self._subscribers.values():
+                mask |= category
+        return mask
+
+    def every(self, interval, callback):
+        """
+        Run a function on the alert thread at a fixed interval.
+        :param interval: Interval in seconds
+        :param callback: Function taking no arguments
+        """
+        with self._lock:
+            self._timers.append([time.monotonic() + interval, interval, callback])
+
+    def after(self, delay, callback):
+        """
+        Run a function once on the alert thread after a delay.
+        :param delay: Delay in seconds
+        :param callback: Function taking no arguments
+        """
+        with self._lock:
+            self._timers.append([time.monotonic() + delay, None, callback])
+
+    def run(self, is_running):
+        """
+        Dispatch alerts until is_running() returns False.
+        :param is_running: Function returning whether to keep going
+        """
+        while is_running():
+            self._run_timers()
+            if self.session.wait_for_alert(self._wait_ms()) is None:
+                continue
+            self.dispatch(self.session.pop_alerts())
+
+    def dispatch(self, alerts):
+        """
+        Route a batch of alerts to their callbacks.
+        :param alerts: List of alerts from pop_alerts
+        """
+        if not alerts:
+            return
+        start = time.perf_counter()
+        with self._lock:
+            handlers = {t: list(cbs) for t, cbs in self._handlers.items()}
+            subscribers = list(self._subscribers.values())
+
+        for alert in alerts:
+            alert_start = time.perf_counter()
+            for callback in handlers.get(type(alert), ()):
+                self._call(callback, alert)
+            if subscribers:
+                category = int(alert.category())
+                for mask, callback in subscribers:
+                    if category & mask:
+                        self._call(callback, alert)
+            entry = self._per_type.setdefault(type(alert).__name__, [0, 0.0])
+            entry[0] += 1
+            entry[1] += (time.perf_counter() - alert_start) * 1000
+
+        elapsed = (time.perf_counter() - start) * 1000
+        stats = self._stats
+        stats['batches'] += 1
+        stats['alerts'] += len(alerts)
+        stats['last_batch_size'] = len(alerts)
+        stats['last_dispatch_ms'] = elapsed
+        stats['max_dispatch_ms'] = max(stats['max_dispatch_ms'], elapsed)
+        stats['total_dispatch_ms'] += elapsed
+
+    def get_stats(self):
+        """
+        Get dispatch statistics.
+        :return: Dictionary with alert counts, drops, dispatch times in
+                 milliseconds and a per-alert-type breakdown
+        """
+        stats = dict(self._stats)
+        stats['avg_dispatch_ms'] = (stats['total_dispatch_ms'] / stats['batches']
+                                    if stats['batches'] else 0.0)
+        stats['per_type'] = {
+            name: {'count': count, 'total_ms': total}
+            for name, (count, total) in self._per_type.items()
+        }
+        return stats
+
+    def _call(self, callback, alert):
+        try:
+            callback(alert)
+        except Exception as e:
+            self._stats['handler_errors'] += 1
+            print(f"Alert handler error ({type(alert).__name__}): {e}")
+
+    def _on_alerts_dropped(self, alert):
+        # dropped_alerts is a bitset with one flag per alert type that was lost
+        dropped = sum(1 for flag in alert.dropped_alerts if flag)
+        self._stats['dropped_alerts'] += dropped
+        print(f"Alert queue overflowed, {dropped} alert types dropped")
+
+    def _run_timers(self):
+        now = time.monotonic()
+        with self._lock:
+            due = [timer for timer in self._timers if timer[0] <= now]
+            for timer in due:
+                if timer[1] is None:
+                    self._timers.remove(timer)
+                else:
+                    timer[0] = now + timer[1]
+        for timer in due:
+            try:
+                timer[2]()
+            except Exception as e:
+                print(f"Alert timer error: {e}")
+
+    def _wait_ms(self):
+        with self._lock:
+            if not self._timers:
+                return MAX_WAIT_MS
+            next_due = min(timer[0] for timer in self._timers)
+        wait = int((next_due - time.monotonic()) * 1000)
+        return max(0, min(wait, MAX_WAIT_MS))
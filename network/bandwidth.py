@@ -0,0 +1,182 @@
+import datetime
+import threading
+import libtorrent as lt
+
+# How often the time-of-day schedule is re-evaluated, in seconds
+SCHEDULE_INTERVAL = 30
+
+# Address ranges treated as the local network
+LAN_RANGES = [
+    ('10.0.0.0', '10.255.255.255'),
+    ('172.16.0.0', '172.31.255.255'),
+    ('192.168.0.0', '192.168.255.255'),
+    ('169.254.0.0', '169.254.255.255'),
+    ('127.0.0.0', '127.255.255.255'),
+    ('fc00::', 'fdff:ffff:ffff:ffff:ffff:ffff:ffff:ffff'),
+    ('fe80::', 'febf:ffff:ffff:ffff:ffff:ffff:ffff:ffff'),
+    ('::1', '::1'),
+]
+
+# Bandwidth priority of LAN peers relative to the global class (1)
+LAN_PRIORITY = 10
+
+# Built-in peer class ids (session::global_peer_class_id etc.)
+GLOBAL_PEER_CLASS = getattr(lt.session, 'global_peer_class_id', 0)
+LOCAL_PEER_CLASS = getattr(lt.session, 'local_peer_class_id', 2)
+
+
+def _parse_time(value):
+    hours, minutes = value.split(':')
+    return datetime.time(int(hours), int(minutes))
+
+
+class BandwidthSchedule:
+    def __init__(self, rules):
+        """
+        Time-of-day rate limits. Each rule is a dictionary:
+
+            {'start': '09:00', 'end': '17:30', 'days': [0, 1, 2, 3, 4],
+             'upload': 200 * 1024, 'download': 0}
+
+        'days' (0 = Monday) is optional, a window may wrap past midnight and
+        limits are bytes/s with 0 meaning unlimited. The first matching rule wins.
+        :param rules: List of rule dictionaries
+        """
+        self.rules = []
+        for rule in rules:
+            self.rules.append({
+                'start': _parse_time(rule['start']),
+                'end': _parse_time(rule['end']),
+                'days': set(rule['days']) if rule.get('days') is not None else None,
+                'upload': int(rule.get('upload', 0)),
+                'download': int(rule.get('download', 0)),
+            })
+
+    def limits_at(self, when):
+        """
+        :param when: datetime
+        :return: (upload, download) of the first matching rule, or None
+        """
+        now = when.time()
+        for rule in self.rules:
+            start, end = rule['start'], rule['end']
+            if start <= end:
+                inside = start <= now < end
+                day = when.weekday()
+            else:
+                # Window wraps midnight; after midnight it belongs to the previous day
+                inside = now >= start or now < end
+                day = when.weekday() if now >= start else (when.weekday() - 1) % 7
+            if inside and (rule['days'] is None or day in rule['days']):
+                return rule['upload'], rule['download']
+        return None
+
+
+class BandwidthManager:
+    def __init__(self, session):
+        """
+        Session-wide rate limits, a LAN peer class and the time-of-day schedule.
+        Every change is applied to the running session.
+        :param session: libtorrent session
+        """
+        self.session = session
+        self._lock = threading.Lock()
+        # Serialises apply(): it runs from the alert thread's schedule timer and
+        # from API calls on the engine thread
+        self._apply_lock = threading.Lock()
+        self.default_limits = (0, 0)  # (upload, download) outside scheduled windows
+        self.lan_limits = (0, 0)
+        self.schedule = None
+        self.applied = None           # (upload, download) last set on the session
+        self._setup_lan_class()
+        self.apply()
+
+    def _setup_lan_class(self):
+        # Local addresses only get the local peer class, so the global limits
+        # never throttle peers on the same network
+        peer_filter = lt.ip_filter()
+        peer_filter.add_rule('0.0.0.0', '255.255.255.255', 1 << GLOBAL_PEER_CLASS)
+        peer_filter.add_rule('::', 'ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff', 1 << GLOBAL_PEER_CLASS)
+        for first, last in LAN_RANGES:
+            peer_filter.add_rule(first, last, 1 << LOCAL_PEER_CLASS)
+        self.session.set_peer_class_filter(peer_filter)
+        self._set_lan_class()
+
+    def _set_lan_class(self):
+        upload, download = self.lan_limits
+        # The bindings want every field, so start from the current class
+        info = dict(self.session.get_peer_class(LOCAL_PEER_CLASS))
+        info.update({'upload_limit': upload, 'download_limit': download, 'label': 'lan',
+                     # Served first when bandwidth is short and never waiting
+                     # for an unchoke slot
+                     'upload_priority': LAN_PRIORITY, 'download_priority': LAN_PRIORITY,
+                     'ignore_unchoke_slots': True})
+        self.session.set_peer_class(LOCAL_PEER_CLASS, info)
+
+    def set_limits(self, upload=0, download=0):
+        """
+        Set the global limits used outside any scheduled window.
+        :param upload: Bytes/s, 0 for unlimited
+        :param download: Bytes/s, 0 for unlimited
+        """
+        with self._lock:
+            self.default_limits = (int(upload), int(download))
+        self.apply()
+
+    def set_lan_limits(self, upload=0, download=0):
+        """
+        Limit peers on the local network separately (unlimited by default).
+        :param upload: Bytes/s, 0 for unlimited
+        :param download: Bytes/s, 0 for unlimited
+        """
+        with self._lock:
+            self.lan_limits = (int(upload), int(download))
+        self._set_lan_class()
+
+    def set_schedule(self, rules):
+        """
+        Replace the time-of-day schedule.
+        :param rules: List of rule dictionaries (see BandwidthSchedule), None to clear
+        """
+        schedule = BandwidthSchedule(rules) if rules else None
+        with self._lock:
+            self.schedule = schedule
+        self.apply()
+
+    def current_limits(self, when=None):
+        """
+        :return: (upload, download) that should be in effect now
+        """
+        with self._lock:
+            schedule, default = self.schedule, self.default_limits
+        if schedule is not None:
+            limits = schedule.limits_at(when or datetime.datetime.now())
+            if limits is not None:
+                return limits
+        return default
+
+    def apply(self):
+        """Push the current limits to the session if they changed."""
+        with self._apply_lock:
+            limits = self.current_limits()
+            if limits == self.applied:
+                return
+            upload, download = limits
+            self.session.apply_settings({'upload_rate_limit': upload, 'download_rate_limit': download})
+            self.applied = limits
+        print(f"Rate limits: upload {upload or 'unlimited'}, download {download or 'unlimited'} (bytes/s)")
+
+    def get_limits(self):
+        """
+        :return: Dictionary with the limits in effect, LAN limits and whether a
+                 schedule is set
+        """
+        with self._apply_lock:
+            upload, download = self.applied or (0, 0)
+        return {
+            'upload_limit': upload,
+            'download_limit': download,
+            'lan_upload_limit': self.lan_limits[0],
+            'lan_download_limit': self.lan_limits[1],
+            'scheduled': self.schedule is not None,
+        }
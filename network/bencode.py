@@ -0,0 +1,101 @@
+class Raw(bytes):
+    """Already bencoded value, written out as is by encode()."""
+
+
+def encode(value):
+    """
+    Bencode a Python value.
+    :param value: int, str, bytes, Raw, list/tuple or dict with str/bytes keys
+    :return: Bencoded bytes
+    """
+    if isinstance(value, Raw):
+        return bytes(value)
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b'i%de' % value
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    if isinstance(value, bytes):
+        return b'%d:%s' % (len(value), value)
+    if isinstance(value, (list, tuple)):
+        return b'l' + b''.join(encode(item) for item in value) + b'e'
+    if isinstance(value, dict):
+        items = sorted((k.encode('utf-8') if isinstance(k, str) else k, v)
+                       for k, v in value.items())
+        return b'd' + b''.join(encode(k) + encode(v) for k, v in items) + b'e'
+    raise TypeError(f"Cannot bencode {type(value).__name__}")
+
+
+def raw_fields(data):
+    """
+    Split a bencoded dictionary into its keys and the still-encoded values.
+    Lets callers copy e.g. the 'info' dictionary of a .torrent byte for byte.
+    :param data: Bencoded dictionary
+    :return: Dictionary of key (bytes) -> Raw value
+    """
+    if data[:1] != b'd':
+        raise ValueError("Not a bencoded dictionary")
+    fields = {}
+    pos = 1
+    while data[pos:pos + 1] != b'e':
+        key_end = _skip(data, pos)
+        key = data[data.index(b':', pos) + 1:key_end]
+        value_end = _skip(data, key_end)
+        fields[key] = Raw(data[key_end:value_end])
+        pos = value_end
+    return fields
+
+
+def decode(data):
+    """
+    Decode a bencoded value.
+    :param data: Bencoded bytes
+    :return: int, bytes, list or dict with bytes keys
+    """
+    value, end = _decode(data, 0)
+    if end != len(data):
+        raise ValueError(f"Trailing data at offset {end}")
+    return value
+
+
+def _decode(data, pos):
+    kind = data[pos:pos + 1]
+    if kind == b'i':
+        end = data.index(b'e', pos)
+        return int(data[pos + 1:end]), end + 1
+    if kind == b'l':
+        items = []
+        pos += 1
+        while data[pos:pos + 1] != b'e':
+            item, pos = _decode(data, pos)
+            items.append(item)
+        return items, pos + 1
+    if kind == b'd':
+        items = {}
+        pos += 1
+        while data[pos:pos + 1] != b'e':
+            key, pos = _decode(data, pos)
+            items[key], pos = _decode(data, pos)
+        return items, pos + 1
+    if kind.isdigit():
+        colon = data.index(b':', pos)
+        end = colon + 1 + int(data[pos:colon])
+        return data[colon + 1:end], end
+    raise ValueError(f"Invalid bencoding at offset {pos}")
+
+
+def _skip(data, pos):
+    """Return the offset just past the bencoded value starting at pos."""
+    kind = data[pos:pos + 1]
+    if kind == b'i':
+        return data.index(b'e', pos) + 1
+    if kind in (b'l', b'd'):
+        pos += 1
+        while data[pos:pos + 1] != b'e':
+            pos = _skip(data, pos)
+        return pos + 1
+    if kind.isdigit():
+        colon = data.index(b':', pos)
+        return colon + 1 + int(data[pos:colon])
+    raise ValueError(f"Invalid bencoding at offset {pos}")
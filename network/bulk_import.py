@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from network.torrent_registry import info_hash_keys
+
+# Torrents handed to on_batch at a time
+BULK_BATCH_SIZE = 100
+# async_add_torrent calls waiting for their add_torrent_alert at once
+MAX_IN_FLIGHT = 256
+# How often a watch folder is scanned, in seconds
+WATCH_INTERVAL = 2.0
+
+
+class BulkImportJob:
+    def __init__(self, engine, sources, save_path=None, on_batch=None,
+                 batch_size=BULK_BATCH_SIZE, workers=None):
+        """
+        Import many .torrent files and magnet links without blocking.
+        Sources are parsed on a thread pool, added with async_add_torrent and
+        collected from add_torrent_alert.
+        :param engine: TorrentEngine to add to
+        :param sources: Iterable of .torrent paths and magnet URIs
+        :param save_path: Directory for the data, defaults to the download directory
+        :param on_batch: Optional function(list of (source, info_hash, handle))
+        :param batch_size: Number of added torrents per on_batch call
+        :param workers: Parser threads, CPU count if None
+        """
+        self.engine = engine
+        self.sources = list(sources)
+        self.save_path = save_path
+        self.on_batch = on_batch
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+
+        self.added = []    # (source, info_hash, handle)
+        self.errors = []   # (source, error message)
+        self.future = Future()
+        self._batch = []
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(MAX_IN_FLIGHT)
+        self._outstanding = 0
+        self._all_queued = False
+        self._cancelled = threading.Event()
+        self._start_time = None
+        self._end_time = None
+
+    @property
+    def progress(self):
+        if not self.sources:
+            return 1.0
+        return (len(self.added) + len(self.errors)) / len(self.sources)
+
+    def start(self):
+        """
+        Run the import on a background thread.
+        :return: self
+        """
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def cancel(self):
+        """Stop queueing new sources; ones already queued still complete."""
+        self._cancelled.set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """
+        Wait for the import.
+        :return: Statistics dictionary, see stats()
+        """
+        return self.future.result(timeout)
+
+    def stats(self):
+        """
+        :return: Dictionary with counts, errors, elapsed seconds and
+                 items per second
+        """
+        end = self._end_time or time.perf_counter()
+        elapsed = end - self._start_time if self._start_time else 0.0
+        done = len(self.added) + len(self.errors)
+        return {
+            'total': len(self.sources),
+            'added': len(self.added),
+            'failed': len(self.errors),
+            'errors': list(self.errors),
+            'seconds': elapsed,
+            'items_per_second': done / elapsed if elapsed else 0.0,
+        }
+
+    def _run(self):
+        self._start_time = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                parsed = pool.map(self._parse, self.sources)
+                for source, params, error in parsed:
+                    if self._cancelled.is_set():
+                        break
+                    if error is not None:
+                        self._record_error(source, error)
+                        continue
+                    keys = info_hash_keys(params)
+                    if not keys:
+                        self._record_error(source, "No info-hash")
+                        continue
+                    self._slots.acquire()
+                    with self._lock:
+                        self._outstanding += 1
+                    self.engine.add_torrent_async(
+                        params, lambda handle, error, source=source, key=keys[0]:
+                        self._on_added(source, key, handle, error))
+        except Exception as e:
+            self._finish(e)
+            return
+        with self._lock:
+            self._all_queued = True
+            finished = self._outstanding == 0
+        if finished:
+            self._finish()
+
+    def _parse(self, source):
+        try:
+            return source, self.engine.make_add_params(source, self.save_path), None
+        except Exception as e:
+            return source, None, f"{type(e).__name__}: {e}"
+
+    def _on_added(self, source, info_hash, handle, error):
+        # Runs on the alert thread
+        self._slots.release()
+        if error is not None:
+            self._record_error(source, error)
+        else:
+            batch = None
+            with self._lock:
+                entry = (source, info_hash, handle)
+                self.added.append(entry)
+                self._batch.append(entry)
+                if len(self._batch) >= self.batch_size:
+                    batch, self._batch = self._batch, []
+            if batch and self.on_batch:
+                self.on_batch(batch)
+        with self._lock:
+            self._outstanding -= 1
+            finished = self._all_queued and self._outstanding == 0
+        if finished:
+            self._finish()
+
+    def _record_error(self, source, error):
+        with self._lock:
+            self.errors.append((source, error))
+        print(f"Could not import {source}: {error}")
+
+    def _finish(self, error=None):
+        with self._lock:
+            batch, self._batch = self._batch, []
+        if batch and self.on_batch:
+            self.on_batch(batch)
+        self._end_time = time.perf_counter()
+        if error is not None:
+            self.future.set_exception(error)
+            return
+        stats = self.stats()
+        print(f"Imported {stats['added']} torrents ({stats['failed']} failed) "
+              f"in {stats['seconds']:.1f}s, {stats['items_per_second']:.0f}/s")
+        self.future.set_result(stats)
+
+
+class WatchFolder:
+    def __init__(self, engine, directory, save_path=None, interval=WATCH_INTERVAL):
+        """
+        Imports .torrent files and .magnet files (one magnet URI per line)
+        dropped into a directory. Imported files are renamed to *.added, files
+        that failed to *.failed, so they are not picked up again.
+        :param engine: TorrentEngine to add to
+        :param directory: Directory to watch
+        :param save_path: Directory for the data, defaults to the download directory
+        :param interval: Seconds between scans
+        """
+        self.engine = engine
+        self.directory = directory
+        self.save_path = save_path
+        self.interval = interval
+        self.imported = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def scan(self):
+        """
+        Import whatever is in the folder now.
+        :return: Number of torrents added
+        """
+        files = {}  # source -> file it came from
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith('.torrent'):
+                files[entry.path] = entry.path
+            elif entry.name.endswith('.magnet'):
+                with open(entry.path) as f:
+                    for line in f:
+                        if line.strip().startswith('magnet:'):
+                            files[line.strip()] = entry.path
+        if not files:
+            return 0
+
+        stats = BulkImportJob(self.engine, list(files), self.save_path).start().result()
+        failed_files = {files[source] for source, _ in stats['errors']}
+        for path in set(files.values()):
+            suffix = '.failed' if path in failed_files else '.added'
+            try:
+                os.replace(path, path + suffix)
+            except OSError as e:
+                print(f"Could not rename {path}: {e}")
+        self.imported += stats['added']
+        return stats['added']
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"Watch folder error: {e}")
@@ -0,0 +1,370 @@
+"""
+Headless seeding daemon with a local JSON control API.
+
+Clients connect over localhost TCP (or a Unix socket) and send one JSON value
+per line: a request object or a list of requests (a batch). Responses come back
+the same way, one line per request or batch.
+
+    {"id": 1, "method": "add", "params": {"torrent": "notes.pdf.torrent"}}
+    [{"id": 2, "method": "pause", "params": {"info_hashes": ["..."]}},
+     {"id": 3, "method": "stats"}]
+
+Methods: add, import, share, publish, follow, remove, pause, resume, status, files, prioritize,
+limits, profile, verify, integrity, stats, metrics, subscribe.
+After "subscribe" the connection also receives status and integrity events:
+
+    {"event": "status", "version": 12, "changed": [...], "removed": [...]}
+    {"event": "integrity", "type": "bad_pieces", "info_hash": "...", "pieces": [3, 4], ...}
+
+Usage (from the repository root):
+    python -m network.daemon --download-dir files --port 6880
+    python -m network.daemon --download-dir files --unix /tmp/p2pnotes.sock
+    python -m network.daemon --download-dir files --lan
+    python -m network.daemon --download-dir files --profile seedbox-high-throughput
+    python -m network.daemon --download-dir /mnt/hdd --storage allocate --aio-threads 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+
+from network.engine_worker import EngineWorker
+from network.integrity import VERIFY_RATE
+from network.profiles import DEFAULT_PROFILE
+from network.storage import STORAGE_MODES, DISK_BACKENDS, DEFAULT_STORAGE_MODE, DEFAULT_DISK_BACKEND
+from network.torrent_registry import info_hash_keys
+
+DEFAULT_PORT = 6880
+# How often status events are pushed to subscribers
+EVENT_INTERVAL = 1.0
+
+
+class DaemonError(Exception):
+    pass
+
+
+class ControlServer:
+    def __init__(self, worker):
+        """
+        JSON-lines control API in front of an EngineWorker.
+        :param worker: Started EngineWorker
+        """
+        self.worker = worker
+        self.subscribers = set()  # asyncio.Queue per subscribed connection
+        # Request tasks; the event loop only keeps weak references to tasks
+        self.tasks = set()
+        self.methods = {
+            'add': self.add,
+            'import': self.bulk_import,
+            'share': self.share,
+            'publish': self.publish,
+            'follow': self.follow,
+            'remove': self.remove,
+            'pause': self.pause,
+            'resume': self.resume,
+            'status': self.status,
+            'files': self.files,
+            'prioritize': self.prioritize,
+            'limits': self.limits,
+            'profile': self.profile,
+            'verify': self.verify,
+            'integrity': self.integrity,
+            'stats': self.stats,
+            'metrics': self.metrics,
+        }
+
+    async def engine(self, fn):
+        """Run fn(engine) on the engine thread and await the result."""
+        return await asyncio.wrap_future(self.worker.call(fn))
+
+    async def add(self, torrent=None, magnet=None, save_path=None, storage=None):
+        if magnet:
+            add = lambda engine: info_hash_keys(engine.add_magnet_link(magnet, storage))
+        elif torrent:
+            add = lambda engine: info_hash_keys(engine.add_torrent_file(torrent, save_path, storage))
+        else:
+            raise DaemonError("add needs 'torrent' or 'magnet'")
+        return {'info_hashes': await self.engine(add)}
+
+    async def bulk_import(self, sources=(), directory=None, save_path=None):
+        if directory:
+            sources = list(sources) + [os.path.join(directory, name) for name in os.listdir(directory)
+                                       if name.endswith('.torrent')]
+        if not sources:
+            raise DaemonError("import needs 'sources' or 'directory'")
+        job = await self.engine(lambda engine: engine.bulk_import(sources, save_path))
+        return await asyncio.wrap_future(job.future)
+
+    async def share(self, path):
+        job = await self.engine(lambda engine: engine.create_torrent_async(path))
+        torrent_path = await asyncio.wrap_future(job.future)
+        save_path = os.path.dirname(os.path.normpath(os.path.abspath(path)))
+        keys = await self.engine(
+            lambda engine: info_hash_keys(engine.add_torrent_file(torrent_path, save_path)))
+        return {'torrent': torrent_path, 'info_hashes': keys}
+
+    async def publish(self, path, feed_id=None):
+        future = await self.engine(lambda engine: engine.publish_version(path, feed_id))
+        return await asyncio.wrap_future(future)
+
+    async def follow(self, url, save_path=None):
+        await self.engine(lambda engine: engine.follow_feed(url, save_path))
+        return {'following': url}
+
+    async def remove(self, info_hashes, delete_files=False):
+        await self.engine(lambda engine: engine.remove_torrents(info_hashes, delete_files))
+        return {'removed': len(info_hashes)}
+
+    async def pause(self, info_hashes):
+        await self.engine(lambda engine: engine.pause_torrents(info_hashes))
+        return {'paused': len(info_hashes)}
+
+    async def resume(self, info_hashes):
+        await self.engine(lambda engine: engine.resume_torrents(info_hashes))
+        return {'resumed': len(info_hashes)}
+
+    async def status(self, info_hash=None, since=0):
+        if info_hash is not None:
+            # The status cache is keyed by primary key; accept the v1 or v2 hash
+            return await self.engine(lambda engine: engine.status_cache.get(
+                engine.torrents.primary_key(info_hash) or info_hash))
+        return await self.engine(lambda engine: engine.get_status_changes(since))
+
+    async def files(self, info_hash):
+        return await self.engine(lambda engine: engine.get_torrent_files(info_hash))
+
+    async def prioritize(self, info_hash, files=None, pieces=None, rules=None):
+        def apply(engine):
+            if rules:
+                engine.apply_file_rules(info_hash, rules)
+            if files is not None:
+                engine.prioritize_files(info_hash, files)
+            if pieces is not None:
+                engine.prioritize_pieces(info_hash, pieces)
+            return engine.get_torrent_files(info_hash)
+        return await self.engine(apply)
+
+    async def verify(self, info_hashes=None, recheck=False, rate=None):
+        if recheck and not info_hashes:
+            raise DaemonError("recheck needs 'info_hashes'")
+
+        def apply(engine):
+            if rate is not None:
+                engine.set_verify_rate(rate)
+            if recheck:
+                for info_hash in info_hashes:
+                    engine.recheck_torrent(info_hash)
+                return {'rechecking': list(info_hashes)}
+            return {'queued': engine.verify_torrents(info_hashes)}
+        return await self.engine(apply)
+
+    async def integrity(self, since=0):
+        return await self.engine(lambda engine: dict(engine.get_integrity_events(since),
+                                                      stats=engine.get_integrity_stats()))
+
+    async def limits(self, upload=None, download=None, lan_upload=None, lan_download=None,
+                     schedule=None, info_hash=None):
+        def apply(engine):
+            if info_hash is not None:
+                if upload is not None or download is not None:
+                    engine.set_torrent_rate_limits(info_hash, upload or 0, download or 0)
+                return engine.get_torrent_rate_limits(info_hash)
+            if upload is not None or download is not None:
+                engine.set_rate_limits(upload or 0, download or 0)
+            if lan_upload is not None or lan_download is not None:
+                engine.set_lan_rate_limits(lan_upload or 0, lan_download or 0)
+            if schedule is not None:
+                engine.set_bandwidth_schedule(schedule)
+            return engine.get_bandwidth()
+        return await self.engine(apply)
+
+    async def profile(self, name=None, settings=None):
+        """
+        Switch the performance profile, by name or as a dictionary of settings.
+        Without arguments, report the active profile and the ones available.
+        """
+        def apply(engine):
+            applied = None
+            if name is not None or settings is not None:
+                applied = engine.apply_profile(settings if settings is not None else name)
+            return {'profile': engine.profile, 'profiles': sorted(engine.profiles), 'applied': applied}
+        return await self.engine(apply)
+
+    async def stats(self):
+        return await self.engine(lambda engine: {
+            'session': engine.get_session_stats(),
+            'alerts': engine.get_alert_stats(),
+            'bandwidth': engine.get_bandwidth(),
+            'disk': engine.get_disk_options(),
+            'integrity': engine.get_integrity_stats(),
+            'hash_cache': engine.get_hash_cache_stats(),
+        })
+
+    async def metrics(self, format='json', history=False):
+        return await self.engine(lambda engine: engine.export_metrics(format, history))
+
+    async def handle_request(self, request, events):
+        if not isinstance(request, dict):
+            return {'id': None, 'error': "Request must be an object"}
+        request_id = request.get('id')
+        method = request.get('method')
+        if method == 'subscribe':
+            self.subscribers.add(events)
+            return {'id': request_id, 'result': {'subscribed': True}}
+        handler = self.methods.get(method)
+        if handler is None:
+            return {'id': request_id, 'error': f"Unknown method: {method}"}
+        try:
+            result = await handler(**request.get('params', {}))
+            return {'id': request_id, 'result': result}
+        except Exception as e:
+            return {'id': request_id, 'error': f"{type(e).__name__}: {e}"}
+
+    async def handle_client(self, reader, writer):
+        events = asyncio.Queue()
+        sender = asyncio.ensure_future(self._send_events(events, writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError as e:
+                    await events.put({'id': None, 'error': f"Invalid JSON: {e}"})
+                    continue
+                # Each line is served in its own task so slow requests (e.g.
+                # share) do not hold up the rest of the connection
+                task = asyncio.ensure_future(self._serve(message, events))
+                self.tasks.add(task)
+                task.add_done_callback(self._task_done)
+        finally:
+            self.subscribers.discard(events)
+            sender.cancel()
+            writer.close()
+
+    def _task_done(self, task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Request task failed: {task.exception()}")
+
+    async def _serve(self, message, events):
+        if isinstance(message, list):
+            response = await asyncio.gather(
+                *(self.handle_request(request, events) for request in message))
+            await events.put(list(response))
+        else:
+            await events.put(await self.handle_request(message, events))
+
+    async def _send_events(self, events, writer):
+        while True:
+            message = await events.get()
+            writer.write(json.dumps(message).encode('utf-8') + b'\n')
+            await writer.drain()
+
+    async def broadcast_status(self):
+        """Push status deltas and integrity events to subscribers; one engine call per tick."""
+        version = 0
+        seq = None  # Only events after the daemon started are pushed
+        while True:
+            await asyncio.sleep(EVENT_INTERVAL)
+            try:
+                if seq is None:
+                    seq = await self.engine(lambda engine: engine.get_integrity_events(0)['seq'])
+                if not self.subscribers:
+                    continue
+                delta, integrity = await self.engine(lambda engine: (
+                    engine.get_status_changes(version), engine.get_integrity_events(seq)))
+            except Exception as e:
+                # Keep pushing to subscribers after a failed tick
+                print(f"Could not read status for subscribers: {e}")
+                continue
+            version = delta['version']
+            seq = integrity['seq']
+            messages = [dict(event, event='integrity') for event in integrity['events']]
+            if delta['changed'] or delta['removed']:
+                messages.insert(0, dict(delta, event='status'))
+            for message in messages:
+                for events in list(self.subscribers):
+                    await events.put(message)
+
+
+async def serve(download_dir, port=DEFAULT_PORT, unix_path=None, **engine_kwargs):
+    """
+    Run the daemon until SIGINT/SIGTERM.
+    :param download_dir: Download directory of the engine
+    :param port: Localhost TCP port, used when unix_path is None
+    :param unix_path: Unix socket path
+    :param engine_kwargs: Extra TorrentEngine arguments
+    """
+    worker = EngineWorker(download_dir, **engine_kwargs)
+    await asyncio.wrap_future(worker.start())
+    control = ControlServer(worker)
+
+    if unix_path:
+        server = await asyncio.start_unix_server(control.handle_client, path=unix_path)
+        print(f"Control API listening on {unix_path}")
+    else:
+        server = await asyncio.start_server(control.handle_client, '127.0.0.1', port)
+        print(f"Control API listening on 127.0.0.1:{port}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C raises KeyboardInterrupt instead
+
+    broadcaster = asyncio.ensure_future(control.broadcast_status())
+    try:
+        await stop.wait()
+    finally:
+        broadcaster.cancel()
+        server.close()
+        await server.wait_closed()
+        await asyncio.wrap_future(worker.stop())
+        if unix_path and os.path.exists(unix_path):
+            os.remove(unix_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--download-dir', default=os.path.join(os.getcwd(), "files"))
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', help="Listen on this Unix socket instead of TCP")
+    parser.add_argument('--lan', action='store_true', help="Run a local tracker, no internet discovery")
+    parser.add_argument('--tracker', action='append', dest='trackers',
+                        help="Tracker URL for created torrents (repeatable)")
+    parser.add_argument('--profile', default=DEFAULT_PROFILE,
+                        help="Performance profile, e.g. desktop, seedbox-high-throughput, low-memory")
+    parser.add_argument('--profiles', help="JSON file with extra profiles (see network/profiles.py)")
+    parser.add_argument('--storage', choices=sorted(STORAGE_MODES), default=DEFAULT_STORAGE_MODE,
+                        help="'allocate' keeps files contiguous on spinning disks")
+    parser.add_argument('--disk-backend', choices=sorted(DISK_BACKENDS), default=DEFAULT_DISK_BACKEND,
+                        help="Disk I/O backend (libtorrent 2.x)")
+    parser.add_argument('--aio-threads', type=int, help="Disk I/O threads")
+    parser.add_argument('--hashing-threads', type=int, help="Piece hashing threads")
+    parser.add_argument('--cache-mb', type=int, help="Block cache size (libtorrent 1.2)")
+    parser.add_argument('--prefetch-kb', type=int, help="Read-ahead budget for seeding")
+    parser.add_argument('--verify-mb-s', type=float, default=VERIFY_RATE / (1024 * 1024),
+                        help="Read rate of the background integrity verifier, 0 for unlimited")
+    parser.add_argument('--no-verify', action='store_true', help="Do not verify seeded files")
+    args = parser.parse_args()
+    disk_options = {key: getattr(args, key) for key in
+                    ('aio_threads', 'hashing_threads', 'cache_mb', 'prefetch_kb')
+                    if getattr(args, key) is not None}
+    try:
+        asyncio.run(serve(args.download_dir, args.port, args.unix,
+                          profile=args.profile, profiles_path=args.profiles,
+                          trackers=args.trackers, lan_mode=args.lan, storage=args.storage,
+                          disk_backend=args.disk_backend, disk_options=disk_options,
+                          verify_rate=None if args.no_verify else int(args.verify_mb_s * 1024 * 1024)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from network.torrent_engine import TorrentEngine
+
+
+class EngineWorker:
+    def __init__(self, download_dir, **engine_kwargs):
+        """
+        Owns a TorrentEngine on a dedicated thread.
+        Every engine call is queued to that thread and answered with a
+        concurrent.futures.Future, so callers (the Tk main loop) never block on
+        libtorrent or the disk.
+        :param download_dir: Download directory passed to TorrentEngine
+        :param engine_kwargs: Extra TorrentEngine arguments
+        """
+        self.download_dir = download_dir
+        self.engine_kwargs = engine_kwargs
+        self.engine = None
+        self.started = Future()
+        self._commands = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="engine-worker", daemon=True)
+
+    def start(self):
+        """
+        Start the worker thread and build the engine on it.
+        :return: Future resolving to the TorrentEngine
+        """
+        self._thread.start()
+        return self.started
+
+    def submit(self, method, *args, **kwargs):
+        """
+        Call a TorrentEngine method on the worker thread.
+        :param method: Name of the TorrentEngine method
+        :return: Future with the method's return value
+        """
+        return self.call(lambda engine: getattr(engine, method)(*args, **kwargs))
+
+    def call(self, fn):
+        """
+        Run a function taking the engine on the worker thread.
+        :param fn: Function(engine)
+        :return: Future with the function's return value
+        """
+        future = Future()
+        self._commands.put((future, fn))
+        return future
+
+    def stop(self):
+        """
+        Stop the engine and let the worker thread exit.
+        :return: Future completing once the engine is stopped
+        """
+        future = self.call(lambda engine: engine.stop_all())
+        self._commands.put(None)
+        return future
+
+    def _run(self):
+        try:
+            self.engine = TorrentEngine(self.download_dir, **self.engine_kwargs)
+        except BaseException as e:
+            self.started.set_exception(e)
+            # Fail every queued call instead of leaving callers waiting
+            self._fail_pending(e)
+            return
+        # Background jobs (feed followers, torrent creation) hand engine work back here
+        self.engine.worker = self
+        self.started.set_result(self.engine)
+
+        while True:
+            command = self._commands.get()
+            if command is None:
+                break
+            future, fn = command
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(self.engine))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _fail_pending(self, error):
+        while True:
+            command = self._commands.get()
+            if command is None:
+                break
+            future, _ = command
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
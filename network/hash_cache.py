@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from network.bencode import Raw, encode, raw_fields
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    root TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    files TEXT NOT NULL,
+    info BLOB NOT NULL,
+    piece_layers BLOB,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    options TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS entries_root ON entries (root);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+"""
+
+
+def file_stats(path):
+    """
+    Identify the current contents of a file or directory by metadata only.
+    :param path: File or directory
+    :return: Sorted list of [path, size, mtime_ns, inode] for every file
+    """
+    path = os.path.abspath(path)
+    if os.path.isfile(path):
+        paths = [path]
+    else:
+        paths = []
+        for dirpath, dirnames, filenames in os.walk(path):
+            paths.extend(os.path.join(dirpath, name) for name in filenames)
+        paths.sort()
+    stats = []
+    for file_path in paths:
+        st = os.stat(file_path)
+        stats.append([file_path, st.st_size, st.st_mtime_ns, st.st_ino])
+    return stats
+
+
+class HashCache:
+    def __init__(self, db_path, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Persistent cache of generated info-dicts and piece hashes.
+        Entries are keyed by the (path, size, mtime, inode) of every file plus the
+        creation options, and record their content digest (the v1 info-hash), so
+        an unchanged file is re-shared without reading it again.
+        :param db_path: SQLite database file
+        :param max_bytes: Size limit; least recently used entries are evicted
+        """
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        # Databases from before per-option invalidation lack the column
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(entries)")]
+        if 'options' not in columns:
+            self._db.execute("ALTER TABLE entries ADD COLUMN options TEXT NOT NULL DEFAULT ''")
+            self._db.commit()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def make_key(self, path, options):
+        """
+        Compute the cache key for sharing a path with the given options.
+        :param path: File or directory
+        :param options: JSON-serialisable creation options (piece size, v1/v2, ...)
+        :return: (key, file stats) to pass to get/put
+        """
+        stats = file_stats(path)
+        blob = json.dumps([os.path.abspath(path), options, stats])
+        return hashlib.sha1(blob.encode('utf-8')).hexdigest(), stats
+
+    def get(self, key):
+        """
+        Look up a cached torrent.
+        :param key: Key from make_key
+        :return: (info, piece_layers) as bencoded bytes (piece_layers may be
+                 None), or None on a miss
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT info, piece_layers FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats['misses'] += 1
+                return None
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?",
+                             (time.time(), key))
+            self._db.commit()
+            self._stats['hits'] += 1
+            return row[0], row[1]
+
+    def put(self, key, path, stats, torrent_data, options=None):
+        """
+        Store the result of creating a torrent.
+        Older entries for the same path and options are dropped, since the files
+        changed; entries made with other options stay usable.
+        :param key: Key from make_key
+        :param path: The shared file or directory
+        :param stats: File stats from make_key
+        :param torrent_data: Bencoded .torrent
+        :param options: Creation options passed to make_key
+        :return: Content digest of the entry
+        """
+        fields = raw_fields(torrent_data)
+        info = bytes(fields[b'info'])
+        piece_layers = fields.get(b'piece layers')
+        piece_layers = bytes(piece_layers) if piece_layers is not None else None
+        digest = hashlib.sha1(info).hexdigest()
+        size = len(info) + len(piece_layers or b'')
+        root = os.path.abspath(path)
+        options = json.dumps(options, sort_keys=True)
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM entries WHERE root = ? AND options = ? AND key != ?",
+                (root, options, key))
+            self._stats['invalidations'] += cursor.rowcount
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, root, digest, files, info, piece_layers, "
+                "size, last_used, options) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, root, digest, json.dumps(stats), info, piece_layers, size, time.time(),
+                 options))
+            self._evict()
+            self._db.commit()
+        return digest
+
+    def purge_stale(self):
+        """
+        Drop entries whose files were changed, moved or deleted.
+        :return: Number of entries dropped
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT key, files FROM entries").fetchall()
+        stale = []
+        for key, files in rows:
+            for file_path, size, mtime_ns, inode in json.loads(files):
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    stale.append(key)
+                    break
+                if (st.st_size, st.st_mtime_ns, st.st_ino) != (size, mtime_ns, inode):
+                    stale.append(key)
+                    break
+        with self._lock:
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in stale])
+            self._db.commit()
+            self._stats['invalidations'] += len(stale)
+        return len(stale)
+
+    def get_stats(self):
+        """
+        :return: Dictionary with hits, misses, hit_ratio, evictions,
+                 invalidations, entries and bytes
+        """
+        with self._lock:
+            entries, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = entries
+        stats['bytes'] = size
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+                "SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            self._stats['evictions'] += 1
+
+
+def build_torrent(info, piece_layers, trackers, creator):
+    """
+    Assemble a .torrent from a cached info-dict.
+    :param info: Bencoded info dictionary
+    :param piece_layers: Bencoded v2 piece layers or None
+    :param trackers: Tracker URLs
+    :param creator: 'created by' string
+    :return: Bencoded .torrent
+    """
+    torrent = {
+        'created by': creator,
+        'creation date': int(time.time()),
+        'info': Raw(info),
+    }
+    if trackers:
+        torrent['announce'] = trackers[0]
+        if len(trackers) > 1:
+            torrent['announce-list'] = [list(trackers)]
+    if piece_layers is not None:
+        torrent['piece layers'] = Raw(piece_layers)
+    return encode(torrent)
@@ -0,0 +1,445 @@
+"""
+Background integrity verification of seeded data.
+
+The verifier walks seeding torrents file by file and re-hashes their pieces
+against the v1 piece hashes in the metadata. It reads at most `rate` bytes/s,
+so seeding and the rest of the machine keep their disk bandwidth. Files whose
+mtime or size changed since they were last verified go first, newest first;
+after that the unchanged files are swept, least recently verified first.
+
+Bad pieces are acted on as soon as the file holding them is done, not at the
+end of a pass. The torrent is handed to force_recheck: libtorrent re-hashes
+it, marks every piece that fails as missing and downloads those pieces again
+from the swarm. Pure v2 torrents have no v1 piece hashes, so they are only
+rechecked when one of their files changed on disk.
+
+Only data under the engine's download directory is repaired automatically.
+Torrents shared in place from elsewhere (the user's own folders) would have
+the user's files overwritten with the swarm's copy, so their bad pieces are
+reported only. The same goes for versions of a feed this node publishes (see
+network/versions.py): an edit there is new content waiting to be published,
+not damage.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import libtorrent as lt
+from network.torrent_registry import info_hash_keys
+
+# Bytes read per second for verification, 0 for unlimited
+VERIFY_RATE = 16 * 1024 * 1024
+READ_CHUNK = 1024 * 1024
+# Wait after startup before the first pass, and between passes
+VERIFY_START_DELAY = 60
+VERIFY_INTERVAL = 600
+# Unchanged files are verified again after this long
+REVERIFY_AGE = 7 * 24 * 3600
+# Events kept for events_since
+MAX_EVENTS = 1000
+
+
+class RateLimiter:
+    def __init__(self, rate):
+        """
+        Token bucket holding at most one second of budget.
+        :param rate: Bytes per second, 0 for unlimited
+        """
+        self.rate = rate
+        self._allowance = rate
+        self._last = time.monotonic()
+
+    def consume(self, amount, stop):
+        """
+        Wait until amount bytes may be read.
+        :param amount: Bytes about to be read
+        :param stop: threading.Event that cuts the wait short
+        :return: False if stop was set while waiting
+        """
+        if not self.rate:
+            return not stop.is_set()
+        now = time.monotonic()
+        self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate)
+        self._last = now
+        self._allowance -= amount
+        if self._allowance < 0:
+            return not stop.wait(-self._allowance / self.rate)
+        return not stop.is_set()
+
+
+def _has_v1_hashes(torrent_info):
+    hashes = getattr(torrent_info, 'info_hashes', None)
+    return hashes is None or hashes().has_v1()
+
+
+def _save_path(handle):
+    flag = getattr(lt.torrent_handle, 'query_save_path', None)
+    return (handle.status(flag) if flag is not None else handle.status()).save_path
+
+
+class IntegrityVerifier:
+    def __init__(self, engine, state_path, rate=VERIFY_RATE, interval=VERIFY_INTERVAL,
+                 start_delay=VERIFY_START_DELAY):
+        """
+        :param engine: TorrentEngine
+        :param state_path: JSON file remembering when each file was verified
+        :param rate: Bytes per second read for verification, 0 for unlimited
+        :param interval: Seconds between passes
+        :param start_delay: Seconds before the first pass
+        """
+        self.engine = engine
+        self.state_path = state_path
+        self.interval = interval
+        self.start_delay = start_delay
+        self.limiter = RateLimiter(rate)
+        self._lock = threading.Lock()
+        self._state = self._load_state()  # info_hash -> {path: [size, mtime_ns, verified at]}
+        self._requested = deque()         # info_hashes to verify fully, first
+        self._repairing = {}              # info_hash -> bad pieces handed to force_recheck
+        self._events = deque(maxlen=MAX_EVENTS)
+        self._seq = 0
+        self.counters = {
+            'passes': 0,
+            'files_verified': 0,
+            'pieces_verified': 0,
+            'bytes_verified': 0,
+            'bad_pieces': 0,
+            'changed_files': 0,
+            'repairs_started': 0,
+            'repairs_completed': 0,
+        }
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="integrity", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread.is_alive():
+            # The verifier thread saves the state on its way out
+            self._thread.join()
+        else:
+            self._save_state()
+
+    def set_rate(self, rate):
+        """
+        :param rate: Bytes per second, 0 for unlimited
+        """
+        self.limiter.rate = rate
+
+    def request(self, info_hash):
+        """
+        Verify every file of a torrent in the next pass, starting now.
+        :param info_hash: Primary key of the torrent
+        """
+        with self._lock:
+            if info_hash not in self._requested:
+                self._requested.append(info_hash)
+        self._wake.set()
+
+    def forget(self, info_hash):
+        """Drop the state of a removed torrent."""
+        with self._lock:
+            self._state.pop(info_hash, None)
+            self._repairing.pop(info_hash, None)
+
+    def repair(self, info_hash, handle, pieces=()):
+        """
+        Recheck a torrent so pieces failing their hash are downloaded again.
+        :param info_hash: Primary key of the torrent
+        :param handle: Torrent handle
+        :param pieces: Bad pieces found, for the events
+        """
+        with self._lock:
+            self._repairing[info_hash] = sorted(pieces)
+            self.counters['repairs_started'] += 1
+        handle.force_recheck()
+        self._emit('repair_started', info_hash, pieces=sorted(pieces))
+
+    def on_torrent_finished(self, alert):
+        """torrent_finished_alert: a repaired torrent has all its pieces again"""
+        for key in self._keys(alert):
+            self._repaired(key)
+
+    def on_torrent_checked(self, alert):
+        """
+        torrent_checked_alert: when the recheck found nothing missing the
+        torrent goes straight back to seeding and never finishes again
+        """
+        if not alert.handle.is_valid() or not alert.handle.status().is_seeding:
+            return
+        for key in self._keys(alert):
+            self._repaired(key)
+
+    def _repaired(self, key):
+        with self._lock:
+            pieces = self._repairing.pop(key, None)
+            if pieces is None:
+                return
+            self.counters['repairs_completed'] += 1
+            # Files were rewritten; their mtimes no longer match the state
+            self._state.pop(key, None)
+        self._emit('repaired', key, pieces=pieces)
+
+    def events_since(self, seq):
+        """
+        :param seq: Sequence number of the last event seen, 0 for all
+        :return: (newest sequence number, list of event dictionaries)
+        """
+        with self._lock:
+            return self._seq, [event for event in self._events if event['seq'] > seq]
+
+    def get_stats(self):
+        """
+        :return: Dictionary of counters plus torrents being repaired and the rate
+        """
+        with self._lock:
+            stats = dict(self.counters)
+            stats['repairing'] = len(self._repairing)
+        stats['rate'] = self.limiter.rate
+        return stats
+
+    def _keys(self, alert):
+        return [key for key in (self.engine.torrents.primary_key(k) for k in info_hash_keys(alert))
+                if key is not None]
+
+    def _emit(self, kind, info_hash, **fields):
+        with self._lock:
+            self._seq += 1
+            event = {'seq': self._seq, 'time': time.time(), 'type': kind, 'info_hash': info_hash}
+            event.update(fields)
+            self._events.append(event)
+        print(f"Integrity {kind}: {info_hash} {fields or ''}")
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        with self._lock:
+            data = json.dumps(self._state)
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp = self.state_path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, self.state_path)
+
+    def _run(self):
+        # The state file is only written from this thread while it runs
+        try:
+            if self._stop.wait(self.start_delay):
+                return
+            while not self._stop.is_set():
+                try:
+                    self.run_pass()
+                except Exception as e:
+                    print(f"Integrity pass failed: {e}")
+                self._wake.wait(self.interval)
+                self._wake.clear()
+        finally:
+            self._save_state()
+
+    def plan(self):
+        """
+        Pick the files to verify in this pass: changed and requested files
+        newest first, then never verified ones newest first, then those not
+        verified for REVERIFY_AGE, oldest check first.
+        :return: List of (info_hash, handle, file index, path, size, mtime_ns, changed)
+        """
+        with self._lock:
+            requested = set(self._requested)
+            self._requested.clear()
+            repairing = set(self._repairing)
+        now = time.time()
+        changed, unverified, stale = [], [], []
+        for key, handle in self.engine.torrents.items():
+            status = self.engine.status_cache.get(key)
+            if key in repairing or not status or not status['is_seeding']:
+                continue
+            # File lists come from the metadata cache; the torrent_info with
+            # the piece hashes is only loaded for files actually verified
+            metadata = self.engine.metadata.get(key, handle)
+            if metadata is None:
+                continue
+            save_path = _save_path(handle)
+            with self._lock:
+                known = dict(self._state.get(key, {}))
+            for index, path in enumerate(metadata.paths):
+                if index in metadata.pad_files:
+                    continue
+                try:
+                    st = os.stat(os.path.join(save_path, path))
+                    size, mtime = st.st_size, st.st_mtime_ns
+                except FileNotFoundError:
+                    size, mtime = -1, 0
+                record = known.get(path)
+                item = (key, handle, index, path, size, mtime)
+                if record is None:
+                    unverified.append((-mtime, item + (False,)))
+                elif record[0] != size or record[1] != mtime:
+                    changed.append((-mtime, item + (True,)))
+                elif key in requested:
+                    changed.append((-mtime, item + (False,)))
+                elif now - record[2] > REVERIFY_AGE:
+                    stale.append((record[2], item + (False,)))
+        plan = []
+        for entries in (changed, unverified, stale):
+            entries.sort(key=lambda entry: entry[0])
+            plan.extend(item for _, item in entries)
+        return plan
+
+    def run_pass(self):
+        """Verify the planned files once, repairing as bad pieces turn up."""
+        checked = {}  # info_hash -> pieces already hashed this pass
+        done = set()  # torrents handed to force_recheck this pass
+        current = None  # (info_hash, metadata, torrent_info, save_path) of the last torrent read
+        for key, handle, index, path, size, mtime, was_changed in self.plan():
+            if self._stop.is_set():
+                break
+            if key in done or not handle.is_valid():
+                continue
+            if current is None or current[0] != key:
+                metadata = self.engine.metadata.get(key, handle)
+                torrent_info = handle.torrent_file()
+                if metadata is None or not torrent_info:
+                    continue
+                current = (key, metadata, torrent_info, _save_path(handle))
+            _, metadata, torrent_info, save_path = current
+            if was_changed:
+                with self._lock:
+                    self.counters['changed_files'] += 1
+                self._emit('file_changed', key, file=path)
+            if not _has_v1_hashes(torrent_info):
+                # Nothing to hash against here; let libtorrent check its v2 trees
+                if was_changed and self._repair_or_report(key, handle, save_path, ()):
+                    done.add(key)
+                else:
+                    self._record(key, path, size, mtime)
+                continue
+            bad = self.verify_file(metadata, torrent_info, save_path, index, size,
+                                   checked.setdefault(key, set()))
+            if bad is None:
+                break
+            if bad:
+                with self._lock:
+                    self.counters['bad_pieces'] += len(bad)
+                self._emit('bad_pieces', key, file=path, pieces=sorted(bad))
+                # Repair now instead of after the rest of the torrent
+                if self._repair_or_report(key, handle, save_path, bad):
+                    done.add(key)
+                    continue
+            else:
+                with self._lock:
+                    self.counters['files_verified'] += 1
+            self._record(key, path, size, mtime)
+        with self._lock:
+            self.counters['passes'] += 1
+        self._save_state()
+
+    def _record(self, key, path, size, mtime):
+        with self._lock:
+            self._state.setdefault(key, {})[path] = [size, mtime, time.time()]
+
+    def _repair_or_report(self, key, handle, save_path, pieces):
+        """
+        :return: True if a recheck was started, False if the data is outside
+                 the download directory or a published feed version and is
+                 left alone
+        """
+        if not self._in_download_dir(save_path):
+            self._emit('repair_skipped', key, pieces=sorted(pieces),
+                       reason="shared in place from outside the download directory")
+            return False
+        if key in self._published_keys():
+            self._emit('repair_skipped', key, pieces=sorted(pieces),
+                       reason="published feed version, edit not yet published")
+            return False
+        self.repair(key, handle, pieces)
+        return True
+
+    def _in_download_dir(self, save_path):
+        download_dir = os.path.realpath(self.engine.download_dir)
+        save_path = os.path.realpath(save_path)
+        try:
+            return os.path.commonpath([download_dir, save_path]) == download_dir
+        except ValueError:
+            # Different drives on Windows
+            return False
+
+    def _published_keys(self):
+        keys = set()
+        for feed in self.engine.versions.feeds():
+            if feed.get('source'):
+                keys.update(entry['info_hash'] for entry in feed['versions'])
+        return keys
+
+    def verify_file(self, metadata, torrent_info, save_path, index, size, checked):
+        """
+        Hash the pieces overlapping one file.
+        :param metadata: FileMetadata of the torrent
+        :param torrent_info: libtorrent torrent_info, for the piece hashes
+        :param save_path: Directory the torrent's files are in
+        :param index: File index
+        :param size: Size of the file on disk, -1 if it is missing
+        :param checked: Pieces of this torrent already hashed this pass; updated
+        :return: Set of bad pieces, or None when stopped
+        """
+        offset, file_size = metadata.offsets[index], metadata.sizes[index]
+        first = offset // metadata.piece_length
+        last = (offset + max(file_size, 1) - 1) // metadata.piece_length
+        pieces = [piece for piece in range(first, last + 1) if piece not in checked]
+        if size < file_size:
+            # Missing or truncated: no need to read anything. Bytes appended
+            # past the end are not part of any piece and do not count.
+            checked.update(pieces)
+            return set(pieces)
+        bad = set()
+        for piece in pieces:
+            ok = self.verify_piece(metadata, torrent_info, save_path, piece)
+            if ok is None:
+                return None
+            checked.add(piece)
+            if not ok:
+                bad.add(piece)
+        return bad
+
+    def verify_piece(self, metadata, torrent_info, save_path, piece):
+        """
+        Compare a piece on disk with its v1 hash.
+        :return: True if it matches, False if not, None when stopped
+        """
+        digest = hashlib.sha1()
+        piece_size = torrent_info.piece_size(piece)
+        for part in torrent_info.map_block(piece, 0, piece_size):
+            if part.file_index in metadata.pad_files:
+                digest.update(bytes(part.size))
+                continue
+            path = os.path.join(save_path, metadata.paths[part.file_index])
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(part.offset)
+                    remaining = part.size
+                    while remaining:
+                        if not self.limiter.consume(min(remaining, READ_CHUNK), self._stop):
+                            return None
+                        data = f.read(min(remaining, READ_CHUNK))
+                        if not data:
+                            return False
+                        digest.update(data)
+                        remaining -= len(data)
+            except OSError:
+                return False
+        with self._lock:
+            self.counters['pieces_verified'] += 1
+            self.counters['bytes_verified'] += piece_size
+        return digest.digest() == bytes(torrent_info.hash_for_piece(piece))
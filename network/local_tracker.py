@@ -0,0 +1,134 @@
+"""
+Lightweight HTTP BitTorrent tracker for LAN mode and loopback benchmarks.
+Keeps peers in memory and answers announces with compact peer lists, so
+machines on the same network find each other without any internet service.
+Also serves version feeds of re-shared notes at /feeds/<id>.
+"""
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from network.bencode import encode
+
+ANNOUNCE_INTERVAL = 30
+# Peers that have not announced for this long are dropped
+PEER_TIMEOUT = 3 * ANNOUNCE_INTERVAL
+# Most peers returned per announce
+MAX_PEERS = 200
+LOCAL_TRACKER_PORT = 6969
+
+
+def local_ip():
+    """
+    Address of the interface that routes outside, used in announce URLs.
+    Connecting a UDP socket sends no packets.
+    :return: IP address string, 127.0.0.1 if there is no network
+    """
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect(("10.255.255.255", 1))
+        return s.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
+    finally:
+        s.close()
+
+
+class LocalTracker:
+    def __init__(self, host='127.0.0.1', port=0, feeds=None):
+        """
+        :param host: Interface to listen on, '0.0.0.0' for the whole LAN
+        :param port: Port, 0 picks a free one
+        :param feeds: Optional function(feed id) -> JSON bytes or None, served
+                      at /feeds/<id> (see network/versions.py)
+        """
+        self.feeds = feeds
+        self.peers = {}  # info_hash bytes -> {(ip, port): last seen}
+        self.lock = threading.Lock()
+        tracker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/announce':
+                    body = tracker.announce(parse_qs(url.query, encoding='latin-1'),
+                                            self.client_address[0])
+                    content_type = 'text/plain'
+                elif url.path.startswith('/feeds/') and tracker.feeds is not None:
+                    try:
+                        body = tracker.feeds(url.path[len('/feeds/'):])
+                    except ValueError:
+                        body = None
+                    if body is None:
+                        self.send_error(404)
+                        return
+                    content_type = 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        """Announce URL; a tracker bound to all interfaces uses the LAN address"""
+        host, port = self.server.server_address[:2]
+        if host == '0.0.0.0':
+            host = local_ip()
+        return f"http://{host}:{port}/announce"
+
+    def feed_url(self, feed_id):
+        return self.url[:-len('announce')] + f"feeds/{feed_id}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def announce(self, query, ip):
+        """
+        Register the announcing peer and return the bencoded response.
+        :param query: Parsed announce query string
+        :param ip: Address the request came from
+        """
+        try:
+            info_hash = query['info_hash'][0].encode('latin-1')
+            port = int(query['port'][0])
+        except (KeyError, ValueError):
+            return encode({'failure reason': 'missing info_hash or port'})
+        event = query.get('event', [''])[0]
+        peer = (ip, port)
+        now = time.monotonic()
+        with self.lock:
+            swarm = self.peers.setdefault(info_hash, {})
+            for other, seen in list(swarm.items()):
+                if now - seen > PEER_TIMEOUT:
+                    del swarm[other]
+            if event == 'stopped':
+                swarm.pop(peer, None)
+            else:
+                swarm[peer] = now
+            others = [p for p in swarm if p != peer][:MAX_PEERS]
+        peers = b''.join(socket.inet_aton(p_ip) + struct.pack('!H', p_port)
+                         for p_ip, p_port in others if ':' not in p_ip)
+        peers6 = b''.join(socket.inet_pton(socket.AF_INET6, p_ip) + struct.pack('!H', p_port)
+                          for p_ip, p_port in others if ':' in p_ip)
+        response = {'interval': ANNOUNCE_INTERVAL, 'peers': peers}
+        if peers6:
+            response['peers6'] = peers6
+        return encode(response)
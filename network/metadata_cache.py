@@ -0,0 +1,98 @@
+import threading
+from array import array
+from collections import OrderedDict
+
+import libtorrent as lt
+
+# Torrents whose file lists are kept in memory at once
+METADATA_CACHE_SIZE = 256
+
+
+def is_pad_file(files, index):
+    """
+    :param files: libtorrent file_storage
+    :param index: File index
+    :return: Whether the file is padding inserted to align the next file
+    """
+    if hasattr(files, 'pad_file_at'):
+        return files.pad_file_at(index)
+    return bool(files.file_flags(index) & lt.file_storage.flag_pad_file)
+
+
+class FileMetadata:
+    __slots__ = ('paths', 'sizes', 'offsets', 'pad_files', 'piece_length', 'num_pieces')
+
+    def __init__(self, torrent_info):
+        """
+        The parts of a torrent's metadata the engine reads repeatedly, copied
+        out of a torrent_info so the torrent_info itself can be released.
+        :param torrent_info: libtorrent torrent_info
+        """
+        storage = torrent_info.files()
+        count = storage.num_files()
+        self.paths = tuple(storage.file_path(i) for i in range(count))
+        self.sizes = array('q', (storage.file_size(i) for i in range(count)))
+        self.offsets = array('q', (storage.file_offset(i) for i in range(count)))
+        self.pad_files = frozenset(i for i in range(count) if is_pad_file(storage, i))
+        self.piece_length = torrent_info.piece_length()
+        self.num_pieces = torrent_info.num_pieces()
+
+
+class MetadataCache:
+    def __init__(self, max_entries=METADATA_CACHE_SIZE):
+        """
+        LRU of FileMetadata. Entries are loaded from the torrent handle the
+        first time they are needed and dropped again when they fall out of the
+        LRU, so Python holds file lists only for recently used torrents.
+        :param max_entries: Number of torrents to keep
+        """
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # primary key -> FileMetadata
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, key, handle):
+        """
+        Get the file metadata of a torrent, loading it on a miss.
+        :param key: Primary key of the torrent
+        :param handle: Torrent handle
+        :return: FileMetadata, or None while the torrent has no metadata
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        torrent_info = handle.torrent_file()
+        if not torrent_info:
+            return None
+        entry = FileMetadata(torrent_info)
+        with self._lock:
+            self.loads += 1
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def discard(self, key):
+        """Unload the metadata of a torrent, e.g. when it is removed."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """
+        :return: Dictionary with entries, limit, hits and loads
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'loads': self.loads,
+            }
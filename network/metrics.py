@@ -0,0 +1,199 @@
+import json
+import threading
+import time
+from collections import deque
+import libtorrent as lt
+
+# Session counters/gauges sampled from session_stats_alert
+SESSION_METRICS = [
+    'net.recv_bytes',
+    'net.sent_bytes',
+    'net.recv_payload_bytes',
+    'net.sent_payload_bytes',
+    'net.recv_ip_overhead_bytes',
+    'net.sent_ip_overhead_bytes',
+    'peer.num_peers_connected',
+    'peer.num_peers_half_open',
+    'peer.num_peers_up_interested',
+    'peer.num_peers_down_interested',
+    'ses.num_downloading_torrents',
+    'ses.num_seeding_torrents',
+    'ses.num_checking_torrents',
+    'ses.num_queued_seeding_torrents',
+    'ses.num_queued_download_torrents',
+    'dht.dht_nodes',
+    'disk.queued_disk_jobs',
+    'disk.num_jobs',
+    'disk.num_read_jobs',
+    'disk.num_write_jobs',
+    'disk.disk_read_time',
+    'disk.disk_write_time',
+    'disk.num_blocks_read',
+    'disk.num_blocks_written',
+    'disk.num_blocks_cache_hits',   # libtorrent 1.2 block cache
+]
+
+DEFAULT_HISTORY = 300
+PROMETHEUS_PREFIX = 'p2pnotes_'
+
+
+class SessionMetrics:
+    def __init__(self, history=DEFAULT_HISTORY):
+        """
+        Samples libtorrent session counters from session_stats_alert.
+        Which metrics exist (and whether each is a counter or a gauge) is
+        resolved once from session_stats_metrics(); every sample keeps the raw
+        values plus per-second rates of the counters, in a ring buffer.
+        :param history: Number of samples to keep
+        """
+        self._lock = threading.Lock()
+        self.samples = deque(maxlen=history)
+        self.metrics = {}  # name -> 'counter' | 'gauge', for metrics this libtorrent has
+        counter_type = getattr(getattr(lt, 'metric_type_t', None), 'counter', 0)
+        for metric in lt.session_stats_metrics():
+            if metric.name in SESSION_METRICS:
+                self.metrics[metric.name] = 'counter' if metric.type == counter_type else 'gauge'
+
+    def record(self, alert):
+        """
+        Store one sample.
+        :param alert: session_stats_alert
+        """
+        now = time.monotonic()
+        all_values = alert.values
+        values = {name: all_values.get(name, 0) for name in self.metrics}
+        with self._lock:
+            previous = self.samples[-1] if self.samples else None
+            rates = {}
+            if previous is not None and now > previous['time']:
+                elapsed = now - previous['time']
+                for name, kind in self.metrics.items():
+                    if kind == 'counter':
+                        rates[name] = max(0, values[name] - previous['values'][name]) / elapsed
+            self.samples.append({'time': now, 'values': values, 'rates': rates})
+
+    def latest(self):
+        """
+        :return: The newest sample, or an empty one before the first alert
+        """
+        with self._lock:
+            if self.samples:
+                return self.samples[-1]
+        return {'time': time.monotonic(), 'values': {}, 'rates': {}}
+
+    def history(self, name, rate=False):
+        """
+        Get the recorded history of one metric.
+        :param name: Metric name, e.g. 'net.recv_bytes'
+        :param rate: Return the per-second rate instead of the raw value
+        :return: List of (monotonic time, value)
+        """
+        key = 'rates' if rate else 'values'
+        with self._lock:
+            return [(s['time'], s[key].get(name)) for s in self.samples if name in s[key]]
+
+    def summary(self):
+        """
+        Derived figures of the newest sample.
+        :return: Dictionary with transfer rates, peer counts, disk queue and
+                 disk-cache hit ratio (None where libtorrent has no cache)
+        """
+        sample = self.latest()
+        values, rates = sample['values'], sample['rates']
+        blocks_read = values.get('disk.num_blocks_read', 0)
+        cache_hits = values.get('disk.num_blocks_cache_hits')
+        if cache_hits is None:
+            hit_ratio = None
+        else:
+            hit_ratio = cache_hits / (cache_hits + blocks_read) if cache_hits + blocks_read else 0.0
+        return {
+            'download_rate': rates.get('net.recv_bytes', 0),
+            'upload_rate': rates.get('net.sent_bytes', 0),
+            'payload_download_rate': rates.get('net.recv_payload_bytes', 0),
+            'payload_upload_rate': rates.get('net.sent_payload_bytes', 0),
+            'peers_connected': values.get('peer.num_peers_connected', 0),
+            'peers_half_open': values.get('peer.num_peers_half_open', 0),
+            'dht_nodes': values.get('dht.dht_nodes', 0),
+            'queued_disk_jobs': values.get('disk.queued_disk_jobs', 0),
+            'disk_cache_hit_ratio': hit_ratio,
+        }
+
+    def to_json(self, torrents=(), history=False, extra=None):
+        """
+        Export the newest sample as JSON.
+        :param torrents: Torrent status dictionaries for per-torrent counters
+        :param history: Include the whole ring buffer
+        :param extra: Further metric groups, {group: {name: value}}
+        :return: JSON string
+        """
+        sample = self.latest()
+        data = {
+            'values': sample['values'],
+            'rates': sample['rates'],
+            'summary': self.summary(),
+            'torrents': [torrent_counters(t) for t in torrents],
+        }
+        if extra:
+            data.update(extra)
+        if history:
+            with self._lock:
+                data['history'] = list(self.samples)
+        return json.dumps(data)
+
+    def to_prometheus(self, torrents=(), extra=None):
+        """
+        Export the newest sample in the Prometheus text format.
+        :param torrents: Torrent status dictionaries for per-torrent counters
+        :param extra: Further metric groups, {group: {name: value}}
+        :return: Prometheus exposition text
+        """
+        sample = self.latest()
+        lines = []
+        for name, kind in self.metrics.items():
+            if name not in sample['values']:
+                continue
+            metric = PROMETHEUS_PREFIX + name.replace('.', '_')
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"{metric} {sample['values'][name]}")
+            if name in sample['rates']:
+                lines.append(f"# TYPE {metric}_per_second gauge")
+                lines.append(f"{metric}_per_second {sample['rates'][name]:.1f}")
+
+        ratio = self.summary()['disk_cache_hit_ratio']
+        if ratio is not None:
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}disk_cache_hit_ratio gauge")
+            lines.append(f"{PROMETHEUS_PREFIX}disk_cache_hit_ratio {ratio:.4f}")
+
+        for group, values in (extra or {}).items():
+            for name, value in values.items():
+                metric = f"{PROMETHEUS_PREFIX}{group}_{name}"
+                lines.append(f"# TYPE {metric} untyped")
+                lines.append(f"{metric} {value}")
+
+        counters = [torrent_counters(t) for t in torrents]
+        if counters:
+            for field in counters[0]:
+                if field == 'info_hash':
+                    continue
+                metric = f"{PROMETHEUS_PREFIX}torrent_{field}"
+                lines.append(f"# TYPE {metric} gauge")
+                for c in counters:
+                    lines.append(f'{metric}{{info_hash="{c["info_hash"]}"}} {c[field]}')
+        return "\n".join(lines) + "\n"
+
+
+def torrent_counters(torrent):
+    """
+    Numeric per-torrent counters from a status dictionary.
+    :param torrent: Torrent status dictionary
+    """
+    return {
+        'info_hash': torrent['info_hash'],
+        'download_rate_bytes': int(torrent['download_rate'] * 1024),
+        'upload_rate_bytes': int(torrent['upload_rate'] * 1024),
+        'downloaded_bytes': torrent['downloaded'],
+        'uploaded_bytes': torrent['uploaded'],
+        'progress': torrent['progress'],
+        'seeds': torrent['num_seeds'],
+        'peers': torrent['num_peers'],
+    }
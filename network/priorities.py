@@ -0,0 +1,132 @@
+import os
+
+# libtorrent download priorities (0-7)
+SKIP = 0
+LOW = 1
+NORMAL = 4
+HIGH = 7
+
+PRIORITY_NAMES = {SKIP: 'skip', LOW: 'low', NORMAL: 'normal', HIGH: 'high'}
+PRIORITY_VALUES = {name: value for value, name in PRIORITY_NAMES.items()}
+
+
+def priority_value(priority):
+    """
+    Accept a priority as a number (0-7) or a name ('skip', 'low', 'normal', 'high').
+    :return: Priority number
+    """
+    if isinstance(priority, str):
+        if priority not in PRIORITY_VALUES:
+            raise ValueError(f"Unknown priority: {priority}")
+        return PRIORITY_VALUES[priority]
+    if not 0 <= priority <= 7:
+        raise ValueError(f"Priority out of range: {priority}")
+    return int(priority)
+
+
+def _extension(path):
+    return os.path.splitext(path)[1].lower()
+
+
+def _normalize_extensions(extensions):
+    return {ext.lower() if ext.startswith('.') else '.' + ext.lower() for ext in extensions}
+
+
+def small_files_first(files, priorities):
+    """
+    Rank the wanted files by size: the smallest third gets high priority and
+    the largest third low, so many small notes finish before one big archive.
+    """
+    wanted = sorted((f for f in files if priorities[f['index']] != SKIP), key=lambda f: f['size'])
+    if not wanted:
+        return priorities
+    third = max(1, len(wanted) // 3)
+    for rank, f in enumerate(wanted):
+        if rank < third:
+            priorities[f['index']] = HIGH
+        elif rank >= len(wanted) - third and len(wanted) > 2:
+            priorities[f['index']] = LOW
+        else:
+            priorities[f['index']] = NORMAL
+    return priorities
+
+
+def include_extensions(files, priorities, extensions, priority=NORMAL):
+    """Download only files with these extensions; skip the rest."""
+    extensions = _normalize_extensions(extensions)
+    for f in files:
+        if _extension(f['path']) in extensions:
+            if priorities[f['index']] == SKIP:
+                priorities[f['index']] = priority
+        else:
+            priorities[f['index']] = SKIP
+    return priorities
+
+
+def exclude_extensions(files, priorities, extensions):
+    """Skip files with these extensions."""
+    extensions = _normalize_extensions(extensions)
+    for f in files:
+        if _extension(f['path']) in extensions:
+            priorities[f['index']] = SKIP
+    return priorities
+
+
+def boost_extensions(files, priorities, extensions, priority=HIGH):
+    """Raise files with these extensions (unless skipped) to a priority."""
+    extensions = _normalize_extensions(extensions)
+    for f in files:
+        if _extension(f['path']) in extensions and priorities[f['index']] != SKIP:
+            priorities[f['index']] = priority
+    return priorities
+
+
+def max_size(files, priorities, size):
+    """Skip files larger than size bytes."""
+    for f in files:
+        if f['size'] > size:
+            priorities[f['index']] = SKIP
+    return priorities
+
+
+RULES = {
+    'small_files_first': small_files_first,
+    'include_extensions': include_extensions,
+    'exclude_extensions': exclude_extensions,
+    'boost_extensions': boost_extensions,
+    'max_size': max_size,
+}
+
+
+def plan_file_priorities(files, rules, priorities=None, pad_files=()):
+    """
+    Work out file priorities by applying rules in order.
+    A rule is a name from RULES or a dictionary with 'rule' plus its arguments:
+
+        [{'rule': 'include_extensions', 'extensions': ['pdf', 'md']},
+         'small_files_first']
+
+    :param files: File dictionaries from TorrentEngine.get_torrent_files
+    :param rules: List of rules
+    :param priorities: Starting priorities per file index, NORMAL if None
+    :param pad_files: Indices of pad files; they take part in no rule and
+                      stay skipped
+    :return: List of priorities, one per file index
+    """
+    files = [f for f in files if f['index'] not in pad_files]
+    if priorities is None:
+        count = max((f['index'] for f in files), default=-1) + 1
+        priorities = [SKIP if i in pad_files else NORMAL for i in range(count)]
+    else:
+        priorities = list(priorities)
+    for rule in rules:
+        if isinstance(rule, str):
+            rule = {'rule': rule}
+        args = dict(rule)
+        name = args.pop('rule')
+        if name not in RULES:
+            raise ValueError(f"Unknown priority rule: {name}")
+        if 'priority' in args:
+            args['priority'] = priority_value(args['priority'])
+        priorities = RULES[name](files, priorities, **args)
+    return priorities
@@ -0,0 +1,150 @@
+import json
+import libtorrent as lt
+
+DEFAULT_PROFILE = 'desktop'
+
+# Named libtorrent setting packs. Values use libtorrent setting names; the
+# choking algorithms may also be given by name (see CHOKERS below). Keys the
+# installed libtorrent does not know (e.g. cache_size on 2.x) are skipped.
+# Every built-in profile sets the same keys, so switching profiles at runtime
+# leaves nothing of the previous one behind.
+PROFILES = {
+    # Laptop/desktop sharing notes next to other applications
+    'desktop': {
+        'listen_interfaces': '0.0.0.0:6881',
+        'cache_size': 1024,                 # 16 KiB blocks, libtorrent 1.2 only
+        'aio_threads': 4,
+        'hashing_threads': 2,
+        'connections_limit': 200,
+        'send_buffer_low_watermark': 10 * 1024,
+        'send_buffer_watermark': 500 * 1024,
+        'send_buffer_watermark_factor': 50,
+        'max_queued_disk_bytes': 1024 * 1024,   # libtorrent's default
+        'active_downloads': 3,
+        'active_seeds': 5,
+        'active_limit': 15,
+        'choking_algorithm': 'fixed_slots',
+        'seed_choking_algorithm': 'round_robin',
+    },
+    # Dedicated box seeding many torrents on a fast link
+    'seedbox': {
+        'listen_interfaces': '0.0.0.0:6881,[::]:6881',
+        'cache_size': 32768,
+        'aio_threads': 16,
+        'hashing_threads': 8,
+        'connections_limit': 8000,
+        'send_buffer_low_watermark': 1024 * 1024,
+        'send_buffer_watermark': 8 * 1024 * 1024,
+        'send_buffer_watermark_factor': 150,
+        'max_queued_disk_bytes': 16 * 1024 * 1024,
+        'active_downloads': 20,
+        'active_seeds': 2000,
+        'active_limit': 2000,
+        'choking_algorithm': 'rate_based',
+        'seed_choking_algorithm': 'fastest_upload',
+    },
+    # Small machines (Raspberry Pi, old laptops)
+    'low-memory': {
+        'listen_interfaces': '0.0.0.0:6881',
+        'cache_size': 256,
+        'aio_threads': 1,
+        'hashing_threads': 1,
+        'connections_limit': 50,
+        'send_buffer_low_watermark': 4 * 1024,
+        'send_buffer_watermark': 64 * 1024,
+        'send_buffer_watermark_factor': 25,
+        'max_queued_disk_bytes': 256 * 1024,
+        'active_downloads': 2,
+        'active_seeds': 3,
+        'active_limit': 5,
+        'choking_algorithm': 'fixed_slots',
+        'seed_choking_algorithm': 'round_robin',
+    },
+}
+# Longer name used in docs and config files
+PROFILES['seedbox-high-throughput'] = PROFILES['seedbox']
+
+# Applied on top of the profile in LAN mode: discovery that needs the internet
+# is off and dead announces give up quickly
+LAN_SETTINGS = {
+    'enable_dht': False,
+    'enable_upnp': False,
+    'enable_natpmp': False,
+    'enable_lsd': True,
+    'local_service_announce_interval': 30,
+    'tracker_completion_timeout': 10,
+    'tracker_receive_timeout': 5,
+    'peer_connect_timeout': 3,
+    # Several instances may run on one machine
+    'allow_multiple_connections_per_ip': True,
+}
+
+CHOKERS = {
+    'choking_algorithm': {
+        'fixed_slots': 'fixed_slots_choker',
+        'rate_based': 'rate_based_choker',
+    },
+    'seed_choking_algorithm': {
+        'round_robin': 'round_robin',
+        'fastest_upload': 'fastest_upload',
+        'anti_leech': 'anti_leech',
+    },
+}
+CHOKER_ENUMS = {
+    'choking_algorithm': 'choking_algorithm_t',
+    'seed_choking_algorithm': 'seed_choking_algorithm_t',
+}
+
+
+def load_profiles(path):
+    """
+    Load profiles from a JSON config file on top of the built-in ones.
+    A profile may name another one in "extends" to only override a few knobs:
+        {"office": {"extends": "desktop", "connections_limit": 100}}
+    :param path: JSON file mapping profile name -> settings
+    :return: Dictionary of all profiles
+    """
+    with open(path) as f:
+        custom = json.load(f)
+    profiles = dict(PROFILES)
+    for name, settings in custom.items():
+        profiles[name] = settings
+    return {name: resolve_profile(name, profiles) for name in profiles}
+
+
+def resolve_profile(name, profiles=PROFILES):
+    """
+    Flatten a profile's "extends" chain.
+    :param name: Profile name
+    :param profiles: Dictionary of profiles
+    :return: Settings dictionary
+    """
+    if name not in profiles:
+        raise ValueError(f"Unknown profile: {name}")
+    settings = dict(profiles[name])
+    parent = settings.pop('extends', None)
+    if parent is None:
+        return settings
+    merged = resolve_profile(parent, profiles)
+    merged.update(settings)
+    return merged
+
+
+def to_session_settings(profile, known_settings):
+    """
+    Convert a profile into a dict for session.apply_settings.
+    :param profile: Profile settings dictionary
+    :param known_settings: session.get_settings() of the running session
+    :return: (settings, skipped keys)
+    """
+    settings = {}
+    skipped = []
+    for key, value in profile.items():
+        if key not in known_settings:
+            skipped.append(key)
+            continue
+        if key in CHOKERS and isinstance(value, str):
+            enum = getattr(lt, CHOKER_ENUMS[key])
+            value = int(getattr(enum, CHOKERS[key][value]))
+        settings[key] = value
+    return settings, skipped
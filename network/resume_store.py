@@ -0,0 +1,83 @@
+import os
+
+RESUME_EXTENSION = '.fastresume'
+SESSION_STATE_FILE = 'session.state'
+
+
+class ResumeStore:
+    def __init__(self, directory):
+        """
+        On-disk store for fast-resume data and the session state.
+        Each torrent gets one <info_hash>.fastresume file; writes are atomic so a
+        crash mid-save never leaves a truncated file behind.
+        :param directory: Directory to keep the files in
+        """
+        self.directory = directory
+        os.makedirs(self.directory, exist_ok=True)
+
+    def save_torrent(self, info_hash, data):
+        """
+        Store the resume data of one torrent.
+        :param info_hash: Registry key of the torrent
+        :param data: Bencoded resume data
+        """
+        self._write(self._torrent_path(info_hash), data)
+
+    def delete_torrent(self, info_hash):
+        """
+        Forget the resume data of a torrent that was removed.
+        :param info_hash: Registry key of the torrent
+        """
+        try:
+            os.remove(self._torrent_path(info_hash))
+        except FileNotFoundError:
+            pass
+
+    def load_torrents(self):
+        """
+        Read the resume data of every stored torrent.
+        :return: Generator of (info_hash, bencoded resume data)
+        """
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(RESUME_EXTENSION):
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    data = f.read()
+            except OSError as e:
+                print(f"Could not read resume data {entry.name}: {e}")
+                continue
+            yield entry.name[:-len(RESUME_EXTENSION)], data
+
+    def count(self):
+        """
+        :return: Number of torrents with stored resume data
+        """
+        return sum(1 for entry in os.scandir(self.directory)
+                   if entry.name.endswith(RESUME_EXTENSION))
+
+    def save_session_state(self, data):
+        """
+        Store the bencoded session state (settings and DHT routing table).
+        :param data: Bencoded session state
+        """
+        self._write(os.path.join(self.directory, SESSION_STATE_FILE), data)
+
+    def load_session_state(self):
+        """
+        :return: Bencoded session state, or None if none was saved
+        """
+        try:
+            with open(os.path.join(self.directory, SESSION_STATE_FILE), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _torrent_path(self, info_hash):
+        return os.path.join(self.directory, info_hash + RESUME_EXTENSION)
+
+    def _write(self, path, data):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
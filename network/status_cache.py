@@ -0,0 +1,217 @@
+import threading
+from collections import OrderedDict
+
+STATE_NAMES = ['queued', 'checking', 'downloading metadata',
+               'downloading', 'finished', 'seeding', 'allocating',
+               'checking fastresume']
+
+# Removed torrents are remembered for this many versions so delta readers can
+# see them go; readers that fall further behind get a full snapshot instead.
+TOMBSTONE_VERSIONS = 1000
+
+
+def status_error(status):
+    """
+    Get the error message of a torrent status, or None if there is no error.
+    :param status: libtorrent torrent_status
+    """
+    errc = getattr(status, 'errc', None)
+    if errc is not None:
+        return errc.message() if errc.value() else None
+    return status.error or None
+
+
+# Fields of a status record, in the order status_values() returns them
+STATUS_FIELDS = ('name', 'progress', 'state', 'download_rate', 'upload_rate',
+                 'num_seeds', 'num_peers', 'total_size', 'downloaded', 'uploaded',
+                 'is_seeding', 'is_finished', 'error')
+
+
+def status_values(status):
+    """
+    Extract the fields the GUI shows from a libtorrent torrent_status.
+    :param status: libtorrent torrent_status
+    :return: Tuple of values in STATUS_FIELDS order
+    """
+    return (status.name or "Getting metadata...",
+            status.progress,
+            int(status.state),
+            status.download_rate,
+            status.upload_rate,
+            status.num_seeds,
+            status.num_peers,
+            status.total_wanted,
+            status.total_wanted_done,
+            status.all_time_upload,
+            status.is_seeding,
+            status.is_finished,
+            status_error(status))
+
+
+class TorrentStatus:
+    # One compact record per torrent, updated in place; dictionaries are only
+    # built for the torrents a reader actually asks for
+    __slots__ = ('info_hash', 'version') + STATUS_FIELDS
+
+    def __init__(self, info_hash, version, values):
+        self.info_hash = info_hash
+        self.version = version
+        self.assign(values)
+
+    def values(self):
+        return tuple(getattr(self, field) for field in STATUS_FIELDS)
+
+    def assign(self, values):
+        for field, value in zip(STATUS_FIELDS, values):
+            setattr(self, field, value)
+
+    def to_dict(self):
+        """
+        :return: Torrent status dictionary as shown by the GUI
+        """
+        return {
+            'name': self.name,
+            'progress': self.progress,
+            'state': STATE_NAMES[self.state],
+            'download_rate': self.download_rate / 1024,  # KB/s
+            'upload_rate': self.upload_rate / 1024,      # KB/s
+            'num_seeds': self.num_seeds,
+            'num_peers': self.num_peers,
+            'total_size': self.total_size,
+            'downloaded': self.downloaded,
+            'uploaded': self.uploaded,
+            'is_seeding': self.is_seeding,
+            'is_finished': self.is_finished,
+            'error': self.error,
+            'info_hash': self.info_hash
+        }
+
+
+class StatusCache:
+    def __init__(self):
+        """
+        Versioned table of torrent statuses fed by state_update_alert.
+        Every batch of updates bumps the version; only torrents whose values
+        actually changed are stamped with it, so readers can ask for
+        "everything changed since version N" without touching idle torrents.
+        """
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entries = OrderedDict()  # info_hash -> TorrentStatus, oldest update first
+        self._removed = OrderedDict()  # info_hash -> version it was removed at
+        self._floor = 0                # deltas older than this need a full snapshot
+
+    @property
+    def version(self):
+        return self._version
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def update(self, statuses):
+        """
+        Apply a batch of status updates.
+        :param statuses: Iterable of (info_hash, values from status_values())
+        :return: Number of torrents whose status changed
+        """
+        with self._lock:
+            version = self._version + 1
+            changed = 0
+            for info_hash, values in statuses:
+                record = self._entries.get(info_hash)
+                if record is None:
+                    self._entries[info_hash] = TorrentStatus(info_hash, version, values)
+                    self._removed.pop(info_hash, None)
+                elif record.values() != values:
+                    record.assign(values)
+                    record.version = version
+                    self._entries.move_to_end(info_hash)
+                else:
+                    continue
+                changed += 1
+            if changed:
+                self._version = version
+            return changed
+
+    def remove(self, info_hash):
+        """
+        Drop a torrent from the table.
+        :param info_hash: Registry key of the torrent
+        """
+        with self._lock:
+            if self._entries.pop(info_hash, None) is None:
+                return
+            self._version += 1
+            self._removed[info_hash] = self._version
+            self._prune_removed()
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._removed.clear()
+            self._floor = self._version
+
+    def get(self, info_hash):
+        """
+        :return: Status dictionary of one torrent or None
+        """
+        with self._lock:
+            record = self._entries.get(info_hash)
+            return record.to_dict() if record else None
+
+    def snapshot(self):
+        """
+        Get the status of every torrent.
+        :return: (version, list of status dictionaries)
+        """
+        with self._lock:
+            return self._version, [record.to_dict() for record in self._entries.values()]
+
+    def changes_since(self, version):
+        """
+        Get the torrents changed or removed after a given version.
+        :param version: Version returned by an earlier snapshot or delta call
+        :return: Dictionary with 'version', 'changed' (status dicts), 'removed'
+                 (info-hashes) and 'reset' (True when 'changed' is a full snapshot
+                 because the caller was too far behind)
+        """
+        with self._lock:
+            if version < self._floor:
+                return {
+                    'version': self._version,
+                    'changed': [record.to_dict() for record in self._entries.values()],
+                    'removed': [],
+                    'reset': True
+                }
+
+            # Entries are kept in update order, so walk back from the newest
+            changed = []
+            for record in reversed(self._entries.values()):
+                if record.version <= version:
+                    break
+                changed.append(record.to_dict())
+            changed.reverse()
+
+            removed = []
+            for info_hash, removed_version in reversed(self._removed.items()):
+                if removed_version <= version:
+                    break
+                removed.append(info_hash)
+
+            return {
+                'version': self._version,
+                'changed': changed,
+                'removed': removed,
+                'reset': False
+            }
+
+    def _prune_removed(self):
+        cutoff = self._version - TOMBSTONE_VERSIONS
+        while self._removed:
+            info_hash, removed_version = next(iter(self._removed.items()))
+            if removed_version > cutoff:
+                break
+            del self._removed[info_hash]
+            self._floor = removed_version
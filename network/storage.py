@@ -0,0 +1,86 @@
+"""
+Storage and disk I/O policy: how files are allocated on disk, which disk I/O
+backend libtorrent uses, and how many threads and how much read-ahead it gets.
+"""
+import libtorrent as lt
+
+DEFAULT_STORAGE_MODE = 'sparse'
+DEFAULT_DISK_BACKEND = 'default'
+
+# 'allocate' reserves the whole file up front so it is laid out contiguously,
+# which avoids fragmentation and seeks on spinning disks; 'sparse' only
+# allocates what has been downloaded
+STORAGE_MODES = {
+    'sparse': lt.storage_mode_t.storage_mode_sparse,
+    'allocate': lt.storage_mode_t.storage_mode_allocate,
+}
+
+# libtorrent 2.x disk I/O backends, picked when the session is created
+DISK_BACKENDS = {
+    'default': 'default_disk_io_constructor',
+    'mmap': 'mmap_disk_io_constructor',
+    'posix': 'posix_disk_io_constructor',
+}
+
+BLOCK_SIZE = 16 * 1024
+
+
+def storage_mode(name):
+    """
+    :param name: 'sparse' or 'allocate'
+    :return: libtorrent storage_mode_t
+    """
+    if name not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage mode: {name}")
+    return STORAGE_MODES[name]
+
+
+def disk_io_constructor(name):
+    """
+    :param name: Key of DISK_BACKENDS
+    :return: libtorrent disk I/O constructor, or None when this libtorrent
+             (1.2, or bindings without backend selection) cannot choose one
+    """
+    if name not in DISK_BACKENDS:
+        raise ValueError(f"Unknown disk backend: {name}")
+    if not hasattr(lt, 'session_params') or not hasattr(lt.session_params(), 'disk_io_constructor'):
+        return None
+    return getattr(lt, DISK_BACKENDS[name], None)
+
+
+def disk_settings(aio_threads=None, hashing_threads=None, cache_mb=None, prefetch_kb=None,
+                  file_pool_size=None, os_cache=None):
+    """
+    Translate disk I/O options into libtorrent settings. Options left None are
+    not changed. Settings the installed libtorrent lacks are skipped by
+    to_session_settings.
+    :param aio_threads: Disk I/O threads
+    :param hashing_threads: Piece hashing threads (libtorrent 2.x)
+    :param cache_mb: Block cache size (libtorrent 1.2; 2.x relies on the OS page cache)
+    :param prefetch_kb: Read-ahead budget. On 1.2 it is the read cache line; on
+                        both it raises the send buffer watermark, which is how
+                        far ahead of peers' requests blocks are read
+    :param file_pool_size: Files kept open at once
+    :param os_cache: False to bypass the OS page cache (e.g. when the data set
+                     is much larger than RAM)
+    :return: Dictionary of libtorrent settings
+    """
+    settings = {}
+    if aio_threads is not None:
+        settings['aio_threads'] = int(aio_threads)
+    if hashing_threads is not None:
+        settings['hashing_threads'] = int(hashing_threads)
+    if cache_mb is not None:
+        settings['cache_size'] = int(cache_mb * 1024 * 1024 // BLOCK_SIZE)
+    if prefetch_kb is not None:
+        settings['read_cache_line_size'] = max(1, int(prefetch_kb * 1024 // BLOCK_SIZE))
+        settings['send_buffer_watermark'] = int(prefetch_kb * 1024)
+    if file_pool_size is not None:
+        settings['file_pool_size'] = int(file_pool_size)
+    if os_cache is not None:
+        mode = 'enable_os_cache' if os_cache else 'disable_os_cache'
+        io_mode = getattr(lt, 'io_buffer_mode_t', None)
+        if io_mode is not None and hasattr(io_mode, mode):
+            settings['disk_io_read_mode'] = int(getattr(io_mode, mode))
+            settings['disk_io_write_mode'] = int(getattr(io_mode, mode))
+    return settings
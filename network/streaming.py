@@ -0,0 +1,275 @@
+import io
+import threading
+from collections import Counter, OrderedDict
+import libtorrent as lt
+
+from network.torrent_registry import info_hash_keys
+
+# Pieces ahead of the read cursor that get a deadline
+STREAM_READAHEAD = 8
+# Deadline of the piece under the cursor; every following piece gets one more step
+DEADLINE_STEP_MS = 200
+# How long a read waits for a single piece
+STREAM_TIMEOUT = 60
+# Pieces kept in memory per stream, so small reads do not re-read a piece
+READ_CACHE_PIECES = 4
+
+# Makes set_piece_deadline post a read_piece_alert once the piece is there
+ALERT_WHEN_AVAILABLE = getattr(getattr(lt, 'deadline_flags_t', None), 'alert_when_available', 1)
+
+
+def set_sequential_download(handle, enabled):
+    """
+    Switch a torrent between sequential and rarest-first piece picking.
+    :param handle: Torrent handle
+    :param enabled: True for sequential download
+    """
+    if hasattr(lt.torrent_flags, 'sequential_download'):
+        if enabled:
+            handle.set_flags(lt.torrent_flags.sequential_download)
+        else:
+            handle.unset_flags(lt.torrent_flags.sequential_download)
+    else:
+        handle.set_sequential_download(enabled)
+
+
+class PieceReader:
+    def __init__(self, registry):
+        """
+        Hands the data of read_piece_alert to the threads waiting for it.
+        Pieces are requested with set_piece_deadline(alert_when_available): a
+        missing piece is downloaded first and then read, one already on disk
+        is read right away.
+        :param registry: TorrentRegistry of the engine, to resolve alert handles
+        """
+        self.registry = registry
+        self._cond = threading.Condition()
+        self._waiting = Counter()  # (primary key, piece) -> waiting readers
+        self._results = {}         # (primary key, piece) -> bytes or exception
+        self._streams = Counter()  # primary key -> open streams
+
+    def fetch(self, handle, key, piece, deadline_ms=0, timeout=STREAM_TIMEOUT):
+        """
+        Block until a piece is available and return its data.
+        :param handle: Torrent handle
+        :param key: Primary key of the torrent
+        :param piece: Piece index
+        :param deadline_ms: Deadline passed to set_piece_deadline
+        :param timeout: Seconds to wait
+        :return: Piece data as bytes
+        """
+        slot = (key, piece)
+        with self._cond:
+            self._waiting[slot] += 1
+            try:
+                handle.set_piece_deadline(piece, deadline_ms, ALERT_WHEN_AVAILABLE)
+                if not self._cond.wait_for(lambda: slot in self._results, timeout):
+                    raise TimeoutError(f"Piece {piece} did not arrive within {timeout}s")
+                result = self._results[slot]
+            finally:
+                self._waiting[slot] -= 1
+                if self._waiting[slot] <= 0:
+                    del self._waiting[slot]
+                    self._results.pop(slot, None)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def on_read_piece(self, alert):
+        keys = info_hash_keys(alert.handle)
+        key = self.registry.primary_key(keys[0]) if keys else None
+        slot = (key, alert.piece)
+        with self._cond:
+            if slot not in self._waiting:
+                return
+            if alert.error.value():
+                self._results[slot] = OSError(f"Could not read piece {alert.piece}: "
+                                              f"{alert.error.message()}")
+            else:
+                self._results[slot] = bytes(alert.buffer)
+            self._cond.notify_all()
+
+    def abort(self, key):
+        """
+        Fail every read waiting on a torrent, e.g. when it is removed.
+        :param key: Primary key of the torrent
+        """
+        with self._cond:
+            for slot in self._waiting:
+                if slot[0] == key:
+                    self._results[slot] = OSError("Torrent was removed")
+            self._cond.notify_all()
+
+    def stream_opened(self, handle, key):
+        with self._cond:
+            self._streams[key] += 1
+            first = self._streams[key] == 1
+        if first:
+            set_sequential_download(handle, True)
+
+    def stream_closed(self, handle, key):
+        with self._cond:
+            self._streams[key] -= 1
+            last = self._streams[key] <= 0
+            if last:
+                del self._streams[key]
+        if last and handle.is_valid():
+            handle.clear_piece_deadlines()
+            set_sequential_download(handle, False)
+
+
+class TorrentStream(io.RawIOBase):
+    def __init__(self, reader, handle, key, file_index=0, readahead=STREAM_READAHEAD,
+                 timeout=STREAM_TIMEOUT):
+        """
+        Read-only, seekable file object over one file of a torrent that may
+        still be downloading. Pieces around the read cursor get deadlines, and
+        a read blocks only until the pieces it covers have arrived.
+        :param reader: PieceReader of the engine
+        :param handle: Torrent handle with metadata
+        :param key: Primary key of the torrent
+        :param file_index: Index of the file inside the torrent
+        :param readahead: Pieces ahead of the cursor to prioritise
+        :param timeout: Seconds a read waits for a single piece
+        """
+        super().__init__()
+        ti = handle.torrent_file()
+        files = ti.files()
+        if not 0 <= file_index < files.num_files():
+            raise IndexError(f"Torrent has no file {file_index}")
+        self.reader = reader
+        self.handle = handle
+        self.key = key
+        self.name = files.file_path(file_index)
+        self.size = files.file_size(file_index)
+        self.readahead = readahead
+        self.timeout = timeout
+        self._offset = files.file_offset(file_index)
+        self._piece_length = ti.piece_length()
+        self._last_piece = self._piece_of(self.size - 1) if self.size else self._piece_of(0)
+        self._pos = 0
+        self._window = None  # First piece of the current deadline window
+        self._cache = OrderedDict()  # piece -> bytes
+        reader.stream_opened(handle, key)
+
+        # PDFs keep their cross-reference table and MP4s often their index at
+        # the end, so fetch the tail alongside the head
+        if self.size:
+            handle.set_piece_deadline(self._last_piece, DEADLINE_STEP_MS)
+        self._prioritise(self._piece_of(0))
+
+    def _piece_of(self, pos):
+        return (self._offset + pos) // self._piece_length
+
+    def _prioritise(self, first):
+        """Give the pieces from first to first + readahead increasing deadlines."""
+        if first == self._window:
+            return
+        last = min(first + self.readahead, self._last_piece)
+        if self._window is not None:
+            # Drop the deadlines the cursor has left behind (e.g. after a seek)
+            old_last = min(self._window + self.readahead, self._last_piece)
+            for piece in range(self._window, old_last + 1):
+                if not first <= piece <= last:
+                    self.handle.reset_piece_deadline(piece)
+        self._window = first
+        for step, piece in enumerate(range(first, last + 1)):
+            if not self.handle.have_piece(piece):
+                self.handle.set_piece_deadline(piece, step * DEADLINE_STEP_MS)
+
+    def _piece_data(self, piece):
+        data = self._cache.get(piece)
+        if data is not None:
+            self._cache.move_to_end(piece)
+            return data
+        data = self.reader.fetch(self.handle, self.key, piece, 0, self.timeout)
+        self._cache[piece] = data
+        if len(self._cache) > READ_CACHE_PIECES:
+            self._cache.popitem(last=False)
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return pos
+
+    def readinto(self, buffer):
+        if self.closed:
+            raise ValueError("I/O operation on closed stream")
+        count = min(len(buffer), self.size - self._pos)
+        if count <= 0:
+            return 0
+        piece = self._piece_of(self._pos)
+        self._prioritise(piece)
+        data = self._piece_data(piece)
+        # Never cross a piece boundary in one call, so a read returns as soon
+        # as the first piece is there
+        start = (self._offset + self._pos) % self._piece_length
+        count = min(count, len(data) - start)
+        buffer[:count] = data[start:start + count]
+        self._pos += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._cache.clear()
+            self.reader.stream_closed(self.handle, self.key)
+        super().close()
+
+
+class MetadataWaiter:
+    def __init__(self, registry):
+        """
+        Lets threads wait for a magnet link's metadata; woken by
+        metadata_received_alert.
+        :param registry: TorrentRegistry of the engine, to resolve alert handles
+        """
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._events = {}  # primary key -> threading.Event
+
+    def wait(self, handle, key, timeout=STREAM_TIMEOUT):
+        """
+        Block until a torrent has its metadata.
+        :param handle: Torrent handle
+        :param key: Primary key of the torrent
+        :param timeout: Seconds to wait
+        """
+        with self._lock:
+            event = self._events.setdefault(key, threading.Event())
+        # Checked after registering, so an alert arriving in between is not missed
+        if handle.status(0).has_metadata:
+            return
+        if not event.wait(timeout):
+            raise TimeoutError(f"No metadata within {timeout}s")
+
+    def on_metadata_received(self, alert):
+        for key in info_hash_keys(alert.handle):
+            primary = self.registry.primary_key(key)
+            with self._lock:
+                event = self._events.pop(primary, None)
+            if event is not None:
+                event.set()
+
+    def discard(self, key):
+        """Forget a removed torrent; its waiters time out."""
+        with self._lock:
+            self._events.pop(key, None)
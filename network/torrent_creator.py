@@ -0,0 +1,264 @@
+import os
+import mmap
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ALL_COMPLETED, FIRST_COMPLETED, wait
+import libtorrent as lt
+from network.hash_cache import build_torrent
+
+CREATOR = "P2P Notes Sharing App v1.0"
+
+# v2 hashes every file in 16 KiB blocks
+BLOCK_SIZE = 16 * 1024
+MIN_PIECE_SIZE = 16 * 1024
+MAX_PIECE_SIZE = 16 * 1024 * 1024
+# Piece size is picked so a torrent has roughly this many pieces
+TARGET_PIECES = 1500
+# Pieces hashed per worker task; keeps scheduling overhead low for tiny pieces
+PIECES_PER_TASK = 16
+
+ZERO_HASH = bytes(32)
+
+# libtorrent 1.2 cannot create v2 torrents
+SUPPORTS_V2 = hasattr(lt.create_torrent, 'v1_only')
+
+
+class CreationCancelled(Exception):
+    pass
+
+
+def choose_piece_size(total_size):
+    """
+    Pick a power-of-two piece size giving about TARGET_PIECES pieces.
+    :param total_size: Total size of the content in bytes
+    :return: Piece size in bytes
+    """
+    piece_size = MIN_PIECE_SIZE
+    while piece_size < MAX_PIECE_SIZE and total_size / piece_size > TARGET_PIECES:
+        piece_size *= 2
+    return piece_size
+
+
+def merkle_root(leaves, leaf_count):
+    """
+    Root of a SHA-256 merkle tree, padding the leaves with zero hashes.
+    :param leaves: Leaf hashes
+    :param leaf_count: Number of leaves of the full tree, a power of two
+    """
+    layer = list(leaves) + [ZERO_HASH] * (leaf_count - len(leaves))
+    while len(layer) > 1:
+        layer = [hashlib.sha256(layer[i] + layer[i + 1]).digest()
+                 for i in range(0, len(layer), 2)]
+    return layer[0]
+
+
+def _next_power_of_two(n):
+    return 1 << (n - 1).bit_length()
+
+
+class TorrentCreationJob:
+    def __init__(self, path, output_path, trackers=(), hybrid=True,
+                 piece_size=None, workers=None, progress_callback=None, hash_cache=None):
+        """
+        Create a .torrent for a file or directory, hashing pieces in parallel.
+        Files are read through mmap so memory use does not grow with their size.
+        :param path: File or directory to share
+        :param output_path: Where to write the .torrent file
+        :param trackers: Tracker URLs to include in the torrent
+        :param hybrid: Produce a hybrid v1/v2 torrent (v1 only if False or
+                       unsupported by the installed libtorrent)
+        :param piece_size: Piece size in bytes, chosen from the total size if None
+        :param workers: Number of hashing threads, CPU count if None
+        :param progress_callback: Optional function(progress 0..1), called from
+                                  the job thread
+        :param hash_cache: Optional HashCache; unchanged content is not rehashed
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"File not found: {path}")
+        self.path = os.path.abspath(path)
+        self.output_path = output_path
+        self.trackers = list(trackers)
+        self.hybrid = hybrid and SUPPORTS_V2
+        self.piece_size = piece_size
+        self.workers = workers or os.cpu_count() or 1
+        self.progress_callback = progress_callback
+        self.hash_cache = hash_cache
+        self.cache_hit = False
+
+        self.num_pieces = 0
+        self.pieces_done = 0
+        self.future = Future()
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    @property
+    def progress(self):
+        if not self.num_pieces:
+            return 0.0
+        return self.pieces_done / self.num_pieces
+
+    def start(self):
+        """
+        Run the job on a background thread.
+        :return: self
+        """
+        self._thread = threading.Thread(target=self._run_to_future, daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """
+        Stop hashing; result() then raises CreationCancelled.
+        """
+        self._cancelled.set()
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """
+        Wait for the job.
+        :return: Path of the created .torrent file
+        """
+        if self._thread is None and not self.future.done():
+            self._run_to_future()
+        return self.future.result(timeout)
+
+    def _run_to_future(self):
+        try:
+            self.future.set_result(self.run())
+        except BaseException as e:
+            self.future.set_exception(e)
+
+    def run(self):
+        """
+        Create the torrent on the calling thread.
+        :return: Path of the created .torrent file
+        """
+        options = {'piece_size': self.piece_size, 'hybrid': self.hybrid}
+        if self.hash_cache is not None:
+            key, stats = self.hash_cache.make_key(self.path, options)
+            cached = self.hash_cache.get(key)
+            if cached is not None:
+                data = build_torrent(cached[0], cached[1], self.trackers, CREATOR)
+                self._write(data)
+                self.cache_hit = True
+                self.num_pieces = self.pieces_done = 1
+                if self.progress_callback:
+                    self.progress_callback(1.0)
+                return self.output_path
+
+        fs = lt.file_storage()
+        lt.add_files(fs, self.path)
+        if fs.num_files() == 0:
+            raise ValueError(f"Nothing to share in: {self.path}")
+
+        piece_size = self.piece_size or choose_piece_size(fs.total_size())
+        if SUPPORTS_V2:
+            flags = 0 if self.hybrid else lt.create_torrent.v1_only
+            t = lt.create_torrent(fs, piece_size, flags)
+        else:
+            t = lt.create_torrent(fs, piece_size)
+        t.set_creator(CREATOR)
+        for tracker in self.trackers:
+            t.add_tracker(tracker)
+
+        self._hash_pieces(t, os.path.dirname(self.path))
+
+        data = lt.bencode(t.generate())
+        self._write(data)
+        if self.hash_cache is not None:
+            self.hash_cache.put(key, self.path, stats, data, options)
+        return self.output_path
+
+    def _write(self, data):
+        with open(self.output_path, "wb") as f:
+            f.write(data)
+
+    def _hash_pieces(self, t, base_dir):
+        # The torrent's own file list includes the pad files added for v2
+        layout = t.files()
+        self.num_pieces = t.num_pieces()
+        maps = {}
+        files = []
+        try:
+            for index in range(layout.num_files()):
+                if layout.file_flags(index) & lt.file_storage.flag_pad_file:
+                    continue
+                if layout.file_size(index) == 0:
+                    continue
+                f = open(os.path.join(base_dir, layout.file_path(index)), 'rb')
+                files.append(f)
+                maps[index] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            tasks = [range(start, min(start + PIECES_PER_TASK, self.num_pieces))
+                     for start in range(0, self.num_pieces, PIECES_PER_TASK)]
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                pending = set()
+                for task in tasks:
+                    if self._cancelled.is_set():
+                        break
+                    pending.add(pool.submit(self._hash_task, layout, maps, task))
+                    # Bound the work in flight so cancel takes effect quickly
+                    if len(pending) >= self.workers * 2:
+                        pending = self._collect(t, pending, FIRST_COMPLETED)
+                self._collect(t, pending, ALL_COMPLETED)
+            if self._cancelled.is_set():
+                raise CreationCancelled(f"Torrent creation cancelled: {self.path}")
+        finally:
+            for m in maps.values():
+                m.close()
+            for f in files:
+                f.close()
+
+    def _collect(self, t, pending, return_when):
+        done, pending = wait(pending, return_when=return_when)
+        for future in done:
+            results = future.result()
+            for piece, v1_hash, v2_hash in results:
+                if v1_hash is not None:
+                    t.set_hash(piece, v1_hash)
+                if v2_hash is not None:
+                    file_index, file_piece, root = v2_hash
+                    t.set_hash2(file_index, file_piece, root)
+            self.pieces_done += len(results)
+            if self.progress_callback:
+                self.progress_callback(self.progress)
+        return pending
+
+    def _hash_task(self, layout, maps, pieces):
+        results = []
+        piece_length = layout.piece_length()
+        for piece in pieces:
+            if self._cancelled.is_set():
+                break
+            v1 = hashlib.sha1()
+            v2_hash = None
+            for file_slice in layout.map_block(piece, 0, layout.piece_size(piece)):
+                index = file_slice.file_index
+                if index not in maps:
+                    # Pad file, or a file of size 0
+                    v1.update(bytes(file_slice.size))
+                    continue
+                data = memoryview(maps[index])[file_slice.offset:file_slice.offset + file_slice.size]
+                v1.update(data)
+                if self.hybrid:
+                    # Files are piece aligned, so this slice is one v2 piece
+                    file_piece = file_slice.offset // piece_length
+                    v2_hash = (index, file_piece,
+                               self._v2_piece_root(data, layout.file_size(index), piece_length))
+            results.append((piece, v1.digest(), v2_hash))
+        return results
+
+    def _v2_piece_root(self, data, file_size, piece_length):
+        leaves = [hashlib.sha256(data[i:i + BLOCK_SIZE]).digest()
+                  for i in range(0, len(data), BLOCK_SIZE)]
+        if file_size > piece_length:
+            leaf_count = piece_length // BLOCK_SIZE
+        else:
+            # A file of one piece is its own tree, padded to a power of two
+            leaf_count = _next_power_of_two(len(leaves))
+        return merkle_root(leaves, leaf_count)
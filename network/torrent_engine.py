@@ -2,186 +2,729 @@ import os
 import libtorrent as lt
 import threading
 import time
-import hashlib
+from concurrent.futures import Future
+from network.torrent_registry import TorrentRegistry, info_hash_keys
+from network.status_cache import StatusCache, STATE_NAMES, status_values
+from network.alert_dispatcher import AlertDispatcher
+from network.resume_store import ResumeStore
+from network.torrent_creator import TorrentCreationJob
+from network.hash_cache import HashCache, DEFAULT_MAX_BYTES
+from network.metrics import SessionMetrics
+from network.streaming import PieceReader, TorrentStream, MetadataWaiter, set_sequential_download
+from network.streaming import STREAM_READAHEAD, STREAM_TIMEOUT
+from network.bandwidth import BandwidthManager, SCHEDULE_INTERVAL
+from network.metadata_cache import MetadataCache
+from network.integrity import IntegrityVerifier, VERIFY_RATE
+from network.storage import DEFAULT_STORAGE_MODE, DEFAULT_DISK_BACKEND, storage_mode, disk_io_constructor, disk_settings
+from network.versions import VersionFeed, FeedFollower, FEED_POLL_INTERVAL, tag_torrent, read_tag, diff_versions
+from network.local_tracker import LocalTracker, LOCAL_TRACKER_PORT
+from network.priorities import SKIP, NORMAL, priority_value, plan_file_priorities
+from network.bulk_import import BulkImportJob, WatchFolder, BULK_BATCH_SIZE, WATCH_INTERVAL
+from network.profiles import DEFAULT_PROFILE, PROFILES, LAN_SETTINGS, load_profiles, resolve_profile, to_session_settings
+
+# Alerts the engine reacts to. Anything outside these categories is never
+# generated by libtorrent, which keeps the queue short.
+ALERT_MASK = (lt.alert.category_t.error_notification |
+              lt.alert.category_t.status_notification |
+              lt.alert.category_t.storage_notification)
+
+# How often the alert thread asks libtorrent for a state_update_alert
+STATUS_UPDATE_INTERVAL = 1.0
+
+# How often session counters are sampled
+STATS_INTERVAL = 1.0
+
+# Fast-resume data lives in a hidden folder inside the download directory
+RESUME_DIR = '.resume'
+# How often resume data of modified torrents and the session state are saved
+RESUME_SAVE_INTERVAL = 300
+# How long stop_all waits for libtorrent to hand back resume data
+RESUME_SAVE_TIMEOUT = 10
+# Torrents being added from resume data at the same time on startup
+MAX_CONCURRENT_RESTORES = 64
+
+# Peer discovery services. They stay off while the session is built and are
+# started DISCOVERY_DELAY seconds later on the alert thread, so UPnP/NAT-PMP
+# router probing and DHT bootstrapping never delay startup.
+DISCOVERY_SETTINGS = ('enable_dht', 'enable_upnp', 'enable_natpmp', 'enable_lsd')
+DISCOVERY_DELAY = 1.0
+
+# Version feeds of re-shared notes
+VERSIONS_DIR = '.versions'
+
+# Cache of piece hashes for files that were shared before
+HASH_CACHE_FILE = os.path.join('.cache', 'hashes.sqlite')
+# When each seeded file was last verified
+INTEGRITY_STATE_FILE = os.path.join('.cache', 'integrity.json')
 
 class TorrentEngine:
-    def __init__(self, download_dir):
+    def __init__(self, download_dir, hash_cache_size=DEFAULT_MAX_BYTES,
+                 profile=DEFAULT_PROFILE, profiles_path=None, trackers=None, lan_mode=False,
+                 storage=DEFAULT_STORAGE_MODE, disk_backend=DEFAULT_DISK_BACKEND, disk_options=None,
+                 verify_rate=VERIFY_RATE):
         """
         Initialize the torrent engine with download directory.
         :param download_dir: Directory where downloaded files will be saved
+        :param hash_cache_size: Size limit of the piece hash cache in bytes
+        :param profile: Performance profile name (see network/profiles.py) or a
+                        dictionary of settings
+        :param profiles_path: Optional JSON file with extra profiles
+        :param trackers: Tracker URLs put into created torrents; none by default,
+                         peers are then found through DHT and LSD
+        :param lan_mode: Run a local tracker and skip internet-only discovery
+        :param storage: Default storage mode of added torrents, 'sparse' or
+                        'allocate' (see network/storage.py)
+        :param disk_backend: Disk I/O backend on libtorrent 2.x: 'default',
+                             'mmap' or 'posix'
+        :param disk_options: Keyword arguments of storage.disk_settings, applied
+                             on top of the profile
+        :param verify_rate: Bytes/s the background integrity verifier reads,
+                            0 for unlimited, None to not run it
         """
+        self._init_start = init_start = time.perf_counter()
+        self.startup_times = {}  # step -> ms, see get_startup_stats
         self.download_dir = download_dir
+        storage_mode(storage)  # Reject unknown modes before anything starts
+        self.storage_mode = storage
+        self.disk_backend = disk_backend
+        self.disk_options = {}
+        self.trackers = list(trackers) if trackers is not None else None
+        self.lan_tracker = None
         os.makedirs(self.download_dir, exist_ok=True)
+        self.hash_cache = HashCache(os.path.join(self.download_dir, HASH_CACHE_FILE),
+                                    hash_cache_size)
         
-        # Create libtorrent session
-        self.session = lt.session()
+        # Create libtorrent session, restoring settings and DHT routing table
+        self.resume_store = ResumeStore(os.path.join(self.download_dir, RESUME_DIR))
+        self.session = self._create_session(self.resume_store.load_session_state(), disk_backend)
+        self.startup_times['session_ms'] = (time.perf_counter() - init_start) * 1000
+        # Discovery settings held back until start_discovery; None once started
+        self._discovery = {}
+        self._discovery_lock = threading.Lock()
+        self.versions = VersionFeed(os.path.join(self.download_dir, VERSIONS_DIR))
+        self.feed_followers = {}  # url -> FeedFollower
+        # EngineWorker owning this engine; set by the worker once it is built
+        self.worker = None
         
         # Set session settings
         settings = {
-            'listen_interfaces': '0.0.0.0:6881',
             'enable_dht': True,
             'enable_lsd': True,  # Local Service Discovery
             'enable_upnp': True,
             'enable_natpmp': True,
             'announce_to_all_tiers': True,
             'announce_to_all_trackers': True,
+            'alert_mask': ALERT_MASK,
+            # Room for bursts (e.g. adding many torrents) between dispatches
+            'alert_queue_size': 10000,
+            # Queue: only active_downloads/active_seeds auto-managed torrents
+            # run at once; stalled ones do not take a slot
+            'dont_count_slow_torrents': True,
+            'auto_manage_interval': 30,
         }
-        self.session.apply_settings(settings)
+        self._apply_settings(settings)
+
+        # Performance knobs and the listen interface come from the profile
+        self.profiles = load_profiles(profiles_path) if profiles_path else dict(PROFILES)
+        self.profile = None
+        self._profile_keys = set()  # settings the current profile applied
+        self.apply_profile(profile)
+        if disk_options:
+            self.set_disk_options(**disk_options)
         
-        # Start DHT, UPnP, and LSD
-        self.session.start_dht()
-        self.session.start_upnp()
-        self.session.start_lsd()
+        # DHT, UPnP, NAT-PMP and LSD follow the enable_* settings, so a profile
+        # can switch them off; they start with start_discovery
+
+        # Rate limits, unthrottled LAN peer class and time-of-day schedule
+        self.bandwidth = BandwidthManager(self.session)
+        # Per-torrent limits that are set: primary key -> (upload, download)
+        self.torrent_limits = {}
         
-        # Track active torrents
-        self.torrents = []
+        # Track active torrents, indexed by v1 and v2 info-hash
+        self.torrents = TorrentRegistry()
+        # Status table refreshed from state_update_alert
+        self.status_cache = StatusCache()
+        # File lists of recently used torrents, loaded on demand
+        self.metadata = MetadataCache()
         self.running = True
+
+        # Outstanding save_resume_data requests
+        self._resume_pending = 0
+        self._resume_cond = threading.Condition()
+        # Async adds waiting for their add_torrent_alert: info_hash -> callbacks
+        self._pending_adds = {}
+        self._pending_lock = threading.Lock()
+        # Watched import directories: path -> WatchFolder
+        self.watch_folders = {}
         
+        # Route alerts by type; the thread blocks in wait_for_alert
+        self.alerts = AlertDispatcher(self.session)
+        self.alerts.on(lt.torrent_finished_alert, self._on_torrent_finished)
+        self.alerts.on(lt.torrent_error_alert, self._on_torrent_error)
+        self.alerts.on(lt.metadata_received_alert, self._on_metadata_received)
+        self.alerts.on(lt.torrent_removed_alert, self._on_torrent_removed)
+        self.alerts.on(lt.state_update_alert, self._on_state_update)
+        self.alerts.on(lt.state_changed_alert, self._on_state_changed)
+        self.alerts.on(lt.add_torrent_alert, self._on_add_torrent)
+        if hasattr(lt, 'alerts_dropped_alert'):
+            self.alerts.on(lt.alerts_dropped_alert, self._on_alerts_dropped)
+        self.alerts.on(lt.save_resume_data_alert, self._on_save_resume_data)
+        self.alerts.on(lt.save_resume_data_failed_alert, self._on_save_resume_data_failed)
+        self.alerts.every(STATUS_UPDATE_INTERVAL, self.session.post_torrent_updates)
+
+        # Piece data for streams, delivered by read_piece_alert
+        self.piece_reader = PieceReader(self.torrents)
+        self.alerts.on(lt.read_piece_alert, self.piece_reader.on_read_piece)
+        # Streams opened on magnet links wait for their metadata here
+        self.metadata_waiter = MetadataWaiter(self.torrents)
+        self.alerts.on(lt.metadata_received_alert, self.metadata_waiter.on_metadata_received)
+
+        # Session counters sampled into a ring buffer
+        self.metrics = SessionMetrics()
+        self.alerts.on(lt.session_stats_alert, self.metrics.record)
+        self.alerts.every(STATS_INTERVAL, self.session.post_session_stats)
+        self.alerts.every(RESUME_SAVE_INTERVAL, self._save_state_periodically)
+        self.alerts.every(SCHEDULE_INTERVAL, self.bandwidth.apply)
+
+        # Re-hashes seeded files in the background and rechecks damaged torrents
+        self.integrity = IntegrityVerifier(self, os.path.join(self.download_dir, INTEGRITY_STATE_FILE),
+                                           verify_rate or 0)
+        self.alerts.on(lt.torrent_finished_alert, self.integrity.on_torrent_finished)
+        self.alerts.on(lt.torrent_checked_alert, self.integrity.on_torrent_checked)
+
+        if lan_mode:
+            self.enable_lan_mode()
+        self.alerts.after(DISCOVERY_DELAY, self.start_discovery)
+
         # Start alert handler thread
         self.alert_thread = threading.Thread(target=self._handle_alerts, daemon=True)
         self.alert_thread.start()
+
+        # Keep following the feeds followed before
+        for feed in self.versions.feeds():
+            if feed.get('url'):
+                self.follow_feed(feed['url'], feed.get('save_path'))
+
+        # Bring back the torrents of the previous run without rechecking them
+        self.restore_thread = threading.Thread(target=self._restore_and_purge, daemon=True)
+        self.restore_thread.start()
+        if verify_rate is not None:
+            self.integrity.start()
         
+        self.startup_times['init_ms'] = (time.perf_counter() - init_start) * 1000
         print("Torrent engine initialized successfully")
 
-    def create_torrent(self, file_path, tracker_url="udp://tracker.openbittorrent.com:80/announce"):
+    def _create_session(self, state, disk_backend=DEFAULT_DISK_BACKEND):
+        """
+        Create the libtorrent session from saved session state if there is any.
+        :param state: Bencoded session state or None
+        :param disk_backend: Disk I/O backend name (see network/storage.py)
+        :return: libtorrent session
+        """
+        constructor = disk_io_constructor(disk_backend)
+        if constructor is None and disk_backend != DEFAULT_DISK_BACKEND:
+            print(f"Disk backend {disk_backend} not supported by this libtorrent, using the default")
+        # libtorrent starts discovery from its defaults as soon as the session
+        # exists; keep it off until start_discovery
+        no_discovery = {key: False for key in DISCOVERY_SETTINGS}
+        if hasattr(lt, 'read_session_params'):
+            params = None
+            if state:
+                try:
+                    params = lt.read_session_params(state)
+                except Exception as e:
+                    print(f"Could not restore session state: {e}")
+            if params is None:
+                params = lt.session_params()
+            try:
+                settings = params.settings
+                settings.update(no_discovery)
+                params.settings = settings
+            except (AttributeError, TypeError):
+                pass
+            # The backend can only be chosen before the session exists
+            if constructor is not None:
+                params.disk_io_constructor = constructor
+            session = lt.session(params)
+        else:
+            session = lt.session(no_discovery)
+            if state:
+                try:
+                    session.load_state(lt.bdecode(state))
+                except Exception as e:
+                    print(f"Could not restore session state: {e}")
+        session.apply_settings(no_discovery)
+        return session
+
+    def _apply_settings(self, settings):
+        """
+        Apply session settings, holding back discovery settings until
+        start_discovery has run.
+        :param settings: Dictionary of libtorrent settings
+        """
+        with self._discovery_lock:
+            if self._discovery is not None:
+                settings = dict(settings)
+                for key in DISCOVERY_SETTINGS:
+                    if key in settings:
+                        self._discovery[key] = settings.pop(key)
+            self.session.apply_settings(settings)
+
+    def start_discovery(self):
+        """
+        Start DHT, UPnP, NAT-PMP and LSD as far as the settings applied so far
+        enable them. Runs on the alert thread shortly after startup.
+        """
+        with self._discovery_lock:
+            settings, self._discovery = self._discovery, None
+            if settings is None:
+                return
+            self.session.apply_settings(settings)
+        self.startup_times['discovery_ms'] = (time.perf_counter() - self._init_start) * 1000
+        started = [key[len('enable_'):] for key in DISCOVERY_SETTINGS if settings.get(key)]
+        print(f"Peer discovery started: {', '.join(started) or 'none'}")
+
+    def get_startup_stats(self):
+        """
+        :return: Dictionary with milliseconds spent creating the session and in
+                 __init__, and from __init__ to starting discovery (None before)
+        """
+        return {
+            'session_ms': self.startup_times.get('session_ms'),
+            'init_ms': self.startup_times.get('init_ms'),
+            'discovery_ms': self.startup_times.get('discovery_ms'),
+        }
+
+    def _restore_and_purge(self):
+        self._restore_torrents()
+        # Drop hash cache entries for files changed or deleted while we were not
+        # running; stats every cached file, so it stays off the startup path
+        try:
+            purged = self.hash_cache.purge_stale()
+        except Exception as e:
+            print(f"Could not check the hash cache: {e}")
+            return
+        if purged:
+            print(f"Dropped {purged} stale hash cache entries")
+
+    def _restore_torrents(self):
         """
-        Create a .torrent file from a given file.
-        :param file_path: Path to the file to create torrent for
-        :param tracker_url: Tracker URL to include in torrent
+        Add every torrent with stored resume data back to the session.
+        At most MAX_CONCURRENT_RESTORES adds are in flight at once.
+        """
+        slots = threading.Semaphore(MAX_CONCURRENT_RESTORES)
+        restored = 0
+        for info_hash, data in self.resume_store.load_torrents():
+            if not self.running:
+                break
+            try:
+                params = lt.read_resume_data(data)
+            except Exception as e:
+                print(f"Corrupt resume data for {info_hash}: {e}")
+                self.resume_store.delete_torrent(info_hash)
+                continue
+            if not params.save_path:
+                params.save_path = self.download_dir
+            # Let the session queue decide which restored torrents run
+            params.flags |= lt.torrent_flags.auto_managed
+            slots.acquire()
+            self.add_torrent_async(params, lambda handle, error: slots.release())
+            restored += 1
+        if restored:
+            print(f"Restoring {restored} torrents from resume data")
+
+    def add_torrent_async(self, params, callback=None):
+        """
+        Queue add_torrent_params with async_add_torrent; returns immediately.
+        The handle is registered when the add_torrent_alert arrives.
+        :param params: libtorrent add_torrent_params
+        :param callback: Optional function(handle, error) called from the alert
+                         thread; handle is None and error a message on failure
+        """
+        keys = info_hash_keys(params)
+        if not keys:
+            # Nothing to match the add_torrent_alert against
+            if callback is not None:
+                callback(None, "No info-hash in add_torrent_params")
+            return
+        if callback is not None:
+            with self._pending_lock:
+                self._pending_adds.setdefault(keys[0], []).append(callback)
+        self.session.async_add_torrent(params)
+
+    def _on_alerts_dropped(self, alert):
+        """
+        If add_torrent_alerts were lost, settle the callbacks waiting for them
+        so e.g. the restore thread's slots are not leaked.
+        """
+        # Not every binding build exposes alert_type; then any drop may have
+        # hit an add_torrent_alert
+        alert_type = getattr(lt.add_torrent_alert, 'alert_type', None)
+        if alert_type is not None and not alert.dropped_alerts[alert_type]:
+            return
+        in_session = {}
+        for handle in self.session.get_torrents():
+            keys = info_hash_keys(handle)
+            for key in keys:
+                in_session[key] = (handle, keys)
+        with self._pending_lock:
+            pending, self._pending_adds = self._pending_adds, {}
+        for key, callbacks in pending.items():
+            handle, keys = in_session.get(key, (None, None))
+            if handle is not None:
+                self.torrents.add(handle, keys)
+            error = None if handle is not None else "add_torrent_alert dropped, outcome unknown"
+            for callback in callbacks:
+                callback(handle, error)
+
+    def create_torrent(self, file_path, trackers=None, hybrid=True):
+        """
+        Create a .torrent file from a given file or directory.
+        Blocks until hashing is done; use create_torrent_async from a UI thread.
+        :param file_path: Path to the file or directory to create torrent for
+        :param trackers: Tracker URL or list of URLs to include in the torrent;
+                         None for the engine's default trackers, [] for none
+        :param hybrid: Create a hybrid v1/v2 torrent
         :return: Path to created .torrent file
         """
+        return self.create_torrent_async(file_path, trackers, hybrid).result()
+
+    def create_torrent_async(self, file_path, trackers=None, hybrid=True, progress_callback=None):
+        """
+        Start creating a .torrent file on a background thread.
+        :param file_path: Path to the file or directory to create torrent for
+        :param trackers: Tracker URL or list of URLs to include in the torrent;
+                         None for the engine's default trackers, [] for none
+        :param hybrid: Create a hybrid v1/v2 torrent
+        :param progress_callback: Optional function(progress 0..1), called from
+                                  the hashing thread
+        :return: TorrentCreationJob; result() gives the .torrent path, cancel()
+                 stops it
+        """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
-        
-        # Create file storage
-        fs = lt.file_storage()
-        file_size = os.path.getsize(file_path)
-        filename = os.path.basename(file_path)
-        fs.add_file(filename, file_size)
-        
-        # Create torrent
-        t = lt.create_torrent(fs)
-        t.set_creator("P2P Notes Sharing App v1.0")
-        t.add_tracker(tracker_url)
-        
-        # Add additional popular trackers for better peer discovery
-        additional_trackers = [
-            "udp://tracker.opentrackr.org:1337/announce",
-            "udp://9.rarbg.to:2710/announce",
-            "udp://exodus.desync.com:6969/announce",
-            "udp://tracker.torrent.eu.org:451/announce"
-        ]
-        for tracker in additional_trackers:
-            t.add_tracker(tracker)
-        
-        # Set piece hashes
-        lt.set_piece_hashes(t, os.path.dirname(file_path))
-        
-        # Generate torrent data
-        torrent_data = lt.bencode(t.generate())
-        
+
+        if trackers is None:
+            trackers = self.default_trackers()
+        elif isinstance(trackers, str):
+            trackers = [trackers]
+
         # Save .torrent file in downloads directory
-        torrent_filename = f"{filename}.torrent"
-        torrent_path = os.path.join(self.download_dir, torrent_filename)
-        
-        with open(torrent_path, "wb") as f:
-            f.write(torrent_data)
-        
-        print(f"Torrent created: {torrent_path}")
-        return torrent_path
+        filename = os.path.basename(os.path.normpath(file_path))
+        torrent_path = os.path.join(self.download_dir, f"{filename}.torrent")
+
+        job = TorrentCreationJob(file_path, torrent_path, trackers, hybrid=hybrid,
+                                 progress_callback=progress_callback,
+                                 hash_cache=self.hash_cache)
+
+        def report(future):
+            if future.exception() is None:
+                print(f"Torrent created: {torrent_path}")
+
+        job.future.add_done_callback(report)
+        return job.start()
+
+    def default_trackers(self):
+        """
+        Trackers put into new torrents: the configured ones, else the local
+        tracker in LAN mode, else none.
+        :return: List of tracker URLs
+        """
+        if self.trackers is not None:
+            return list(self.trackers)
+        if self.lan_tracker is not None:
+            return [self.lan_tracker.url]
+        return []
+
+    def enable_lan_mode(self, port=LOCAL_TRACKER_PORT):
+        """
+        Tune the session for a LAN without internet access: run a local
+        tracker, announce every torrent to it, rely on LSD instead of DHT,
+        UPnP and NAT-PMP, and give up on unreachable trackers quickly.
+        Peers on the local network are already exempt from the global rate
+        limits and preferred by their peer class (see network/bandwidth.py).
+        :param port: Port of the local tracker
+        """
+        settings, _ = to_session_settings(LAN_SETTINGS, self.session.get_settings())
+        self._apply_settings(settings)
+        if self.lan_tracker is None:
+            try:
+                self.lan_tracker = LocalTracker('0.0.0.0', port, feeds=self.versions.to_json).start()
+            except OSError as e:
+                # Another instance on this machine already runs one
+                print(f"Local tracker not started on port {port}: {e}")
+                return
+            for handle in self.torrents:
+                handle.add_tracker({'url': self.lan_tracker.url, 'tier': 0})
+        print(f"LAN mode on, local tracker: {self.lan_tracker.url}")
+
+    def publish_version(self, path, feed_id=None, trackers=None):
+        """
+        Share a file or folder as the next version of a feed. The previous
+        version's torrent is replaced; peers following the feed only fetch
+        the pieces that changed (see network/versions.py).
+        :param path: Edited file or folder, shared from where it is
+        :param feed_id: Feed to publish to; a new feed is created if None
+        :param trackers: Tracker URLs, see create_torrent
+        :return: Future with the version entry plus 'feed_id' and 'feed_url'
+        """
+        feed_id = feed_id or self.versions.new_feed_id()
+        source = os.path.abspath(path)
+        save_path = os.path.dirname(os.path.normpath(source))
+        result = Future()
+        job = self.create_torrent_async(path, trackers)
+
+        def install(engine, data):
+            previous = engine.versions.latest(feed_id)
+            version = previous['version'] + 1 if previous else 1
+            return engine._install_version(tag_torrent(data, feed_id, version), save_path, source=source)
+
+        def installed(future):
+            try:
+                result.set_result(future.result())
+            except BaseException as e:
+                result.set_exception(e)
+
+        def created(future):
+            # Runs on the creator thread; the install itself goes to the engine thread
+            try:
+                with open(future.result(), 'rb') as f:
+                    data = f.read()
+            except BaseException as e:
+                result.set_exception(e)
+                return
+            self.run_on_engine(lambda engine: install(engine, data)).add_done_callback(installed)
+
+        job.future.add_done_callback(created)
+        return result
+
+    def apply_version(self, torrent_data, save_path=None, url=None):
+        """
+        Switch to a newer version of a feed, reusing the data of the version
+        held now: libtorrent checks it and only downloads changed pieces.
+        :param torrent_data: Bencoded, feed-tagged .torrent
+        :param save_path: Where the data lives; defaults to the feed's save
+                          path, then the download directory
+        :param url: Feed URL, remembered so it is followed after a restart
+        :return: Version entry plus 'feed_id'; the current one if not newer
+        """
+        feed_id, version = read_tag(torrent_data)
+        if feed_id is None:
+            raise ValueError("Torrent does not belong to a version feed")
+        feed = self.versions.get(feed_id) or {}
+        current = feed['versions'][-1] if feed.get('versions') else None
+        if current is not None and version <= current['version']:
+            return dict(current, feed_id=feed_id)
+        save_path = save_path or feed.get('save_path') or self.download_dir
+        return self._install_version(torrent_data, save_path, url=url)
+
+    def run_on_engine(self, fn):
+        """
+        Run a function on the thread that owns the engine: the EngineWorker's,
+        or the caller's when the engine is used without one (benchmarks).
+        :param fn: Function(engine)
+        :return: Future with the function's return value
+        """
+        if self.worker is not None:
+            return self.worker.call(fn)
+        future = Future()
+        try:
+            future.set_result(fn(self))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+    def _install_version(self, torrent_data, save_path, source=None, url=None):
+        # Removes and adds torrents; call on the engine thread (see run_on_engine)
+        feed_id, version = read_tag(torrent_data)
+        previous = self.versions.latest(feed_id)
+        ti = lt.torrent_info(lt.bdecode(torrent_data))
+        info_hash = info_hash_keys(ti)[0]
+        if previous is not None and previous['info_hash'] == info_hash:
+            # Content did not change; keep seeding the current version
+            return dict(previous, feed_id=feed_id)
+        diff = None
+        if previous is not None:
+            old_data = self.versions.torrent(feed_id, previous['version'])
+            if old_data is not None:
+                diff = diff_versions(old_data, torrent_data)
+            # The new version takes over the files; keep them on disk
+            self.remove_torrent(previous['info_hash'])
+
+        entry = self.versions.add_version(feed_id, torrent_data, info_hash, diff,
+                                          source=source, save_path=save_path, url=url)
+        self.add_torrent_file(self.versions.torrent_path(feed_id, version), save_path)
+        if diff is not None:
+            print(f"Feed {feed_id} v{version}: {diff['changed_pieces']}/{diff['total_pieces']} "
+                  f"pieces changed")
+        entry = dict(entry, feed_id=feed_id)
+        if self.lan_tracker is not None:
+            entry['feed_url'] = self.lan_tracker.feed_url(feed_id)
+        return entry
 
-    def add_torrent_file(self, torrent_path):
+    def follow_feed(self, url, save_path=None, interval=FEED_POLL_INTERVAL):
+        """
+        Poll a feed URL and install every new version.
+        :param url: Feed URL, as returned in 'feed_url' by publish_version
+        :param save_path: Where the data lives, defaults to the download directory
+        :param interval: Seconds between polls
+        :return: Started FeedFollower
+        """
+        if url not in self.feed_followers:
+            self.feed_followers[url] = FeedFollower(self, url, save_path, interval).start()
+        return self.feed_followers[url]
+
+    def unfollow_feed(self, url):
+        follower = self.feed_followers.pop(url, None)
+        if follower is not None:
+            follower.stop()
+
+    def make_add_params(self, source, save_path=None, storage=None):
+        """
+        Build add_torrent_params for a .torrent file or magnet link.
+        Only parses; makes no session calls, so it is safe on any thread.
+        :param source: Path to a .torrent file or a magnet URI
+        :param save_path: Directory holding (or receiving) the data, defaults to
+                          the download directory
+        :param storage: 'sparse' or 'allocate', defaults to the engine's mode
+        :return: libtorrent add_torrent_params
+        """
+        if source.startswith('magnet:'):
+            params = lt.parse_magnet_uri(source)
+        else:
+            if not os.path.exists(source):
+                raise FileNotFoundError(f"Torrent file not found: {source}")
+            params = lt.add_torrent_params()
+            params.ti = lt.torrent_info(source)
+        params.save_path = save_path or self.download_dir
+        params.storage_mode = storage_mode(storage or self.storage_mode)
+        params.flags = lt.torrent_flags.duplicate_is_error | lt.torrent_flags.auto_managed
+        return params
+
+    def add_torrent_file(self, torrent_path, save_path=None, storage=None):
         """
         Add a .torrent file to the session and start downloading/seeding.
         :param torrent_path: Path to .torrent file
+        :param save_path: Directory holding (or receiving) the data, defaults to
+                          the download directory
+        :param storage: 'sparse' or 'allocate', defaults to the engine's mode
         :return: Torrent handle
         """
         if not os.path.exists(torrent_path):
             raise FileNotFoundError(f"Torrent file not found: {torrent_path}")
         
-        # Load torrent info
-        info = lt.torrent_info(torrent_path)
-        
-        # Create add_torrent_params
-        params = {
-            'ti': info,
-            'save_path': self.download_dir,
-            'storage_mode': lt.storage_mode_t.storage_mode_sparse,
-            'flags': lt.torrent_flags.duplicate_is_error | lt.torrent_flags.auto_managed
-        }
+        params = self.make_add_params(torrent_path, save_path, storage)
         
         # Add torrent to session
         handle = self.session.add_torrent(params)
-        self.torrents.append(handle)
+        self.torrents.add(handle, info_hash_keys(params.ti))
         
-        print(f"Added torrent: {info.name()}")
+        print(f"Added torrent: {params.ti.name()}")
         return handle
 
-    def add_magnet_link(self, magnet_uri):
+    def add_magnet_link(self, magnet_uri, storage=None):
         """
         Add a magnet link to the session.
         :param magnet_uri: Magnet URI string
+        :param storage: 'sparse' or 'allocate', defaults to the engine's mode
         :return: Torrent handle
         """
         if not magnet_uri.startswith('magnet:'):
             raise ValueError("Invalid magnet URI")
         
-        # Create add_torrent_params for magnet
-        params = {
-            'save_path': self.download_dir,
-            'storage_mode': lt.storage_mode_t.storage_mode_sparse,
-            'flags': lt.torrent_flags.duplicate_is_error | lt.torrent_flags.auto_managed
-        }
+        params = self.make_add_params(magnet_uri, storage=storage)
         
-        # Add magnet URI
-        handle = lt.add_magnet_uri(self.session, magnet_uri, params)
-        self.torrents.append(handle)
+        # Only the hashes named in the link are known until metadata arrives;
+        # the rest are registered by the metadata alert.
+        handle = self.session.add_torrent(params)
+        self.torrents.add(handle, info_hash_keys(params))
         
-        print(f"Added magnet link")
+        print("Added magnet link")
         return handle
 
+    def bulk_import(self, sources, save_path=None, on_batch=None, batch_size=BULK_BATCH_SIZE):
+        """
+        Import many .torrent files and magnet links in the background.
+        Files are parsed on a worker pool and added with async_add_torrent.
+        :param sources: Iterable of .torrent paths and magnet URIs
+        :param save_path: Directory for the data, defaults to the download directory
+        :param on_batch: Optional function(list of (source, info_hash, handle)),
+                         called from the alert thread for every batch added
+        :param batch_size: Number of added torrents per on_batch call
+        :return: Started BulkImportJob
+        """
+        return BulkImportJob(self, sources, save_path, on_batch, batch_size).start()
+
+    def watch_folder(self, directory, save_path=None, interval=WATCH_INTERVAL):
+        """
+        Import .torrent and .magnet files dropped into a directory.
+        :param directory: Directory to watch, created if missing
+        :param save_path: Directory for the data, defaults to the download directory
+        :param interval: Seconds between scans
+        :return: Started WatchFolder
+        """
+        directory = os.path.abspath(directory)
+        if directory in self.watch_folders:
+            return self.watch_folders[directory]
+        watcher = WatchFolder(self, directory, save_path, interval).start()
+        self.watch_folders[directory] = watcher
+        print(f"Watching {directory} for torrents")
+        return watcher
+
+    def unwatch_folder(self, directory):
+        """
+        Stop watching a directory.
+        :param directory: Directory passed to watch_folder
+        """
+        watcher = self.watch_folders.pop(os.path.abspath(directory), None)
+        if watcher is not None:
+            watcher.stop()
+
+    def open_stream(self, info_hash, file_index=0, readahead=STREAM_READAHEAD,
+                    timeout=STREAM_TIMEOUT):
+        """
+        Open a file of a torrent for reading while it downloads.
+        The torrent switches to sequential download and the pieces around the
+        read position get deadlines, so the start of a large file can be shown
+        long before the rest has arrived. Reads block until their pieces are there.
+        :param info_hash: Info hash of the torrent
+        :param file_index: Index of the file inside the torrent
+        :param readahead: Pieces ahead of the read position to prioritise
+        :param timeout: Seconds to wait for metadata and for each piece
+        :return: TorrentStream, a seekable read-only file object
+        """
+        handle = self.torrents.get(info_hash)
+        if handle is None:
+            raise KeyError(f"Unknown torrent: {info_hash}")
+        self.metadata_waiter.wait(handle, self.torrents.primary_key(info_hash), timeout)
+        return TorrentStream(self.piece_reader, handle, self.torrents.primary_key(info_hash),
+                             file_index, readahead, timeout)
+
+    def set_sequential(self, info_hash, enabled=True):
+        """
+        Download a torrent in piece order instead of rarest first.
+        :param info_hash: Info hash of the torrent
+        :param enabled: Turn sequential download on or off
+        """
+        handle = self.torrents.get(info_hash)
+        if handle is not None:
+            set_sequential_download(handle, enabled)
+
     def get_torrent_status(self):
         """
         Get status of all active torrents.
+        Served from the status cache, so this makes no calls into libtorrent.
         :return: List of torrent status dictionaries
         """
-        status_list = []
-        
-        for handle in self.torrents:
-            if not handle.is_valid():
-                continue
-                
-            status = handle.status()
-            
-            # Calculate download/upload speeds
-            download_rate = status.download_rate / 1024  # KB/s
-            upload_rate = status.upload_rate / 1024      # KB/s
-            
-            # Get torrent state
-            state_str = ['queued', 'checking', 'downloading metadata', 
-                        'downloading', 'finished', 'seeding', 'allocating', 
-                        'checking fastresume'][status.state]
-            
-            torrent_info = {
-                'name': status.name or "Getting metadata...",
-                'progress': status.progress,
-                'state': state_str,
-                'download_rate': download_rate,
-                'upload_rate': upload_rate,
-                'num_seeds': status.num_seeds,
-                'num_peers': status.num_peers,
-                'total_size': status.total_wanted,
-                'downloaded': status.total_wanted_done,
-                'uploaded': status.all_time_upload,
-                'is_seeding': status.is_seeding,
-                'is_finished': status.is_finished,
-                'error': status.error if status.error else None,
-                'info_hash': str(status.info_hash)
-            }
-            
-            status_list.append(torrent_info)
-        
-        return status_list
+        return self.status_cache.snapshot()[1]
+
+    def get_status_changes(self, since_version=0):
+        """
+        Get the torrents whose status changed after a given version.
+        :param since_version: 'version' from the previous call, 0 for everything
+        :return: Dictionary with 'version', 'changed', 'removed' and 'reset'
+        """
+        return self.status_cache.changes_since(since_version)
 
     def remove_torrent(self, info_hash, delete_files=False):
         """
@@ -189,88 +732,524 @@ class TorrentEngine:
         :param info_hash: Info hash of the torrent to remove
         :param delete_files: Whether to delete downloaded files
         """
-        for handle in self.torrents:
-            if str(handle.status().info_hash) == info_hash:
-                if delete_files:
-                    self.session.remove_torrent(handle, lt.options_t.delete_files)
-                else:
-                    self.session.remove_torrent(handle)
-                self.torrents.remove(handle)
-                print(f"Removed torrent: {info_hash}")
-                break
+        self.remove_torrents([info_hash], delete_files)
+
+    def remove_torrents(self, info_hashes, delete_files=False):
+        """
+        Remove several torrents from the session.
+        :param info_hashes: Info hashes (v1 or v2) of the torrents to remove
+        :param delete_files: Whether to delete downloaded files
+        """
+        for info_hash in info_hashes:
+            primary = self.torrents.primary_key(info_hash)
+            handle = self.torrents.remove(info_hash)
+            if handle is None:
+                continue
+            self.status_cache.remove(primary)
+            self.torrent_limits.pop(primary, None)
+            self.resume_store.delete_torrent(primary)
+            if delete_files:
+                self.session.remove_torrent(handle, lt.options_t.delete_files)
+            else:
+                self.session.remove_torrent(handle)
+            print(f"Removed torrent: {info_hash}")
 
     def pause_torrent(self, info_hash):
         """
         Pause a specific torrent.
         :param info_hash: Info hash of the torrent to pause
         """
-        for handle in self.torrents:
-            if str(handle.status().info_hash) == info_hash:
+        self.pause_torrents([info_hash])
+
+    def pause_torrents(self, info_hashes):
+        """
+        Pause several torrents.
+        :param info_hashes: Info hashes (v1 or v2) of the torrents to pause
+        """
+        for info_hash in info_hashes:
+            handle = self.torrents.get(info_hash)
+            if handle is not None:
                 handle.pause()
                 print(f"Paused torrent: {info_hash}")
-                break
 
     def resume_torrent(self, info_hash):
         """
         Resume a specific torrent.
         :param info_hash: Info hash of the torrent to resume
         """
-        for handle in self.torrents:
-            if str(handle.status().info_hash) == info_hash:
+        self.resume_torrents([info_hash])
+
+    def resume_torrents(self, info_hashes):
+        """
+        Resume several torrents.
+        :param info_hashes: Info hashes (v1 or v2) of the torrents to resume
+        """
+        for info_hash in info_hashes:
+            handle = self.torrents.get(info_hash)
+            if handle is not None:
                 handle.resume()
                 print(f"Resumed torrent: {info_hash}")
-                break
 
     def _handle_alerts(self):
         """
         Handle libtorrent alerts in a separate thread.
         """
-        while self.running:
-            alerts = self.session.pop_alerts()
-            for alert in alerts:
-                alert_type = type(alert).__name__
-                
-                # Handle different types of alerts
-                if alert_type == 'torrent_finished_alert':
-                    print(f"Download completed: {alert.torrent_name}")
-                elif alert_type == 'torrent_error_alert':
-                    print(f"Torrent error: {alert.error_message}")
-                elif alert_type == 'metadata_received_alert':
-                    print(f"Metadata received for: {alert.torrent_name}")
-                elif alert_type == 'state_changed_alert':
-                    state_str = ['queued', 'checking', 'downloading metadata', 
-                               'downloading', 'finished', 'seeding', 'allocating', 
-                               'checking fastresume'][alert.state]
-                    print(f"State changed to {state_str}: {alert.torrent_name}")
-            
-            time.sleep(1)  # Check for alerts every second
+        self.alerts.run(self.is_running)
+
+    def subscribe_alerts(self, category, callback):
+        """
+        Get called for every alert in the given categories.
+        Callbacks run on the alert thread and must not block.
+        :param category: Mask of lt.alert.category_t values
+        :param callback: Function taking the alert
+        :return: Token for unsubscribe_alerts
+        """
+        token = self.alerts.subscribe(category, callback)
+        self._update_alert_mask()
+        return token
+
+    def unsubscribe_alerts(self, token):
+        """
+        Cancel a subscription made with subscribe_alerts.
+        :param token: Token returned by subscribe_alerts
+        """
+        self.alerts.unsubscribe(token)
+        self._update_alert_mask()
+
+    def _update_alert_mask(self):
+        # libtorrent only generates alerts in the session's alert_mask; widen
+        # it for what subscribers asked for and narrow it again when they leave
+        mask = int(ALERT_MASK) | self.alerts.subscribed_mask()
+        if mask != self.session.get_settings().get('alert_mask'):
+            self._apply_settings({'alert_mask': mask})
+
+    def get_alert_stats(self):
+        """
+        Get alert dispatch statistics (queue drops, dispatch times).
+        :return: Dictionary of alert statistics
+        """
+        return self.alerts.get_stats()
+
+    def _on_torrent_finished(self, alert):
+        print(f"Download completed: {alert.torrent_name}")
+
+    def _on_torrent_error(self, alert):
+        print(f"Torrent error: {alert.error_message}")
+
+    def _on_metadata_received(self, alert):
+        # A magnet link may only have named one of the hashes
+        keys = info_hash_keys(alert.handle)
+        known = next((key for key in keys if key in self.torrents), None)
+        if known is not None:
+            for key in keys:
+                self.torrents.add_alias(known, key)
+        print(f"Metadata received for: {alert.torrent_name}")
+
+    def _on_torrent_removed(self, alert):
+        for key in info_hash_keys(alert):
+            primary = self.torrents.primary_key(key)
+            if primary is not None:
+                self.piece_reader.abort(primary)
+                self.metadata_waiter.discard(primary)
+                self.integrity.forget(primary)
+                self.metadata.discard(primary)
+                self.torrents.remove(primary)
+                self.status_cache.remove(primary)
+                self.torrent_limits.pop(primary, None)
+
+    def _on_state_update(self, alert):
+        self._update_status_cache(alert.status)
+
+    def _on_state_changed(self, alert):
+        state_str = STATE_NAMES[alert.state]
+        print(f"State changed to {state_str}: {alert.torrent_name}")
+
+    def _on_add_torrent(self, alert):
+        keys = info_hash_keys(alert.params)
+        error = alert.error.message() if alert.error.value() else None
+        handle = None
+        if error:
+            print(f"Could not add torrent: {error}")
+        elif keys:
+            handle = alert.handle
+            primary = self.torrents.add(handle, keys)
+            # Limits restored from resume data
+            limits = (max(0, getattr(alert.params, 'upload_limit', -1)),
+                      max(0, getattr(alert.params, 'download_limit', -1)))
+            if any(limits):
+                self.torrent_limits[primary] = limits
+            if self.lan_tracker is not None:
+                handle.add_tracker({'url': self.lan_tracker.url, 'tier': 0})
+        callback = None
+        with self._pending_lock:
+            callbacks = self._pending_adds.get(keys[0]) if keys else None
+            if callbacks:
+                callback = callbacks.pop(0)
+                if not callbacks:
+                    del self._pending_adds[keys[0]]
+        if callback is not None:
+            callback(handle, error)
+
+    def _on_save_resume_data(self, alert):
+        params = getattr(alert, 'params', None)
+        if params is not None:
+            data = lt.write_resume_data_buf(params)
+            keys = info_hash_keys(params)
+        else:
+            # libtorrent 1.2 hands back the bdecoded entry
+            data = lt.bencode(alert.resume_data)
+            keys = info_hash_keys(alert.handle)
+        primary = next((key for key in map(self.torrents.primary_key, keys) if key), None)
+        # A save that finishes after the torrent was removed must not bring
+        # its resume file back
+        if primary is not None:
+            try:
+                self.resume_store.save_torrent(primary, data)
+            except OSError as e:
+                print(f"Could not save resume data: {e}")
+        self._resume_request_done()
+
+    def _on_save_resume_data_failed(self, alert):
+        # Also posted for torrents that had nothing new to save
+        self._resume_request_done()
+
+    def _resume_request_done(self):
+        with self._resume_cond:
+            self._resume_pending = max(0, self._resume_pending - 1)
+            self._resume_cond.notify_all()
+
+    def save_resume_data(self, wait=False, timeout=RESUME_SAVE_TIMEOUT):
+        """
+        Ask libtorrent for the resume data of every modified torrent.
+        The data is written to the resume store as the alerts come in.
+        :param wait: Block until all resume data was written
+        :param timeout: Longest time to wait in seconds
+        :return: True if nothing is outstanding any more
+        """
+        flags = lt.save_resume_flags_t.save_info_dict
+        if hasattr(lt.save_resume_flags_t, 'only_if_modified'):
+            flags |= lt.save_resume_flags_t.only_if_modified
+        for handle in self.torrents:
+            with self._resume_cond:
+                self._resume_pending += 1
+            try:
+                handle.save_resume_data(flags)
+            except RuntimeError:
+                self._resume_request_done()  # handle became invalid
+        if not wait:
+            return self._resume_pending == 0
+        with self._resume_cond:
+            return self._resume_cond.wait_for(lambda: self._resume_pending == 0, timeout)
+
+    def save_session_state(self):
+        """
+        Save the session state, including the DHT routing table.
+        """
+        try:
+            if hasattr(lt, 'write_session_params_buf'):
+                data = lt.write_session_params_buf(self.session.session_state())
+            else:
+                data = lt.bencode(self.session.save_state())
+            self.resume_store.save_session_state(data)
+        except Exception as e:
+            print(f"Could not save session state: {e}")
+
+    def _save_state_periodically(self):
+        self.save_resume_data()
+        self.save_session_state()
+
+    def apply_profile(self, profile):
+        """
+        Apply a performance profile to the running session.
+        :param profile: Profile name or dictionary of settings
+        :return: Settings that were applied
+        """
+        if isinstance(profile, dict):
+            name, values = 'custom', dict(profile)
+        else:
+            name, values = profile, resolve_profile(profile, self.profiles)
+        settings, skipped = to_session_settings(values, self.session.get_settings())
+        if skipped:
+            print(f"Profile {name}: not supported by this libtorrent: {', '.join(skipped)}")
+        # Settings the previous profile set and this one does not go back to
+        # libtorrent's defaults instead of keeping the old profile's values
+        defaults = lt.default_settings() if hasattr(lt, 'default_settings') else {}
+        for key in self._profile_keys - set(settings):
+            if key in defaults:
+                settings[key] = defaults[key]
+        self._apply_settings(settings)
+        self._profile_keys = set(settings)
+        # Explicit disk options stay on top of whichever profile is active
+        if self.disk_options:
+            self.set_disk_options(**self.disk_options)
+        self.profile = name
+        print(f"Applied performance profile: {name}")
+        return settings
+
+    def set_disk_options(self, **options):
+        """
+        Change disk I/O threads, cache and read-ahead on the running session.
+        The disk backend is fixed when the engine is created.
+        :param options: Keyword arguments of storage.disk_settings
+        :return: Settings that were applied
+        """
+        settings, skipped = to_session_settings(disk_settings(**options), self.session.get_settings())
+        if skipped:
+            print(f"Disk options: not supported by this libtorrent: {', '.join(skipped)}")
+        self.session.apply_settings(settings)
+        self.disk_options.update(options)
+        return settings
+
+    def get_disk_options(self):
+        """
+        :return: Dictionary with the storage mode, disk backend and disk options
+        """
+        return {
+            'storage': self.storage_mode,
+            'disk_backend': self.disk_backend,
+            'options': dict(self.disk_options),
+        }
+
+    def set_rate_limits(self, upload=0, download=0):
+        """
+        Set global upload/download limits; used outside scheduled windows.
+        :param upload: Bytes/s, 0 for unlimited
+        :param download: Bytes/s, 0 for unlimited
+        """
+        self.bandwidth.set_limits(upload, download)
+
+    def set_lan_rate_limits(self, upload=0, download=0):
+        """
+        Set limits for peers on the local network, which the global limits
+        do not apply to.
+        :param upload: Bytes/s, 0 for unlimited
+        :param download: Bytes/s, 0 for unlimited
+        """
+        self.bandwidth.set_lan_limits(upload, download)
+
+    def set_bandwidth_schedule(self, rules):
+        """
+        Change the global limits by time of day.
+        :param rules: List of rules, see network/bandwidth.py; None to clear
+        """
+        self.bandwidth.set_schedule(rules)
+
+    def set_torrent_rate_limits(self, info_hash, upload=0, download=0):
+        """
+        Limit a single torrent. Saved with its resume data.
+        :param info_hash: Info hash of the torrent
+        :param upload: Bytes/s, 0 for unlimited
+        :param download: Bytes/s, 0 for unlimited
+        """
+        handle = self.torrents.get(info_hash)
+        if handle is None:
+            raise KeyError(f"Unknown torrent: {info_hash}")
+        # libtorrent uses -1 for unlimited
+        handle.set_upload_limit(upload or -1)
+        handle.set_download_limit(download or -1)
+        primary = self.torrents.primary_key(info_hash)
+        if upload or download:
+            self.torrent_limits[primary] = (int(upload), int(download))
+        else:
+            self.torrent_limits.pop(primary, None)
+
+    def get_torrent_rate_limits(self, info_hash):
+        """
+        :return: Dictionary with the torrent's upload and download limit
+                 (bytes/s, 0 for unlimited)
+        """
+        handle = self.torrents.get(info_hash)
+        if handle is None:
+            raise KeyError(f"Unknown torrent: {info_hash}")
+        return {
+            'upload_limit': max(0, handle.upload_limit()),
+            'download_limit': max(0, handle.download_limit()),
+        }
+
+    def get_bandwidth(self):
+        """
+        Current transfer rates against the limits in effect.
+        :return: Dictionary with limits, rates (bytes/s) and utilisation
+                 (rate / limit, None when unlimited), plus the same per
+                 torrent under 'torrents' for torrents with their own limits
+        """
+        summary = self.metrics.summary()
+        limits = self.bandwidth.get_limits()
+        upload, download = summary['upload_rate'], summary['download_rate']
+        torrents = {}
+        for key, (upload_limit, download_limit) in list(self.torrent_limits.items()):
+            status = self.status_cache.get(key)
+            if status is None:
+                continue
+            # The status cache reports KB/s
+            torrent_upload, torrent_download = status['upload_rate'] * 1024, status['download_rate'] * 1024
+            torrents[key] = {
+                'upload_limit': upload_limit,
+                'download_limit': download_limit,
+                'upload_rate': torrent_upload,
+                'download_rate': torrent_download,
+                'upload_utilisation': torrent_upload / upload_limit if upload_limit else None,
+                'download_utilisation': torrent_download / download_limit if download_limit else None,
+            }
+        return dict(limits,
+                    upload_rate=upload,
+                    download_rate=download,
+                    upload_utilisation=upload / limits['upload_limit'] if limits['upload_limit'] else None,
+                    download_utilisation=download / limits['download_limit'] if limits['download_limit'] else None,
+                    torrents=torrents)
+
+    def set_active_limits(self, downloads=None, seeds=None, total=None):
+        """
+        Change how many auto-managed torrents run at once; the rest wait
+        queued and use no peer connections. Pass None to keep a limit.
+        :param downloads: Active downloading torrents
+        :param seeds: Active seeding torrents
+        :param total: Active torrents overall
+        """
+        settings = {}
+        for name, value in (('active_downloads', downloads), ('active_seeds', seeds),
+                            ('active_limit', total)):
+            if value is not None:
+                settings[name] = int(value)
+        self.session.apply_settings(settings)
+
+    def get_memory_stats(self):
+        """
+        Python-side memory figures.
+        :return: Dictionary with torrent, status record and metadata cache counts
+        """
+        return {
+            'torrents': len(self.torrents),
+            'status_records': len(self.status_cache),
+            'metadata_cache': self.metadata.get_stats(),
+        }
+
+    def get_hash_cache_stats(self):
+        """
+        Get hit/miss statistics of the piece hash cache.
+        :return: Dictionary of cache statistics
+        """
+        return self.hash_cache.get_stats()
+
+    def _update_status_cache(self, statuses):
+        """
+        Store the statuses carried by a state_update_alert.
+        :param statuses: torrent_status objects of the torrents that changed
+        """
+        updates = []
+        for status in statuses:
+            primary = None
+            for key in info_hash_keys(status):
+                primary = self.torrents.primary_key(key)
+                if primary is not None:
+                    break
+            if primary is None:
+                # Removed before the update was delivered
+                continue
+            updates.append((primary, status_values(status)))
+        self.status_cache.update(updates)
 
     def get_session_stats(self):
         """
         Get overall session statistics.
-        :return: Dictionary with session stats
+        :return: Dictionary with session stats (bytes and bytes/s)
         """
-        stats = self.session.get_stats()
+        values = self.metrics.latest()['values']
+        summary = self.metrics.summary()
         return {
-            'total_download': stats.get('net.recv_bytes', 0),
-            'total_upload': stats.get('net.sent_bytes', 0),
-            'download_rate': stats.get('net.recv_rate', 0),
-            'upload_rate': stats.get('net.sent_rate', 0),
+            'total_download': values.get('net.recv_bytes', 0),
+            'total_upload': values.get('net.sent_bytes', 0),
+            'download_rate': summary['download_rate'],
+            'upload_rate': summary['upload_rate'],
             'num_torrents': len(self.torrents),
-            'dht_nodes': stats.get('dht.dht_nodes', 0)
+            'queued_torrents': (values.get('ses.num_queued_download_torrents', 0) +
+                                values.get('ses.num_queued_seeding_torrents', 0)),
+            'dht_nodes': summary['dht_nodes'],
+            'peers_connected': summary['peers_connected'],
+            'queued_disk_jobs': summary['queued_disk_jobs'],
+            'disk_cache_hit_ratio': summary['disk_cache_hit_ratio'],
         }
 
+    def verify_torrents(self, info_hashes=None):
+        """
+        Have the integrity verifier check every file of some torrents now.
+        :param info_hashes: Info hashes (v1 or v2), default all torrents
+        :return: Primary keys of the torrents queued
+        """
+        if info_hashes is None:
+            keys = self.torrents.keys()
+        else:
+            keys = [key for key in map(self.torrents.primary_key, info_hashes) if key is not None]
+        for key in keys:
+            self.integrity.request(key)
+        return keys
+
+    def recheck_torrent(self, info_hash):
+        """
+        Re-hash a whole torrent in libtorrent right away; pieces that fail are
+        downloaded again.
+        :param info_hash: Info hash (v1 or v2) of the torrent
+        """
+        handle = self.torrents.get(info_hash)
+        if handle is None:
+            raise KeyError(f"Unknown torrent: {info_hash}")
+        self.integrity.repair(self.torrents.primary_key(info_hash), handle)
+
+    def set_verify_rate(self, rate):
+        """
+        :param rate: Bytes/s the integrity verifier reads, 0 for unlimited
+        """
+        self.integrity.set_rate(rate)
+
+    def get_integrity_stats(self):
+        """
+        :return: Dictionary of verification and repair counters
+        """
+        return self.integrity.get_stats()
+
+    def get_integrity_events(self, since=0):
+        """
+        Integrity events: file_changed, bad_pieces, repair_started, repaired
+        and repair_skipped.
+        :param since: Sequence number of the last event already seen
+        :return: Dictionary with 'seq' (newest) and 'events'
+        """
+        seq, events = self.integrity.events_since(since)
+        return {'seq': seq, 'events': events}
+
+    def export_metrics(self, format='json', history=False):
+        """
+        Export session, per-torrent and integrity metrics.
+        :param format: 'json' or 'prometheus'
+        :param history: Include the sample history (JSON only)
+        :return: Exported text
+        """
+        torrents = self.get_torrent_status()
+        extra = {'integrity': self.integrity.get_stats()}
+        if format == 'prometheus':
+            return self.metrics.to_prometheus(torrents, extra)
+        if format == 'json':
+            return self.metrics.to_json(torrents, history, extra)
+        raise ValueError(f"Unknown metrics format: {format}")
+
     def stop_all(self):
         """
         Stop all torrents and cleanup the session.
         """
         print("Stopping torrent engine...")
-        self.running = False
+        self.integrity.stop()
+        for directory in list(self.watch_folders):
+            self.unwatch_folder(directory)
+        for url in list(self.feed_followers):
+            self.unfollow_feed(url)
         
-        # Pause all torrents
-        for handle in self.torrents:
-            if handle.is_valid():
-                handle.pause()
+        # Pause all torrents, then save their state while the alert thread
+        # is still there to receive it
+        self.session.pause()
+        if not self.save_resume_data(wait=True):
+            print("Timed out waiting for resume data")
+        self.save_session_state()
+        self.running = False
         
         # Stop session services
         self.session.stop_dht()
@@ -283,6 +1262,11 @@ class TorrentEngine:
                 self.session.remove_torrent(handle)
         
         self.torrents.clear()
+        self.status_cache.clear()
+        self.metadata.clear()
+        self.hash_cache.close()
+        if self.lan_tracker is not None:
+            self.lan_tracker.stop()
         print("Torrent engine stopped successfully")
 
     def is_running(self):
@@ -296,22 +1280,101 @@ class TorrentEngine:
         """
         Get list of files in a specific torrent.
         :param info_hash: Info hash of the torrent
-        :return: List of file information
+        :return: List of file information with index, size, download priority
+                 and bytes downloaded; pad files are left out
         """
-        for handle in self.torrents:
-            if str(handle.status().info_hash) == info_hash:
-                if handle.torrent_file():
-                    files = []
-                    torrent_info = handle.torrent_file()
-                    for i in range(torrent_info.num_files()):
-                        file_info = torrent_info.file_at(i)
-                        files.append({
-                            'index': i,
-                            'path': file_info.path,
-                            'size': file_info.size
-                        })
-                    return files
-        return []
+        handle = self.torrents.get(info_hash)
+        if handle is None:
+            return []
+        metadata = self.metadata.get(self.torrents.primary_key(info_hash), handle)
+        if metadata is None:
+            return []
+        priorities = self._file_priorities(handle)
+        progress = handle.file_progress(lt.torrent_handle.piece_granularity)
+        files = []
+        for i, path in enumerate(metadata.paths):
+            # Alignment padding of hybrid torrents, not a file of the user's
+            if i in metadata.pad_files:
+                continue
+            files.append({
+                'index': i,
+                'path': path,
+                'size': metadata.sizes[i],
+                'priority': priorities[i],
+                'downloaded': progress[i],
+            })
+        return files
+
+    def _file_priorities(self, handle):
+        if hasattr(handle, 'get_file_priorities'):
+            return list(handle.get_file_priorities())
+        return list(handle.file_priorities())  # libtorrent 1.2
+
+    def _handle_with_metadata(self, info_hash):
+        handle = self.torrents.get(info_hash)
+        if handle is None:
+            raise KeyError(f"Unknown torrent: {info_hash}")
+        if self.metadata.get(self.torrents.primary_key(info_hash), handle) is None:
+            raise ValueError("Torrent has no metadata yet")
+        return handle
+
+    def prioritize_files(self, info_hash, priorities):
+        """
+        Set download priorities of a torrent's files in one call.
+        :param info_hash: Info hash of the torrent
+        :param priorities: List with one priority per file, or a dictionary
+                           {file index: priority} for just some of them.
+                           Priorities are 0-7 or 'skip', 'low', 'normal', 'high'
+        :return: The new list of file priorities
+        """
+        handle = self._handle_with_metadata(info_hash)
+        if isinstance(priorities, dict):
+            current = self._file_priorities(handle)
+            for index, priority in priorities.items():
+                current[int(index)] = priority_value(priority)
+            priorities = current
+        else:
+            priorities = [priority_value(p) for p in priorities]
+        handle.prioritize_files(priorities)
+        return priorities
+
+    def skip_files(self, info_hash, indices):
+        """
+        Do not download some files of a torrent.
+        :param info_hash: Info hash of the torrent
+        :param indices: File indices to skip
+        """
+        return self.prioritize_files(info_hash, {index: SKIP for index in indices})
+
+    def prioritize_pieces(self, info_hash, priorities):
+        """
+        Set download priorities of a torrent's pieces in one call.
+        :param info_hash: Info hash of the torrent
+        :param priorities: List with one priority per piece, or a dictionary
+                           {piece index: priority} for just some of them
+        """
+        handle = self._handle_with_metadata(info_hash)
+        if isinstance(priorities, dict):
+            handle.prioritize_pieces([(int(piece), priority_value(priority))
+                                      for piece, priority in priorities.items()])
+        else:
+            handle.prioritize_pieces([priority_value(p) for p in priorities])
+
+    def apply_file_rules(self, info_hash, rules):
+        """
+        Set file priorities from rules such as 'small_files_first' or an
+        extension filter (see network/priorities.py), starting from normal
+        priority for every file.
+        :param info_hash: Info hash of the torrent
+        :param rules: List of rules, applied in order
+        :return: The new list of file priorities
+        """
+        handle = self._handle_with_metadata(info_hash)
+        metadata = self.metadata.get(self.torrents.primary_key(info_hash), handle)
+        priorities = [SKIP if i in metadata.pad_files else NORMAL for i in range(len(metadata.paths))]
+        files = self.get_torrent_files(info_hash)
+        return self.prioritize_files(info_hash, plan_file_priorities(files, rules, priorities,
+                                                                     metadata.pad_files))
 
 # Example usage and testing
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+import threading
+
+
+def info_hash_keys(obj):
+    """
+    Get the hex info-hash strings (v1 first, then v2) of a libtorrent object.
+    Works on torrent_info, add_torrent_params, torrent_status and torrent_handle
+    without touching the session for anything but handles.
+    :param obj: libtorrent object carrying an info-hash
+    :return: List of hex info-hash strings, empty if none are known yet
+    """
+    # add_torrent_params built from a .torrent only carry the hashes in 'ti'
+    ti = getattr(obj, 'ti', None)
+    if ti is not None:
+        return info_hash_keys(ti)
+
+    hashes = getattr(obj, 'info_hashes', None)
+    if hashes is not None:
+        if callable(hashes):
+            hashes = hashes()
+        keys = []
+        if hashes.has_v1():
+            keys.append(str(hashes.v1))
+        if hashes.has_v2():
+            keys.append(str(hashes.v2))
+        return keys
+
+    # libtorrent 1.2 only knows about v1 hashes
+    info_hash = getattr(obj, 'info_hash', None)
+    if info_hash is None:
+        return []
+    if callable(info_hash):
+        info_hash = info_hash()
+    key = str(info_hash)
+    if not key or key == '0' * 40:
+        return []
+    return [key]
+
+
+class TorrentRegistry:
+    def __init__(self):
+        """
+        Index of torrent handles keyed by info-hash.
+        Every torrent has one primary key (its v1 hash when it has one) and may be
+        reachable through extra aliases such as its v2 hash.
+        """
+        self._lock = threading.RLock()
+        self._handles = {}   # primary key -> handle
+        self._aliases = {}   # any known info-hash -> primary key
+        self._keys = {}      # primary key -> set of all its info-hashes
+
+    def add(self, handle, keys):
+        """
+        Register a handle under its info-hashes.
+        :param handle: Torrent handle
+        :param keys: Info-hash strings, the first one becomes the primary key
+        :return: Primary key of the torrent
+        """
+        if not keys:
+            raise ValueError("Cannot register a torrent without an info-hash")
+        with self._lock:
+            primary = self._aliases.get(keys[0], keys[0])
+            self._handles[primary] = handle
+            known = self._keys.setdefault(primary, set())
+            for key in keys:
+                self._aliases[key] = primary
+                known.add(key)
+            return primary
+
+    def add_alias(self, info_hash, alias):
+        """
+        Make an already registered torrent reachable under another info-hash,
+        e.g. its v2 hash once metadata for a magnet link arrives.
+        :param info_hash: Any known info-hash of the torrent
+        :param alias: New info-hash to register
+        """
+        with self._lock:
+            primary = self._aliases.get(info_hash)
+            if primary is not None:
+                self._aliases[alias] = primary
+                self._keys[primary].add(alias)
+
+    def primary_key(self, info_hash):
+        """
+        Resolve any known info-hash to the torrent's primary key.
+        :param info_hash: v1 or v2 info-hash string
+        :return: Primary key or None
+        """
+        with self._lock:
+            return self._aliases.get(info_hash)
+
+    def get(self, info_hash):
+        """
+        Look up a handle by v1 or v2 info-hash.
+        :param info_hash: Info-hash string
+        :return: Torrent handle or None
+        """
+        with self._lock:
+            primary = self._aliases.get(info_hash)
+            if primary is None:
+                return None
+            return self._handles.get(primary)
+
+    def remove(self, info_hash):
+        """
+        Drop a torrent and all of its aliases.
+        :param info_hash: Any known info-hash of the torrent
+        :return: The removed handle or None
+        """
+        with self._lock:
+            primary = self._aliases.get(info_hash)
+            if primary is None:
+                return None
+            for key in self._keys.pop(primary, ()):
+                self._aliases.pop(key, None)
+            return self._handles.pop(primary, None)
+
+    def keys(self):
+        """
+        :return: List of primary keys
+        """
+        with self._lock:
+            return list(self._handles)
+
+    def items(self):
+        """
+        :return: List of (primary key, handle) pairs
+        """
+        with self._lock:
+            return list(self._handles.items())
+
+    def clear(self):
+        with self._lock:
+            self._handles.clear()
+            self._aliases.clear()
+            self._keys.clear()
+
+    def __contains__(self, info_hash):
+        with self._lock:
+            return info_hash in self._aliases
+
+    def __len__(self):
+        with self._lock:
+            return len(self._handles)
+
+    def __iter__(self):
+        # Iterate over a copy so callers may add/remove while looping
+        with self._lock:
+            return iter(list(self._handles.values()))
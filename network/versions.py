@@ -0,0 +1,318 @@
+"""
+Versioned re-sharing of edited notes.
+
+Each shared file or folder can belong to a feed: a stable id plus the list of
+torrents published for it. A new version is an ordinary v2 (hybrid) torrent,
+tagged with its feed id and version number outside the info dictionary. v2
+hashes every file separately in piece-aligned merkle trees, so an in-place edit
+or an append leaves the piece hashes of the untouched parts unchanged.
+
+A peer holding version N adds version N+1 into the same save path. libtorrent
+checks the data that is already there, keeps every piece whose hash still
+matches, and downloads only the changed pieces. It can seed everything it has
+right away. Edits that insert or delete bytes shift the following pieces, and
+those pieces count as changed.
+"""
+import base64
+import json
+import os
+import re
+import threading
+import time
+import uuid
+import urllib.request
+
+from network.bencode import Raw, decode, encode, raw_fields
+
+# Top-level .torrent keys; outside 'info', so they do not change the info-hash
+FEED_FIELD = b'p2pnotes feed'
+VERSION_FIELD = b'p2pnotes version'
+
+V1_HASH_SIZE = 20
+V2_HASH_SIZE = 32
+# How often a followed feed is polled, in seconds
+FEED_POLL_INTERVAL = 60
+FEED_TIMEOUT = 10
+
+
+def tag_torrent(torrent_data, feed_id, version):
+    """
+    Mark a .torrent as a version of a feed.
+    :param torrent_data: Bencoded .torrent
+    :param feed_id: Feed id
+    :param version: Version number
+    :return: Bencoded .torrent with the same info-hash
+    """
+    fields = raw_fields(torrent_data)
+    fields[FEED_FIELD] = Raw(encode(feed_id))
+    fields[VERSION_FIELD] = Raw(encode(version))
+    return encode(fields)
+
+
+def read_tag(torrent_data):
+    """
+    :param torrent_data: Bencoded .torrent
+    :return: (feed id, version), or (None, None) for an untagged torrent
+    """
+    fields = raw_fields(torrent_data)
+    if FEED_FIELD not in fields:
+        return None, None
+    return decode(fields[FEED_FIELD]).decode('utf-8'), decode(fields.get(VERSION_FIELD, b'i0e'))
+
+
+def _walk_file_tree(tree, prefix=()):
+    for name, node in tree.items():
+        if b'' in node:
+            yield b'/'.join(prefix + (name,)).decode('utf-8'), node[b'']
+        else:
+            yield from _walk_file_tree(node, prefix + (name,))
+
+
+def file_piece_hashes(torrent_data):
+    """
+    Piece hashes per file.
+    v2 layers are used when present, because they are aligned to each file.
+    Otherwise the v1 piece list is used, which only lines up for single-file
+    torrents.
+    :param torrent_data: Bencoded .torrent
+    :return: Dictionary of file path -> (piece length, list of piece hashes)
+    """
+    torrent = decode(torrent_data)
+    info = torrent[b'info']
+    piece_length = info[b'piece length']
+    files = {}
+    if b'file tree' in info:
+        layers = torrent.get(b'piece layers', {})
+        for path, entry in _walk_file_tree(info[b'file tree']):
+            root = entry.get(b'pieces root')
+            if root is None:
+                files[path] = (piece_length, [])  # Empty file
+            elif root in layers:
+                layer = layers[root]
+                files[path] = (piece_length, [layer[i:i + V2_HASH_SIZE]
+                                              for i in range(0, len(layer), V2_HASH_SIZE)])
+            else:
+                # A file of at most one piece is its own root
+                files[path] = (piece_length, [root])
+        return files
+    pieces = info[b'pieces']
+    hashes = [pieces[i:i + V1_HASH_SIZE] for i in range(0, len(pieces), V1_HASH_SIZE)]
+    files[info[b'name'].decode('utf-8')] = (piece_length, hashes)
+    return files
+
+
+def diff_versions(old_data, new_data):
+    """
+    Work out which pieces a peer holding the old version has to fetch.
+    :param old_data: Bencoded .torrent of the old version
+    :param new_data: Bencoded .torrent of the new version
+    :return: Dictionary with 'total_pieces', 'changed_pieces', 'changed_bytes'
+             (upper bound) and 'files': {path: changed piece indices}
+    """
+    old = file_piece_hashes(old_data)
+    new = file_piece_hashes(new_data)
+    total = changed_count = changed_bytes = 0
+    files = {}
+    for path, (piece_length, hashes) in new.items():
+        old_piece_length, old_hashes = old.get(path, (None, []))
+        if old_piece_length != piece_length:
+            old_hashes = []
+        changed = [i for i, piece_hash in enumerate(hashes)
+                   if i >= len(old_hashes) or old_hashes[i] != piece_hash]
+        total += len(hashes)
+        changed_count += len(changed)
+        changed_bytes += len(changed) * piece_length
+        if changed:
+            files[path] = changed
+    return {
+        'total_pieces': total,
+        'changed_pieces': changed_count,
+        'changed_bytes': changed_bytes,
+        'files': files,
+    }
+
+
+class VersionFeed:
+    def __init__(self, directory):
+        """
+        On-disk store of feeds: <id>.json lists the versions and
+        <id>/<version>.torrent holds each version's .torrent.
+        :param directory: Directory of the store
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _meta_path(self, feed_id):
+        # Feed ids come from peers' torrents; only accept what new_feed_id makes
+        if not isinstance(feed_id, str) or not re.fullmatch(r'[0-9a-f]{32}', feed_id):
+            raise ValueError(f"Invalid feed id: {feed_id}")
+        return os.path.join(self.directory, f"{feed_id}.json")
+
+    def _write_atomic(self, path, data):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def new_feed_id(self):
+        return uuid.uuid4().hex
+
+    def get(self, feed_id):
+        """
+        :return: Feed dictionary ('id', 'source', 'save_path', 'versions') or None
+        """
+        path = self._meta_path(feed_id)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def feeds(self):
+        """
+        :return: List of feed dictionaries
+        """
+        feeds = []
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.json'):
+                feed = self.get(name[:-len('.json')])
+                if feed is not None:
+                    feeds.append(feed)
+        return feeds
+
+    def latest(self, feed_id):
+        """
+        :return: Newest version entry of a feed or None
+        """
+        feed = self.get(feed_id)
+        if not feed or not feed['versions']:
+            return None
+        return feed['versions'][-1]
+
+    def torrent_path(self, feed_id, version):
+        """
+        :return: Path of a version's .torrent file in the store
+        """
+        self._meta_path(feed_id)
+        return os.path.join(self.directory, feed_id, f"{int(version)}.torrent")
+
+    def torrent(self, feed_id, version):
+        """
+        :return: Bencoded .torrent of a version or None
+        """
+        path = self.torrent_path(feed_id, version)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def add_version(self, feed_id, torrent_data, info_hash, diff=None, source=None,
+                    save_path=None, url=None):
+        """
+        Record a version of a feed, creating the feed if needed.
+        :param feed_id: Feed id
+        :param torrent_data: Bencoded .torrent, tagged with tag_torrent
+        :param info_hash: Primary info-hash of the version
+        :param diff: diff_versions() against the previous version
+        :param source: Path of the shared file or folder (publisher side)
+        :param save_path: Where the data lives
+        :param url: Feed URL being followed (subscriber side)
+        :return: The new version entry
+        """
+        _, version = read_tag(torrent_data)
+        with self._lock:
+            feed = self.get(feed_id) or {'id': feed_id, 'versions': []}
+            for key, value in (('source', source), ('save_path', save_path), ('url', url)):
+                if value is not None:
+                    feed[key] = value
+            path = self.torrent_path(feed_id, version)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._write_atomic(path, torrent_data)
+            entry = {
+                'version': version,
+                'info_hash': info_hash,
+                'created': int(time.time()),
+            }
+            if diff is not None:
+                entry.update({key: diff[key] for key in
+                              ('total_pieces', 'changed_pieces', 'changed_bytes')})
+            feed['versions'].append(entry)
+            self._write_atomic(self._meta_path(feed_id), json.dumps(feed, indent=2).encode('utf-8'))
+            return entry
+
+    def to_json(self, feed_id):
+        """
+        Public view of a feed for followers: the versions plus the newest
+        .torrent (base64).
+        :return: JSON bytes, or None for an unknown feed
+        """
+        feed = self.get(feed_id)
+        if not feed or not feed['versions']:
+            return None
+        latest = feed['versions'][-1]
+        data = self.torrent(feed_id, latest['version'])
+        return json.dumps({
+            'id': feed_id,
+            'versions': feed['versions'],
+            'torrent': base64.b64encode(data).decode('ascii'),
+        }).encode('utf-8')
+
+
+class FeedFollower:
+    def __init__(self, engine, url, save_path=None, interval=FEED_POLL_INTERVAL):
+        """
+        Polls a feed URL (see LocalTracker) and installs every new version.
+        :param engine: TorrentEngine
+        :param url: Feed URL, e.g. http://192.168.1.20:6969/feeds/<id>
+        :param save_path: Where the data lives, defaults to the download directory
+        :param interval: Seconds between polls
+        """
+        self.engine = engine
+        self.url = url
+        self.save_path = save_path
+        self.interval = interval
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def poll(self):
+        """
+        Fetch the feed once and install the newest version if it is new.
+        The version is installed on the engine thread.
+        :return: Future with the result of TorrentEngine.apply_version
+        """
+        with urllib.request.urlopen(self.url, timeout=FEED_TIMEOUT) as response:
+            feed = json.loads(response.read())
+        data = base64.b64decode(feed['torrent'])
+        save_path, url = self.save_path, self.url
+        return self.engine.run_on_engine(lambda engine: engine.apply_version(data, save_path, url=url))
+
+    def _run(self):
+        while True:
+            try:
+                # Not waited for: engine calls run in order, so the next poll
+                # sees this version as current
+                self.poll().add_done_callback(self._on_installed)
+            except Exception as e:
+                self._report(e)
+            if self._stop.wait(self.interval):
+                break
+
+    def _on_installed(self, future):
+        error = future.exception()
+        if error is None:
+            self.last_error = None
+        else:
+            self._report(error)
+
+    def _report(self, error):
+        if str(error) != self.last_error:
+            print(f"Could not update from {self.url}: {error}")
+        self.last_error = str(error)